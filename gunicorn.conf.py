@@ -0,0 +1,108 @@
+"""
+Gunicorn settings for TapNote, read automatically when gunicorn starts in this
+directory. Every value can be overridden through the environment:
+
+    GUNICORN_WORKER_CLASS  sync (default), gthread, or uvicorn (ASGI + async views;
+                           needs `pip install uvicorn`); any other gunicorn worker
+                           class path is passed through unchanged
+    WEB_CONCURRENCY        worker processes (default: from CPU count, at most
+                           MAX_DEFAULT_WORKERS; see below)
+    GUNICORN_THREADS       threads per gthread worker (default: 4)
+    GUNICORN_PRELOAD       load and warm the app once before forking (default: True)
+    GUNICORN_TIMEOUT       seconds before a silent worker is restarted (default: 30)
+    GUNICORN_MAX_REQUESTS  recycle a worker after this many requests (default: 0, off)
+    PORT                   listen port (default: 9009)
+    RUN_MIGRATIONS         apply migrations in the master at startup (default: True)
+    COLLECTSTATIC          collect static files at startup if they changed (default: True)
+"""
+import os
+
+WORKER_CLASSES = {
+    'sync': 'sync',
+    'gthread': 'gthread',
+    'uvicorn': 'uvicorn.workers.UvicornWorker',
+}
+
+
+# Each worker also starts up to RENDER_POOL_WORKERS render processes (tapnote.rendering),
+# so the CPU-derived default is capped; set WEB_CONCURRENCY to go beyond it.
+MAX_DEFAULT_WORKERS = 4
+
+
+def env_flag(name, default):
+    return os.environ.get(name, str(default)) == 'True'
+
+
+def cpu_count():
+    # Respects container CPU affinity where the platform exposes it
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+worker_profile = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+worker_class = WORKER_CLASSES.get(worker_profile, worker_profile)
+
+if worker_profile == 'uvicorn':
+    wsgi_app = 'prototype.asgi:application'
+else:
+    wsgi_app = 'prototype.wsgi:application'
+
+# Sync workers handle one request each, so use the classic 2n+1; threaded and async
+# workers get their concurrency elsewhere and only need one process per core.
+if worker_profile == 'sync':
+    default_workers = cpu_count() * 2 + 1
+else:
+    default_workers = cpu_count() + 1
+workers = int(os.environ.get('WEB_CONCURRENCY', min(default_workers, MAX_DEFAULT_WORKERS)))
+threads = int(os.environ.get('GUNICORN_THREADS', '4')) if worker_profile == 'gthread' else 1
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '9009')}"
+preload_app = env_flag('GUNICORN_PRELOAD', True)
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = max_requests // 10
+accesslog = '-'
+
+
+def on_starting(server):
+    # Runs once in the master before any worker is forked (a preloaded app is already
+    # imported by then): one interpreter for the startup chores instead of a separate
+    # manage.py process for each.
+    import django
+    from django.core.management import call_command
+    from django.db import connections
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'prototype.settings')
+    django.setup()
+    if env_flag('RUN_MIGRATIONS', True):
+        call_command('migrate', interactive=False)
+    if env_flag('COLLECTSTATIC', True):
+        call_command('collectstatic_if_changed')
+    # Multiprocess metrics: start from zero, not from the previous run's workers
+    metrics_dir = os.environ.get('METRICS_DIR')
+    if metrics_dir:
+        os.makedirs(metrics_dir, exist_ok=True)
+        for name in os.listdir(metrics_dir):
+            if name.endswith(('.json', '.tmp')):
+                os.remove(os.path.join(metrics_dir, name))
+    # Workers must not inherit the master's database connections
+    connections.close_all()
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        from tapnote.warmup import warm_up
+        warm_up()
+
+
+def post_worker_init(worker):
+    if not worker.cfg.preload_app:
+        from tapnote.warmup import warm_up
+        warm_up()
+
+
+def worker_exit(server, worker):
+    # Keep the exiting worker's last counts in the multiprocess metrics directory
+    from tapnote.metrics import REGISTRY
+    REGISTRY.flush()
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 import os
 import dj_database_url
 from pathlib import Path
+from tapnote.limits import MAX_REQUEST_BODY_SIZE
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -46,13 +47,21 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    # Static files are answered here, before sessions/CSRF/auth run
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # Removes itself unless INSTRUMENTATION_SAMPLE_RATE > 0
+    'tapnote.instrumentation.InstrumentationMiddleware',
+    'tapnote.metrics.MetricsMiddleware',
+    # tapnote.middleware.* are Django's session/auth/messages middleware, skipped for
+    # @sessionless API views
+    'tapnote.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'tapnote.middleware.AuthenticationMiddleware',
+    # Needs request.user: staff requests with an X-Profile header run under cProfile
+    'tapnote.profiling.ProfilingMiddleware',
+    'tapnote.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
 ]
 
 ROOT_URLCONF = 'prototype.urls'
@@ -87,6 +96,30 @@ DATABASES = {
 }
 
 
+# SQLite tuning, applied to every new connection by tapnote.db.configure_sqlite.
+# WAL lets readers proceed while a worker writes; busy_timeout (ms) waits for locks
+# instead of failing with "database is locked". Set a variable to '' to skip that pragma.
+# busy_timeout comes first because switching to WAL needs a lock.
+SQLITE_PRAGMAS = {
+    'busy_timeout': os.environ.get('SQLITE_BUSY_TIMEOUT', '5000'),
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'mmap_size': os.environ.get('SQLITE_MMAP_SIZE', str(128 * 1024 * 1024)),
+    'cache_size': os.environ.get('SQLITE_CACHE_SIZE', '-20000'),  # negative = KiB
+    'temp_store': os.environ.get('SQLITE_TEMP_STORE', 'MEMORY'),
+}
+
+# Note content compression on SQLite (tapnote.fields.CompressedTextField): 'zlib',
+# 'zstd' (needs the zstandard package) or '' to store new content uncompressed.
+# Existing rows keep whatever form they were written in and read either way; run
+# `python manage.py recompress_notes` after changing this to rewrite them (it skips
+# rows already in the right form, so it can be rerun or interrupted).
+# Compressed rows are opaque to content lookups (content__icontains, the admin
+# search fallback without FTS5) and to raw SQL, so this is off by default.
+NOTE_COMPRESSION = os.environ.get('NOTE_COMPRESSION', '')
+# Shorter content is stored as plain text
+NOTE_COMPRESSION_MIN_LENGTH = int(os.environ.get('NOTE_COMPRESSION_MIN_LENGTH', '512'))
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -106,6 +139,9 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Django's own body check (default 2.5 MB) must let through what tapnote.limits allows
+DATA_UPLOAD_MAX_MEMORY_SIZE = MAX_REQUEST_BODY_SIZE
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
 
@@ -126,6 +162,19 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
 
+# collectstatic writes content-hashed, precompressed copies (see tapnote.storage);
+# WhiteNoise serves the hashed names with a far-future immutable Cache-Control.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'tapnote.storage.StaticFilesStorage',
+    },
+}
+# Cache lifetime for files without a hash in their name (favicon.ico, direct links)
+WHITENOISE_MAX_AGE = int(os.environ.get('WHITENOISE_MAX_AGE', '0' if DEBUG else '3600'))
+
 # Add media files configuration
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -140,4 +189,100 @@ CSRF_TRUSTED_ORIGINS = os.environ.get('CSRF_TRUSTED_ORIGINS', 'https://tapnote-p
 
 # Comment System (Paranote) Configuration
 # Set to 'False' to disable comments
-ENABLE_COMMENTS = os.environ.get('ENABLE_COMMENTS', 'True') == 'True'
\ No newline at end of file
+ENABLE_COMMENTS = os.environ.get('ENABLE_COMMENTS', 'True') == 'True'
+# Note pages embed their per-paragraph comment counts (cached, tapnote.comments) so
+# paranote.js draws its badges without waiting for /api/v1/comments. Notes with at
+# most INLINE_COMMENTS_LIMIT comments embed the comments themselves and paranote.js
+# skips the request; 0 embeds counts only.
+INLINE_COMMENT_COUNTS = os.environ.get('INLINE_COMMENT_COUNTS', 'True') == 'True'
+INLINE_COMMENTS_LIMIT = int(os.environ.get('INLINE_COMMENTS_LIMIT', '50'))
+COMMENT_COUNTS_TIMEOUT = int(os.environ.get('COMMENT_COUNTS_TIMEOUT', str(24 * 3600)))
+
+# Async read views (tapnote.async_views) for view_note, getPage, getViews and comment GETs.
+# prototype/asgi.py turns this on; WSGI deployments keep the sync views.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'False') == 'True'
+# Threads available to async views for markdown rendering
+ASYNC_RENDER_WORKERS = int(os.environ.get('ASYNC_RENDER_WORKERS', '4'))
+
+# Markdown converters, kept per thread and reused by tapnote.converters.
+# Name -> keyword arguments for markdown.Markdown(); 'note' renders view_note,
+# 'telegraph' feeds markdown_to_nodes. tapnote.markdown_extensions provides strikethrough,
+# link targets and YouTube embeds for note pages.
+MARKDOWN_CONVERTERS = {
+    'note': {'extensions': ['fenced_code', 'tables', 'footnotes', 'tapnote.markdown_extensions']},
+    'telegraph': {'extensions': []},
+}
+
+# Markdown rendering pool (tapnote.rendering). Notes of at least RENDER_POOL_MIN_LENGTH
+# characters are converted in separate processes with a time limit (seconds) and an
+# address-space cap; on failure the page shows escaped plain text instead.
+# Off (0, everything rendered inline) by default: every pooled render pays for
+# pickling the note and the HTML across processes, the pool adds RENDER_POOL_WORKERS
+# processes to every gunicorn worker, and the block render cache already keeps
+# repeat views from converting anything. Turn it on where untrusted notes could
+# make the converter run away and a page falling back to plain text beats a stuck
+# worker.
+RENDER_POOL_WORKERS = int(os.environ.get('RENDER_POOL_WORKERS', '0'))
+RENDER_TIMEOUT = float(os.environ.get('RENDER_TIMEOUT', '3'))
+RENDER_MEMORY_LIMIT_MB = int(os.environ.get('RENDER_MEMORY_LIMIT_MB', '512'))
+RENDER_POOL_MIN_LENGTH = int(os.environ.get('RENDER_POOL_MIN_LENGTH', '2000'))
+# Block render cache (tapnote.blocks): view_note keeps each note's rendered top-level
+# blocks in the cache below and converts only new or edited blocks. It assumes the
+# 'note' converter's extensions render blocks independently (footnotes and reference
+# links are handled); set to 'False' if you add document-wide ones such as toc.
+RENDER_BLOCK_CACHE = os.environ.get('RENDER_BLOCK_CACHE', 'True') == 'True'
+RENDER_BLOCK_CACHE_TIMEOUT = int(os.environ.get('RENDER_BLOCK_CACHE_TIMEOUT', str(7 * 24 * 3600)))
+# Note pages of notes with at least STREAM_NOTE_MIN_LENGTH characters are streamed: the
+# page head goes out first, then the note body in chunks from the block cache (blocks
+# missing from it are converted as the stream reaches them). Needs RENDER_BLOCK_CACHE;
+# 0 turns streaming off.
+STREAM_NOTE_MIN_LENGTH = int(os.environ.get('STREAM_NOTE_MIN_LENGTH', '65536'))
+
+# Cache
+# LocMemCache is per process; point CACHE_BACKEND/CACHE_LOCATION at a shared backend
+# (e.g. django.core.cache.backends.filebased.FileBasedCache) when running several workers
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# Number of reverse proxies in front of the app that append to X-Forwarded-For
+# (e.g. 1 behind a single nginx). 0 ignores the header, since clients can set it.
+TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', '0'))
+
+# Rate limiting (request counter per client IP and fixed window, stored in the cache above)
+# Each scope maps to (requests allowed per window, window length in seconds)
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'True') == 'True'
+RATE_LIMITS = {
+    'create_account': (int(os.environ.get('RATE_LIMIT_CREATE_ACCOUNT', '20')), 3600),
+    'create_page': (int(os.environ.get('RATE_LIMIT_CREATE_PAGE', '120')), 60),
+    'comment': (int(os.environ.get('RATE_LIMIT_COMMENT', '20')), 60),
+}
+
+# Request instrumentation (tapnote.instrumentation): fraction of requests, 0 to 1, that
+# get DB/markdown/template/cache timings as a Server-Timing header and a log record on
+# the 'tapnote.instrumentation' logger. 0 disables the middleware and the query recorder.
+INSTRUMENTATION_SAMPLE_RATE = float(os.environ.get('INSTRUMENTATION_SAMPLE_RATE', '0'))
+# Set to 'False' to keep the timings in the logs only
+INSTRUMENTATION_SERVER_TIMING = os.environ.get('INSTRUMENTATION_SERVER_TIMING', 'True') == 'True'
+
+# Aggregate metrics (tapnote.metrics), served in Prometheus text format at /metrics to
+# staff users or to requests with "Authorization: Bearer <METRICS_TOKEN>". Off by
+# default: each observation takes a lock, on every request.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'False') == 'True'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# With several worker processes, point METRICS_DIR at a private writable directory:
+# each worker writes its numbers there and /metrics sums them. Empty = this process only.
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '1'))
+
+# On-demand profiling (tapnote.profiling): staff requests sent with an "X-Profile" header
+# (or ?_profile=) run under cProfile and return a hot-function table, or with
+# "X-Profile: store" save the profile to PROFILING_DIR. One request per process is
+# profiled at a time. Profiles expose code paths: keep PROFILING_DIR out of any
+# served directory (MEDIA_ROOT is served when DEBUG is on).
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'False') == 'True'
+PROFILING_DIR = os.environ.get('PROFILING_DIR', str(BASE_DIR / 'profiles'))
+PROFILING_SUMMARY_LINES = int(os.environ.get('PROFILING_SUMMARY_LINES', '40'))
@@ -22,6 +22,11 @@ from django.conf import settings
 
 handler404 = 'tapnote.views.handler404'
 
+if settings.ASYNC_VIEWS:
+    from tapnote import async_views as read_views
+else:
+    read_views = views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', views.home, name='home'),
@@ -30,20 +35,22 @@ urlpatterns = [
     path('migration/', views.migration, name='migration'),
     path('migration/export/', views.export_data, name='export_data'),
     path('migration/import/', views.import_data, name='import_data'),
-    path('api/v1/comments', views.api_comments, name='api_comments'),
+    path('api/v1/comments', read_views.api_comments, name='api_comments'),
     path('api/v1/comments/like', views.api_like_comment, name='api_like_comment'),
     path('api/v1/ban', views.api_ban, name='api_ban'),
+    path('api/v1/search', views.api_search, name='api_search'),
+    path('metrics', views.metrics, name='metrics'),
     path('createAccount', views.api_create_account, name='api_create_account'),
     path('editPage', views.api_edit_page, name='api_edit_page'),
     path('editPage/<str:path>', views.api_edit_page, name='api_edit_page_with_path'),
     path('getAccountInfo', views.api_get_account_info, name='api_get_account_info'),
     path('revokeAccessToken', views.api_revoke_access_token, name='api_revoke_access_token'),
     path('getPageList', views.api_get_page_list, name='api_get_page_list'),
-    path('getViews', views.api_get_views, name='api_get_views'),
-    path('getViews/<str:path>', views.api_get_views, name='api_get_views_with_path'),
+    path('getViews', read_views.api_get_views, name='api_get_views'),
+    path('getViews/<str:path>', read_views.api_get_views, name='api_get_views_with_path'),
     path('createPage', views.api_create_page, name='api_create_page'),
-    path('getPage', views.api_get_page, name='api_get_page'),
-    path('getPage/<str:path>', views.api_get_page, name='api_get_page_with_path'),
-    path('<str:hashcode>/', views.view_note, name='view_note'),
+    path('getPage', read_views.api_get_page, name='api_get_page'),
+    path('getPage/<str:path>', read_views.api_get_page, name='api_get_page_with_path'),
+    path('<str:hashcode>/', read_views.view_note, name='view_note'),
     path('<str:hashcode>/edit/', views.edit_note, name='edit_note'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
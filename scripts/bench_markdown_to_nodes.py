@@ -0,0 +1,61 @@
+import argparse
+import os
+import random
+import sys
+import timeit
+
+# Allow running from a checkout without installing anything
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tapnote.telegraph import markdown_to_nodes, markdown_to_nodes_html
+
+WORDS = (
+    "the quiet river ran past the old mill while **lanterns** swayed in the *wind* "
+    "and `code` fragments [linked](https://example.com/page?a=1&b=2) to distant shores"
+).split()
+
+
+def make_chapter(size, seed=0):
+    """Build a synthetic chapter of roughly `size` characters of mixed markdown."""
+    rng = random.Random(seed)
+    blocks = []
+    total = 0
+    while total < size:
+        roll = rng.random()
+        sentence = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(20, 80)))
+        if roll < 0.05:
+            block = f"### {sentence[:60]}"
+        elif roll < 0.12:
+            block = '\n'.join(f"- {sentence[:40]}" for _ in range(4))
+        elif roll < 0.16:
+            block = f"> {sentence}"
+        elif roll < 0.18:
+            block = "---"
+        else:
+            block = sentence
+        blocks.append(block)
+        total += len(block) + 2
+    return '\n\n'.join(blocks)
+
+
+def bench(sizes, repeat):
+    print(f"{'size':>10} {'html (ms)':>12} {'tree (ms)':>12} {'speedup':>9}")
+    for size in sizes:
+        text = make_chapter(size)
+        if markdown_to_nodes(text) != markdown_to_nodes_html(text):
+            print(f"❌ Engines disagree for {size} byte chapter")
+            sys.exit(1)
+        html_time = min(timeit.repeat(lambda: markdown_to_nodes_html(text), number=1, repeat=repeat))
+        tree_time = min(timeit.repeat(lambda: markdown_to_nodes(text), number=1, repeat=repeat))
+        print(f"{size:>10} {html_time * 1000:>12.2f} {tree_time * 1000:>12.2f} {html_time / tree_time:>8.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare markdown_to_nodes engines on large chapters.")
+    parser.add_argument("--sizes", default="1000,20000,100000,200000",
+                        help="Comma-separated chapter sizes in characters (default: 1000,20000,100000,200000)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions per size (default: 5)")
+
+    args = parser.parse_args()
+
+    bench([int(s) for s in args.sizes.split(',')], args.repeat)
@@ -0,0 +1,52 @@
+import argparse
+import os
+import random
+import sys
+import timeit
+
+import markdown
+
+# Allow running from a checkout without installing anything
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_markdown_to_nodes import make_chapter
+from tapnote.rendering import apply_strikethrough, process_markdown_links, render_note_html
+
+LEGACY = markdown.Markdown(extensions=['fenced_code', 'tables', 'footnotes'])
+
+
+def legacy_render(content, link_target):
+    """The pre-extension pipeline: regex strikethrough, markdown, then regex link passes."""
+    LEGACY.reset()
+    return process_markdown_links(LEGACY.convert(apply_strikethrough(content)), target=link_target)
+
+
+def make_note(size, seed=0):
+    """A chapter with struck-out phrases and standalone YouTube links mixed in."""
+    rng = random.Random(seed)
+    blocks = make_chapter(size, seed).split('\n\n')
+    for i in range(0, len(blocks), 7):
+        blocks[i] = blocks[i].replace('wind', '~~wind~~')
+    for i in range(3, len(blocks), 25):
+        blocks.insert(i, f"https://youtu.be/{rng.randrange(10 ** 8):08d}")
+    return '\n\n'.join(blocks)
+
+
+def bench(sizes, repeat):
+    print(f"{'size':>10} {'regex (ms)':>12} {'tree (ms)':>12} {'speedup':>9}")
+    for size in sizes:
+        text = make_note(size)
+        legacy_time = min(timeit.repeat(lambda: legacy_render(text, '_blank'), number=1, repeat=repeat))
+        tree_time = min(timeit.repeat(lambda: render_note_html(text, '_blank'), number=1, repeat=repeat))
+        print(f"{size:>10} {legacy_time * 1000:>12.2f} {tree_time * 1000:>12.2f} {legacy_time / tree_time:>8.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare regex and treeprocessor note rendering on large notes.")
+    parser.add_argument("--sizes", default="1000,20000,100000,200000",
+                        help="Comma-separated note sizes in characters (default: 1000,20000,100000,200000)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions per size (default: 5)")
+
+    args = parser.parse_args()
+
+    bench([int(s) for s in args.sizes.split(',')], args.repeat)
@@ -0,0 +1,115 @@
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+# Allow running from a checkout without installing anything
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tapnote.db import apply_pragmas
+
+# Mirrors the defaults in prototype/settings.py SQLITE_PRAGMAS
+TUNED_PRAGMAS = {
+    'busy_timeout': '5000',
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': str(128 * 1024 * 1024),
+    'cache_size': '-20000',
+    'temp_store': 'MEMORY',
+}
+
+NOTE_COUNT = 200
+
+
+def connect(path, pragmas):
+    # Same busy timeout Django uses by default for SQLite (5s)
+    conn = sqlite3.connect(path, timeout=5)
+    apply_pragmas(conn.cursor(), pragmas)
+    return conn
+
+
+def setup_database(path, pragmas):
+    conn = connect(path, pragmas)
+    conn.executescript("""
+        CREATE TABLE note (id INTEGER PRIMARY KEY, hashcode TEXT UNIQUE, content TEXT, views INTEGER);
+        CREATE TABLE comment (id INTEGER PRIMARY KEY, work_id TEXT, para_index INTEGER, content TEXT);
+    """)
+    body = 'lorem ipsum ' * 2000
+    conn.executemany(
+        'INSERT INTO note (hashcode, content, views) VALUES (?, ?, 0)',
+        [(f'note{i:04d}', body) for i in range(NOTE_COUNT)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def reader(path, pragmas, deadline, results):
+    conn = connect(path, pragmas)
+    ops = errors = 0
+    i = 0
+    while time.time() < deadline:
+        try:
+            conn.execute('SELECT content, views FROM note WHERE hashcode = ?', (f'note{i % NOTE_COUNT:04d}',)).fetchone()
+            ops += 1
+        except sqlite3.OperationalError:
+            errors += 1
+        i += 1
+    results.put(('read', ops, errors))
+
+
+def writer(path, pragmas, deadline, results):
+    conn = connect(path, pragmas)
+    ops = errors = 0
+    i = 0
+    while time.time() < deadline:
+        hashcode = f'note{i % NOTE_COUNT:04d}'
+        try:
+            # One views increment plus one comment insert, like view_note and api_comments
+            with conn:
+                conn.execute('UPDATE note SET views = views + 1 WHERE hashcode = ?', (hashcode,))
+                conn.execute('INSERT INTO comment (work_id, para_index, content) VALUES (?, ?, ?)',
+                             (hashcode, i % 50, 'nice chapter'))
+            ops += 1
+        except sqlite3.OperationalError:
+            errors += 1
+        i += 1
+    results.put(('write', ops, errors))
+
+
+def run_profile(name, pragmas, readers, writers, duration):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'load.sqlite3')
+        setup_database(path, pragmas)
+
+        results = multiprocessing.Queue()
+        deadline = time.time() + duration
+        procs = [multiprocessing.Process(target=reader, args=(path, pragmas, deadline, results)) for _ in range(readers)]
+        procs += [multiprocessing.Process(target=writer, args=(path, pragmas, deadline, results)) for _ in range(writers)]
+        for p in procs:
+            p.start()
+        totals = {'read': [0, 0], 'write': [0, 0]}
+        for _ in procs:
+            kind, ops, errors = results.get()
+            totals[kind][0] += ops
+            totals[kind][1] += errors
+        for p in procs:
+            p.join()
+
+    print(f"{name:>8} {totals['read'][0] / duration:>12.0f} {totals['write'][0] / duration:>12.0f} "
+          f"{totals['read'][1] + totals['write'][1]:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare SQLite read/write throughput with default vs tuned pragmas.")
+    parser.add_argument("--readers", type=int, default=4, help="Reader processes (default: 4)")
+    parser.add_argument("--writers", type=int, default=2, help="Writer processes (default: 2)")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per profile (default: 5)")
+
+    args = parser.parse_args()
+
+    print(f"{'profile':>8} {'reads/s':>12} {'writes/s':>12} {'errors':>8}")
+    run_profile('default', {}, args.readers, args.writers, args.duration)
+    run_profile('tuned', TUNED_PRAGMAS, args.readers, args.writers, args.duration)
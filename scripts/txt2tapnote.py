@@ -1,84 +1,380 @@
+"""
+Upload text files to TapNote as notes, one file or tens of thousands.
+
+    python scripts/txt2tapnote.py book.txt
+    python scripts/txt2tapnote.py books/ 'more/**/*.txt' --workers 8
+    python scripts/txt2tapnote.py books/ --api telegraph --access-token TOKEN
+
+Arguments are files, directories (searched recursively for --pattern) and glob
+patterns. Texts longer than --max-chars are split at chapter headings (or at
+paragraphs when a single chapter is too long) and each part becomes its own note.
+With --api telegraph a part is sized on the markdown the server stores for its
+nodes, where every line break takes three characters.
+
+Uploads share one pooled requests.Session and run on a pool of worker threads.
+Connection errors, 429 (honouring Retry-After / FLOOD_WAIT_n) and 5xx responses
+are retried with exponential backoff. Every uploaded part is appended to the
+manifest (JSON lines) with its URL and edit token; rerunning the same command
+skips what the manifest already has, so an interrupted run resumes where it
+stopped. Edited files (new size or mtime) are uploaded again.
+"""
 import argparse
-import requests
+import glob
+import json
 import os
+import random
+import re
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Mirror MAX_CONTENT_LENGTH and MAX_NODE_COUNT in tapnote/limits.py
+MAX_CHARS = 200000
+MAX_NODES = 50000
+
+# Lines that start a chapter: markdown headings, 第十二章 / 第3回 / 卷一, Chapter 12 / Part IV
+CHAPTER_RE = re.compile(
+    r'^[ \t]*(?:#{1,6}[ \t]+\S'
+    r'|第[0-9０-９零〇一二三四五六七八九十百千万两]+[章节回卷部篇集]'
+    r'|卷[0-9零〇一二三四五六七八九十百千万两]+'
+    r'|(?:chapter|part|book|volume)[ \t]+(?:\d+|[ivxlcdm]+)\b)',
+    re.IGNORECASE | re.MULTILINE,
+)
+PARAGRAPH_RE = re.compile(r'\n[ \t]*\n')
+FLOOD_WAIT_RE = re.compile(r'FLOOD_WAIT_(\d+)')
+GLOB_CHARS = re.compile(r'[*?[]')
+
+
+class UploadError(Exception):
+    """An upload that failed for good (retrying will not help)."""
+
+
+class RetryableError(Exception):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
 
-def convert_txt_to_tapnote(file_path, server_url, public_domain=None):
+def collect_files(inputs, pattern):
+    """Files named by inputs (paths, directories, globs), in order, without duplicates."""
+    files, seen = [], set()
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = sorted(glob.glob(os.path.join(glob.escape(item), '**', pattern), recursive=True))
+        elif GLOB_CHARS.search(item) and not os.path.exists(item):
+            matches = sorted(glob.glob(item, recursive=True))
+        else:
+            matches = [item]
+        for path in matches:
+            key = os.path.abspath(path)
+            if key not in seen and (os.path.isfile(path) or path == item):
+                seen.add(key)
+                files.append(path)
+    return files
+
+
+def _pieces(text, max_chars):
+    """text cut at chapters, then paragraphs, then lines, then anywhere, into pieces <= max_chars."""
+    starts = [m.start() for m in CHAPTER_RE.finditer(text) if m.start() > 0]
+    chapters = [text[i:j] for i, j in zip([0] + starts, starts + [len(text)])]
+    for chapter in chapters:
+        if len(chapter) <= max_chars:
+            yield chapter
+            continue
+        for regex in (PARAGRAPH_RE, re.compile(r'\n')):
+            cuts = [m.end() for m in regex.finditer(chapter)]
+            if cuts:
+                break
+        start = 0
+        for cut in cuts + [len(chapter)]:
+            while cut - start > max_chars:
+                yield chapter[start:start + max_chars]  # no break point in reach
+                start += max_chars
+            yield chapter[start:cut]
+            start = cut
+
+
+def _pack(text, max_chars):
+    """Pieces of text packed into parts of at most max_chars, stripped."""
+    parts, current = [], ''
+    for piece in _pieces(text, max_chars):
+        if current and len(current) + len(piece) > max_chars:
+            parts.append(current)
+            current = ''
+        current += piece
+    parts.append(current)
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _fit(part, max_chars, size):
+    """part, or its pieces when size(part) is over max_chars."""
+    part_size = size(part)
+    if part_size <= max_chars or len(part) == 1:
+        return [part]
+    # Denser than its length (short lines): pack it again into proportionally shorter parts
+    chars = max(len(part) * max_chars // part_size, 1)
+    return [fitted for piece in _pack(part, chars) for fitted in _fit(piece, max_chars, size)]
+
+
+def split_text(text, max_chars=MAX_CHARS, size=len):
     """
-    Reads a text file and posts it to TapNote to create a new page.
+    Parts of text, each at most max_chars by size() after stripping, cut on chapter
+    boundaries where possible.
     """
-    if not os.path.exists(file_path):
-        print(f"❌ Error: File not found: {file_path}")
-        return
+    return [fitted for part in _pack(text, max_chars) for fitted in _fit(part, max_chars, size)]
 
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-    except Exception as e:
-        print(f"❌ Error reading file: {e}")
-        return
 
-    if not content.strip():
-        print("❌ Error: File is empty.")
-        return
+def text_to_nodes(text):
+    """Telegraph nodes for plain text: a <p> per paragraph, <br> between its lines."""
+    nodes = []
+    for paragraph in PARAGRAPH_RE.split(text):
+        lines = [line.strip() for line in paragraph.strip().split('\n')]
+        if not lines[0]:
+            continue
+        children = [lines[0]]
+        for line in lines[1:]:
+            children += [{'tag': 'br'}, line]
+        nodes.append({'tag': 'p', 'children': children})
+    return nodes
 
-    publish_url = f"{server_url.rstrip('/')}/publish/"
-    
-    print(f"📤 Uploading '{file_path}' to {publish_url}...")
 
-    try:
-        # Send POST request
-        # allow_redirects=False to capture the 302 Location header directly
-        response = requests.post(publish_url, data={'content': content}, allow_redirects=False)
-        
-        if response.status_code == 302:
-            location = response.headers.get('Location')
-            # Location is likely relative, e.g., '/<hashcode>/'
-            
-            base_url = public_domain.rstrip('/') if public_domain else server_url.rstrip('/')
-            
-            if location.startswith('http'):
-                # If server returned full URL, and we want to force a domain
-                if public_domain:
-                    # Replace protocol and domain
-                    # Simple way: split by / and replace first part?
-                    # Or just use hashcode if we can extract it.
-                    # location format: http://host/hash/
-                    parts = location.split('/')
-                    # parts[-2] should be hashcode if ends with /
-                    # http://host/hash/ -> ['http:', '', 'host', 'hash', '']
-                    if len(parts) >= 4:
-                         # Reconstruct using public_domain + path
-                         path = '/' + '/'.join(parts[3:])
-                         full_url = f"{base_url}{path}"
-                    else:
-                         full_url = location # Fallback
-                else:
-                    full_url = location
-            else:
-                full_url = f"{base_url}{location}"
-            
-            print(f"✅ Successfully published!")
-            print(f"🔗 URL: {full_url}")
-            
-        elif response.status_code == 200:
-            # If it didn't redirect, maybe it returned the editor with an error (e.g. too long)
-            print(f"⚠️  Server returned 200 OK (did not redirect). Check for errors.")
-            if "Error!" in response.text:
-                print("   Server reported an error in the response HTML.")
-        else:
-            print(f"❌ Failed to publish. Status Code: {response.status_code}")
-            print(f"   Response: {response.text[:200]}...")
+def telegraph_size(text):
+    """
+    The size of text_to_nodes(text) against the server's limits, in characters: the
+    length of the markdown stored for it (nodes_to_markdown ends a <p> with a blank
+    line and turns a <br> into "  \\n"), or the node count scaled to MAX_CHARS when
+    that is larger.
+    """
+    length = count = 0
+    for node in text_to_nodes(text):
+        count += 1 + len(node['children'])
+        length += 2 + sum(3 if isinstance(child, dict) else len(child) for child in node['children'])
+    return max(length, count * MAX_CHARS // MAX_NODES)
 
-    except Exception as e:
-        print(f"❌ Request failed: {e}")
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Convert a text file to a TapNote page.")
-    parser.add_argument("file", help="Path to the text file to convert")
+class Manifest:
+    """Append-only JSON lines of uploaded parts; the latest record per file and part wins."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.records = {}
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line of an interrupted run
+                    self.records[(record['file'], record['part'])] = record
+        self._file = open(path, 'a', encoding='utf-8') if path else None
+
+    def done(self, key, stat, part):
+        """The record of part of the file if it was uploaded from the same version of the file."""
+        record = self.records.get((key, part))
+        if record and record['size'] == stat.st_size and record['mtime_ns'] == stat.st_mtime_ns:
+            return record
+        return None
+
+    def add(self, record):
+        with self.lock:
+            self.records[(record['file'], record['part'])] = record
+            if self._file:
+                self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+                self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+
+
+class Uploader:
+    def __init__(self, args):
+        self.args = args
+        self.server = args.server.rstrip('/')
+        self.session = requests.Session()
+        # publish sets an edit token cookie per note; keep them out of later requests
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=args.workers, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def public_url(self, url):
+        """url on --domain, when given."""
+        if not self.args.domain:
+            return url
+        parts = urlsplit(url)
+        path = parts.path + (f'?{parts.query}' if parts.query else '')
+        return self.args.domain.rstrip('/') + path
+
+    def post(self, url, **kwargs):
+        """One attempt; returns the response or raises UploadError / RetryableError."""
+        try:
+            response = self.session.post(url, timeout=self.args.timeout, allow_redirects=False, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise RetryableError(f'{type(e).__name__}: {e}')
+        if response.status_code == 429 or response.status_code >= 500:
+            retry_after = response.headers.get('Retry-After')
+            flood = FLOOD_WAIT_RE.search(response.text[:200])
+            wait = int(retry_after) if retry_after and retry_after.isdigit() else (int(flood.group(1)) if flood else None)
+            raise RetryableError(f'HTTP {response.status_code}', wait)
+        if response.status_code == 413:
+            raise UploadError('HTTP 413: content too large for the server (lower --max-chars)')
+        return response
+
+    def publish(self, content, title):
+        """Upload through the web editor's /publish/ form."""
+        response = self.post(f'{self.server}/publish/', data={
+            'content': content, 'title': title, 'author': self.args.author, 'link_target': self.args.link_target,
+        })
+        if response.status_code != 302:
+            # The editor page comes back (200) when the server refuses the content
+            raise UploadError(f'HTTP {response.status_code}: not published (content over the server limit?)')
+        location = response.headers['Location']
+        url = location if location.startswith('http') else self.server + location
+        hashcode = urlsplit(url).path.strip('/').split('/')[-1]
+        record = {'path': hashcode, 'url': self.public_url(url)}
+        token = response.cookies.get(f'edit_token_{hashcode}')
+        if token:
+            record['edit_token'] = token
+        return record
+
+    def create_page(self, content, title):
+        """Upload through the Telegraph-compatible createPage API."""
+        response = self.post(f'{self.server}/createPage', json={
+            'access_token': self.args.access_token,
+            'title': title,
+            'author_name': self.args.author,
+            'content': text_to_nodes(content),
+        })
+        try:
+            data = response.json()
+        except ValueError:
+            raise UploadError(f'HTTP {response.status_code}: not a JSON response')
+        if not data.get('ok'):
+            error = str(data.get('error'))
+            flood = FLOOD_WAIT_RE.search(error)
+            if flood:
+                raise RetryableError(error, int(flood.group(1)))
+            raise UploadError(error)
+        result = data['result']
+        return {'path': result['path'], 'url': self.public_url(result['url'])}
+
+    def upload(self, content, title):
+        send = self.create_page if self.args.api == 'telegraph' else self.publish
+        for attempt in range(self.args.retries + 1):
+            try:
+                return send(content, title)
+            except RetryableError as e:
+                if attempt == self.args.retries:
+                    raise UploadError(f'{e} (gave up after {attempt + 1} attempts)')
+                delay = min(self.args.backoff * 2 ** attempt, 60) * random.uniform(0.5, 1.5)
+                time.sleep(max(delay, e.retry_after or 0))
+
+    def upload_file(self, path, manifest):
+        """
+        Upload the parts of path not yet in the manifest: (the file's records in part
+        order, none if it is empty; number of parts uploaded now).
+        """
+        key = os.path.abspath(path)
+        stat = os.stat(path)
+        with open(path, encoding=self.args.encoding) as f:
+            text = f.read().replace('\r\n', '\n').replace('\r', '\n')
+        parts = split_text(text, self.args.max_chars, telegraph_size if self.args.api == 'telegraph' else len)
+
+        stem = os.path.splitext(os.path.basename(path))[0]
+        records, sent = [], 0
+        for i, content in enumerate(parts):
+            record = manifest.done(key, stat, i)
+            if record is None or record['parts'] != len(parts):
+                title = stem if len(parts) == 1 else f'{stem} ({i + 1}/{len(parts)})'
+                record = {
+                    'file': key, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                    'part': i, 'parts': len(parts), 'title': title,
+                    **self.upload(content, title),
+                }
+                manifest.add(record)
+                sent += 1
+            records.append(record)
+        return records, sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload text files to TapNote as notes.")
+    parser.add_argument("paths", nargs='+', help="Text files, directories or glob patterns")
     parser.add_argument("--server", default="http://localhost:9009", help="TapNote server URL (default: http://localhost:9009)")
     parser.add_argument("--domain", help="Public domain to use in the output URL (e.g. https://mynote.com). Useful if deploying behind a proxy.")
-    
+    parser.add_argument("--pattern", default="*.txt", help="File pattern searched for in directories (default: *.txt)")
+    parser.add_argument("--api", choices=['publish', 'telegraph'], default='publish',
+                        help="publish: the web editor's form; telegraph: the createPage API (needs --access-token)")
+    parser.add_argument("--access-token", help="Telegraph account access token for --api telegraph")
+    parser.add_argument("--author", default='', help="Author name for the notes")
+    parser.add_argument("--link-target", default='_self', choices=['_self', '_blank'], help="Link target for --api publish")
+    parser.add_argument("--max-chars", type=int, default=MAX_CHARS,
+                        help=f"Split texts into notes of at most this many characters (default: {MAX_CHARS})")
+    parser.add_argument("--encoding", default='utf-8-sig', help="Text file encoding (default: utf-8, BOM optional)")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent uploads (default: 4)")
+    parser.add_argument("--retries", type=int, default=5, help="Retries per upload on connection errors, 429 and 5xx (default: 5)")
+    parser.add_argument("--backoff", type=float, default=1.0, help="First retry delay in seconds, doubled per retry (default: 1)")
+    parser.add_argument("--timeout", type=float, default=60, help="Request timeout in seconds (default: 60)")
+    parser.add_argument("--manifest", default='txt2tapnote-manifest.jsonl',
+                        help="Manifest of uploaded files, used to resume (default: txt2tapnote-manifest.jsonl; '' to disable)")
     args = parser.parse_args()
-    
-    convert_txt_to_tapnote(args.file, args.server, args.domain)
+
+    if args.api == 'telegraph' and not args.access_token:
+        parser.error("--api telegraph requires --access-token")
+    if args.workers < 1 or args.max_chars < 1:
+        parser.error("--workers and --max-chars must be positive")
+
+    files = collect_files(args.paths, args.pattern)
+    if not files:
+        print("❌ Error: No files found.")
+        return 1
+
+    uploader = Uploader(args)
+    manifest = Manifest(args.manifest)
+    counts = {'uploaded': 0, 'resumed': 0, 'skipped': 0, 'failed': 0}
+    start = time.perf_counter()
+    print(f"📤 Uploading {len(files)} file(s) to {uploader.server} with {args.workers} worker(s)...")
+    executor = ThreadPoolExecutor(max_workers=args.workers)
+    try:
+        futures = {executor.submit(uploader.upload_file, path, manifest): path for path in files}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                records, sent = future.result()
+            except (UploadError, OSError, UnicodeDecodeError) as e:
+                counts['failed'] += 1
+                print(f"❌ {path}: {e}")
+                continue
+            if not records:
+                counts['skipped'] += 1
+                print(f"⏭️  {path}: empty, skipped")
+                continue
+            counts['uploaded' if sent else 'resumed'] += 1
+            for record in records:
+                part = '' if record['parts'] == 1 else f" [{record['part'] + 1}/{record['parts']}]"
+                print(f"✅ {path}{part}: {record['url']}")
+    except KeyboardInterrupt:
+        # Uploads already running finish and are recorded
+        executor.shutdown(wait=True, cancel_futures=True)
+        print("⚠️  Interrupted; rerun the same command to resume.")
+        return 130
+    finally:
+        executor.shutdown()
+        manifest.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Done in {elapsed:.1f}s: {counts['uploaded']} file(s) uploaded, "
+          f"{counts['resumed']} already in the manifest, {counts['skipped']} empty, {counts['failed']} failed.")
+    return 1 if counts['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -386,6 +386,23 @@
 
       // 缓存所有段落的评论数据
       let allCommentsData = null;
+      let allCommentsLoading = null;
+
+      // 页面内嵌的初始数据（view_note 渲染时写入）：各段评论数，评论较少时还有完整评论列表
+      function readInitialData() {
+          const id = root.dataset.initialData;
+          const el = id && document.getElementById(id);
+          if (!el) return null;
+          try {
+              return JSON.parse(el.textContent);
+          } catch (e) {
+              console.error("ParaNote: invalid initial data", e);
+              return null;
+          }
+      }
+      const initialData = readInitialData();
+      // 评论列表加载前用于显示徽章的段落评论数
+      const initialCounts = (initialData && initialData.counts) || null;
 
       // 模糊定位算法：将评论重新挂载到正确的段落
       function reanchorComments(serverData) {
@@ -473,6 +490,8 @@
       }
 
       async function loadComments(paraIndex, listEl, headerCountEl) {
+        // 徽章可能先于评论列表显示，等待首次加载完成
+        if (!allCommentsData && allCommentsLoading) await allCommentsLoading;
         const arr = (allCommentsData || {})[String(paraIndex)] || [];
 
         listEl.innerHTML = "";
@@ -996,7 +1015,9 @@
       // 更新段落评论数显示
       function updateCommentCounts() {
         paras.forEach(function (p, idx) {
-          const count = (allCommentsData || {})[String(idx)]?.length || 0;
+          const count = allCommentsData
+            ? allCommentsData[String(idx)]?.length || 0
+            : (initialCounts || {})[String(idx)] || 0;
           let badge = p.querySelector(".na-comment-count");
           if (!badge) {
             badge = document.createElement("span");
@@ -1135,10 +1156,16 @@
         }
       });
 
-      // 初始化：加载所有评论并更新计数
-      loadAllComments().then(function () {
+      // 初始化：页面已内嵌完整评论时直接使用，否则先按内嵌计数显示徽章，再加载所有评论
+      if (initialData && initialData.commentsByPara) {
+        allCommentsData = reanchorComments(initialData.commentsByPara);
         updateCommentCounts();
-      });
+      } else {
+        if (initialCounts) updateCommentCounts();
+        allCommentsLoading = loadAllComments().then(function () {
+          updateCommentCounts();
+        });
+      }
   } // End of init
 
   init();
@@ -1,8 +1,17 @@
 from django.contrib import admin
 from .models import Note, Comment
+from . import search
+
+class FullTextSearchMixin:
+    """Admin search through tapnote.search instead of LIKE over search_fields."""
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search.filter_queryset(queryset, search_term), False
 
 @admin.register(Note)
-class NoteAdmin(admin.ModelAdmin):
+class NoteAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('hashcode', 'short_content', 'created_at', 'updated_at')
     search_fields = ('content', 'hashcode')
     readonly_fields = ('hashcode', 'edit_token', 'created_at', 'updated_at')
@@ -11,7 +20,7 @@ class NoteAdmin(admin.ModelAdmin):
         return obj.content[:50] + '...' if len(obj.content) > 50 else obj.content
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('user_name', 'short_content', 'site_id', 'work_id', 'para_index', 'likes', 'created_at')
     list_filter = ('site_id', 'created_at')
     search_fields = ('content', 'user_name', 'work_id')
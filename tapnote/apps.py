@@ -0,0 +1,31 @@
+from django.apps import AppConfig
+
+
+class TapnoteConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'tapnote'
+
+    def ready(self):
+        from django.conf import settings
+        from django.contrib.auth import get_user_model
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save, pre_save
+        from .bootstrap import clear_setup_if_no_users
+        from .comments import clear_comment_counts
+        from .db import configure_sqlite
+        from .instrumentation import install_query_recorder
+        from .models import Note, Comment
+        from .paragraphs import remember_previous_content, update_paragraph_map
+        from .search import index_note, unindex_note
+
+        connection_created.connect(configure_sqlite, dispatch_uid='tapnote.configure_sqlite')
+        if settings.INSTRUMENTATION_SAMPLE_RATE:
+            connection_created.connect(install_query_recorder, dispatch_uid='tapnote.install_query_recorder')
+        post_delete.connect(clear_setup_if_no_users, sender=get_user_model(),
+                            dispatch_uid='tapnote.clear_setup_if_no_users')
+        post_save.connect(clear_comment_counts, sender=Comment, dispatch_uid='tapnote.clear_comment_counts_on_save')
+        post_delete.connect(clear_comment_counts, sender=Comment, dispatch_uid='tapnote.clear_comment_counts_on_delete')
+        pre_save.connect(remember_previous_content, sender=Note, dispatch_uid='tapnote.remember_previous_content')
+        post_save.connect(update_paragraph_map, sender=Note, dispatch_uid='tapnote.update_paragraph_map')
+        post_save.connect(index_note, sender=Note, dispatch_uid='tapnote.index_note')
+        post_delete.connect(unindex_note, sender=Note, dispatch_uid='tapnote.unindex_note')
@@ -0,0 +1,157 @@
+"""
+Native async variants of the read-heavy views, routed in place of the sync ones
+when ASYNC_VIEWS is on (the default under prototype/asgi.py).
+
+Database access uses Django's async ORM; CPU-bound markdown rendering runs on a
+small bounded thread pool so the event loop keeps serving other connections.
+Everything else (templates, meta extraction, response shapes) is shared with
+tapnote.views.
+"""
+import asyncio
+import contextvars
+import functools
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import models
+from django.http import Http404
+from .metrics import VIEW_COUNT_UPDATE
+from .middleware import sessionless
+from .models import Note, Comment, LikeRecord
+from .profiling import is_profiling
+from .rendering import render_note, render_nodes, iter_render_note
+from .responses import JsonResponse
+from . import views
+
+_render_executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_RENDER_WORKERS,
+    thread_name_prefix='tapnote-render',
+)
+
+
+async def run_in_render_pool(func, *args):
+    if is_profiling():
+        # Keep the render on the profiled event loop thread
+        return func(*args)
+    loop = asyncio.get_running_loop()
+    # run_in_executor does not carry context variables over (request metrics)
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_render_executor, functools.partial(context.run, func, *args))
+
+
+async def iter_note_body(note):
+    """The note's streamed page body, each chunk rendered on the render pool."""
+    # A sync iterator would be read to the end before the first byte under ASGI
+    chunks = iter_render_note(note.content, note.link_target, note.hashcode, views.PAGE_STREAM_CHUNK_SIZE)
+    while (chunk := await run_in_render_pool(next, chunks, None)) is not None:
+        yield chunk
+
+
+def async_csrf_exempt(view_func):
+    # django.views.decorators.csrf.csrf_exempt wraps in a sync function on Django 4.2,
+    # which would hide the coroutine from the handler
+    view_func.csrf_exempt = True
+    return view_func
+
+
+async def view_note(request, hashcode):
+    if not views.HASHCODE_RE.match(hashcode):
+        raise Http404()
+
+    try:
+        note = await Note.objects.aget(hashcode=hashcode)
+    except Note.DoesNotExist:
+        raise Http404()
+
+    comments = await sync_to_async(views.initial_comments)(request, note)
+    if views.stream_note_page(note):
+        response = views.streaming_note_page_response(request, note, iter_note_body(note), comments)
+    else:
+        html_content = await run_in_render_pool(render_note, note.content, note.link_target, note.hashcode)
+        response = views.note_page_response(request, note, html_content, comments)
+
+    start = time.perf_counter()
+    try:
+        await Note.objects.filter(pk=note.pk).aupdate(views=models.F('views') + 1)
+    except Exception:
+        pass
+    VIEW_COUNT_UPDATE.observe(time.perf_counter() - start)
+
+    return response
+
+
+@sessionless
+@async_csrf_exempt
+async def api_comments(request):
+    # Only the read path is native; writes keep the sync view (validation, rate limit, auth)
+    if request.method != 'GET' or not settings.ENABLE_COMMENTS:
+        return await sync_to_async(views.api_comments)(request)
+
+    site_id = request.GET.get('siteId')
+    work_id = request.GET.get('workId')
+    chapter_id = request.GET.get('chapterId')
+
+    if not all([site_id, work_id, chapter_id]):
+        return JsonResponse({'error': 'missing_params'}, status=400)
+
+    if not views.validate_id_field(site_id, 'siteId') or \
+       not views.validate_id_field(work_id, 'workId') or \
+       not views.validate_id_field(chapter_id, 'chapterId'):
+        return JsonResponse({'error': 'invalid_id_format'}, status=400)
+
+    comments_qs = Comment.objects.filter(site_id=site_id, work_id=work_id, chapter_id=chapter_id).order_by('created_at')
+    comments = [c async for c in comments_qs]
+
+    liked_comment_ids = set()
+    current_user_id = views.comment_reader_id(request, site_id)
+    if current_user_id and comments:
+        liked_qs = LikeRecord.objects.filter(user_id=current_user_id, comment__in=comments_qs) \
+            .values_list('comment_id', flat=True)
+        liked_comment_ids = {comment_id async for comment_id in liked_qs}
+
+    return JsonResponse({'commentsByPara': views.group_comments_by_para(comments, liked_comment_ids)})
+
+
+@sessionless
+@async_csrf_exempt
+async def api_get_page(request, path=None):
+    path, return_content = views.get_page_params(request, path)
+    if not path:
+        return JsonResponse({'ok': False, 'error': 'Path is required'}, status=400)
+
+    try:
+        note = await views.get_page_queryset(return_content).aget(hashcode=path)
+    except Note.DoesNotExist:
+        return JsonResponse({'ok': False, 'error': 'Page not found'}, status=404)
+
+    content_nodes = None
+    if return_content:
+        content_nodes = await run_in_render_pool(render_nodes, note.content)
+    return views.get_page_response(request, note, content_nodes)
+
+
+@sessionless
+@async_csrf_exempt
+async def api_get_views(request, path=None):
+    if request.method != 'POST':
+        return JsonResponse({'ok': False, 'error': 'POST required'}, status=405)
+
+    try:
+        if request.content_type == 'application/json':
+            data = json.loads(request.body)
+        else:
+            data = request.POST
+
+        path = data.get('path', path)
+        if not path:
+            return JsonResponse({'ok': False, 'error': 'PATH_REQUIRED'}, status=400)
+
+        views_count = await Note.objects.filter(hashcode=path).values_list('views', flat=True).afirst()
+        if views_count is None:
+            return JsonResponse({'ok': False, 'error': 'PAGE_NOT_FOUND'}, status=404)
+
+        return JsonResponse({'ok': True, 'result': {'views': views_count}})
+    except Exception as e:
+        return JsonResponse({'ok': False, 'error': str(e)}, status=500)
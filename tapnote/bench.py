@@ -0,0 +1,212 @@
+"""
+Benchmarks for the core request paths, run by `manage.py bench`.
+
+Each case is timed over several runs after a warm-up call, then run once more
+with query capture and tracemalloc to report the query count and peak Python
+memory. Seeding and the cases only use the current database; the management
+command takes care of creating and dropping a throwaway test database.
+"""
+import itertools
+import json
+import random
+import statistics
+import time
+import tracemalloc
+import uuid
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from .models import Note, Comment, LikeRecord, TelegraphAccount, DESCRIPTION_LENGTH
+from .telegraph import markdown_to_nodes, nodes_to_markdown
+from .views import comment_reader_id
+
+SCALES = {
+    'full': {
+        'note_sizes': (1_000, 20_000, 200_000),
+        'comment_counts': (10, 1_000, 50_000),
+        'account_pages': 100_000,
+    },
+    'quick': {
+        'note_sizes': (1_000, 20_000),
+        'comment_counts': (10, 1_000),
+        'account_pages': 2_000,
+    },
+}
+
+SITE_ID = 'bench'
+BATCH_SIZE = 5_000
+
+WORDS = (
+    "the quiet river ran past the old mill while lanterns swayed in the wind "
+    "and distant bells answered the ferryman across the grey water"
+).split()
+
+
+def make_markdown(size, seed=0):
+    """Roughly `size` characters of mixed markdown: headings, lists, quotes, code, links."""
+    rng = random.Random(seed)
+    blocks = []
+    total = 0
+    while total < size:
+        roll = rng.random()
+        sentence = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(20, 80)))
+        if roll < 0.05:
+            block = f"## {sentence[:60]}"
+        elif roll < 0.12:
+            block = '\n'.join(f"- {sentence[i * 30:i * 30 + 40]}" for i in range(4))
+        elif roll < 0.16:
+            block = f"> {sentence}"
+        elif roll < 0.19:
+            block = f"```\n{sentence[:120]}\n```"
+        else:
+            words = sentence.split()
+            words[rng.randrange(len(words))] = f"**{rng.choice(WORDS)}**"
+            words[rng.randrange(len(words))] = f"[{rng.choice(WORDS)}](https://example.com/{rng.randrange(1000)})"
+            words[rng.randrange(len(words))] = f"~~{rng.choice(WORDS)}~~"
+            block = ' '.join(words)
+        blocks.append(block)
+        total += len(block) + 2
+    return '\n\n'.join(blocks)
+
+
+def seed(scale):
+    """Create the notes, comment threads and page-heavy account the cases read."""
+    fixtures = {'notes': {}, 'chapters': {}}
+    for size in scale['note_sizes']:
+        fixtures['notes'][size] = Note.objects.create(content=make_markdown(size, seed=size), title=f'{size} bytes')
+
+    work = fixtures['notes'][scale['note_sizes'][0]]
+    reader = comment_reader_id(RequestFactory().get('/'), SITE_ID)
+    for count in scale['comment_counts']:
+        chapter_id = f'chapter-{count}'
+        Comment.objects.bulk_create(
+            (Comment(site_id=SITE_ID, work_id=work.hashcode, chapter_id=chapter_id, para_index=i % 200,
+                     content=f'comment {i} ' + ' '.join(WORDS[:i % 20]), user_id=f'user{i % 500}')
+             for i in range(count)),
+            batch_size=BATCH_SIZE,
+        )
+        # The reader has liked every tenth comment, so the "liked" lookup has work to do
+        liked = Comment.objects.filter(site_id=SITE_ID, chapter_id=chapter_id).values_list('id', flat=True)[::10]
+        LikeRecord.objects.bulk_create((LikeRecord(comment_id=pk, user_id=reader) for pk in liked),
+                                       batch_size=BATCH_SIZE)
+        fixtures['chapters'][count] = chapter_id
+    fixtures['work_id'] = work.hashcode
+    fixtures['like_target'] = Comment.objects.filter(site_id=SITE_ID).values_list('id', flat=True).first()
+
+    account = TelegraphAccount.objects.create(short_name='bench')
+    content = make_markdown(400)
+    # bulk_create skips Note.save(), so hashcode, token and description are set here
+    Note.objects.bulk_create(
+        (Note(hashcode=f'bench{i:07d}', content=content, description=content[:DESCRIPTION_LENGTH],
+              title=f'Page {i}', edit_token=uuid.uuid4().hex, account=account)
+         for i in range(scale['account_pages'])),
+        batch_size=BATCH_SIZE,
+    )
+    fixtures['account'] = account
+    fixtures['staff'] = get_user_model().objects.create_superuser('bench', 'bench@example.com', 'bench')
+    return fixtures
+
+
+def consume(response):
+    # Streaming responses do their work while being iterated
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def build_cases(fixtures, scale):
+    """Return (name, callable) pairs; every callable is safe to repeat."""
+    client = Client()
+    staff_client = Client()
+    staff_client.force_login(fixtures['staff'])
+    cases = []
+
+    for size, note in fixtures['notes'].items():
+        nodes = markdown_to_nodes(note.content)
+        cases += [
+            (f'view_note[{size}]', lambda note=note: client.get(reverse('view_note', args=[note.hashcode]))),
+            (f'markdown_to_nodes[{size}]', lambda note=note: markdown_to_nodes(note.content)),
+            (f'nodes_to_markdown[{size}]', lambda nodes=nodes: nodes_to_markdown(nodes)),
+        ]
+
+    for count, chapter_id in fixtures['chapters'].items():
+        params = {'siteId': SITE_ID, 'workId': fixtures['work_id'], 'chapterId': chapter_id}
+        cases.append((f'api_comments GET[{count}]', lambda params=params: client.get(reverse('api_comments'), params)))
+
+    post_body = json.dumps({
+        'siteId': SITE_ID, 'workId': fixtures['work_id'], 'chapterId': 'chapter-post',
+        'paraIndex': 3, 'content': 'benchmark comment', 'contextText': 'the quiet river',
+    })
+    like_body = json.dumps({'commentId': fixtures['like_target'], 'siteId': SITE_ID})
+    # One like per reader, so every call comes from a new client address
+    readers = (f'10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}' for n in itertools.count(1))
+    cases += [
+        ('api_comments POST', lambda: client.post(reverse('api_comments'), post_body, content_type='application/json')),
+        ('api_like_comment', lambda: client.post(reverse('api_like_comment'), like_body,
+                                                 content_type='application/json', REMOTE_ADDR=next(readers))),
+    ]
+
+    token = fixtures['account'].access_token
+    last_page = max(scale['account_pages'] - 200, 0)
+    for offset in (0, last_page):
+        body = {'access_token': token, 'offset': offset, 'limit': 200}
+        cases.append((f'api_get_page_list[offset={offset}]',
+                      lambda body=body: consume(client.post(reverse('api_get_page_list'), body))))
+
+    cases.append(('export_data', lambda: staff_client.get(reverse('export_data'))))
+    return cases
+
+
+def measure(func, repeat):
+    result = func()  # warm-up: converters, caches, lazy imports
+    status = getattr(result, 'status_code', 200)
+    if status >= 400:
+        raise RuntimeError(f'returned HTTP {status}')
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    # Counted in a separate run so tracing overhead stays out of the timings
+    with CaptureQueriesContext(connection) as queries:
+        tracemalloc.start()
+        try:
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return {
+        'min_ms': min(timings) * 1000,
+        'median_ms': statistics.median(timings) * 1000,
+        'queries': len(queries),
+        'peak_kib': peak / 1024,
+    }
+
+
+def run_benchmarks(scale, repeat=5, only=None, fixtures=None, stdout=None):
+    """Seed (unless `fixtures` is given), run every case matching `only`, return the results."""
+    fixtures = fixtures or seed(scale)
+    results = {}
+    for name, func in build_cases(fixtures, scale):
+        if only and only not in name:
+            continue
+        try:
+            results[name] = measure(func, repeat)
+        except RuntimeError as e:
+            raise RuntimeError(f'{name} {e}') from e
+        if stdout is not None:
+            stdout.write(format_result(name, results[name]))
+    return results
+
+
+def format_header():
+    return f"{'case':<36} {'min ms':>10} {'median ms':>10} {'queries':>8} {'peak KiB':>10}"
+
+
+def format_result(name, result):
+    return (f"{name:<36} {result['min_ms']:>10.2f} {result['median_ms']:>10.2f} "
+            f"{result['queries']:>8} {result['peak_kib']:>10.0f}")
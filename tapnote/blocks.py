@@ -0,0 +1,178 @@
+"""
+Splitting note markdown into independently renderable top-level blocks.
+
+The rendered note is the concatenation of its blocks rendered one by one, so a
+render cache keyed by block text only has to convert the blocks an edit touched.
+A block ends at a blank line unless Python-Markdown would carry state across it:
+
+- fenced code is never split;
+- indented lines continue the previous block (list items, indented code,
+  footnote bodies), and so do reference and footnote definitions;
+- consecutive list or blockquote chunks stay together (the block parser merges
+  them into the previous sibling).
+
+Document-wide state is handled separately:
+
+- reference link definitions ("[id]: url") are collected from the whole note and
+  appended to every block, so links resolve as they would in the full document;
+- blocks holding footnote references or definitions are rendered together as one
+  group, in document order, so numbering and back-references are unchanged; the
+  footnote list is moved to the end.
+
+plan() returns None, and the caller renders the note whole, when:
+
+- a line outside fenced code starts with "<": raw HTML blocks can span blank lines;
+- a reference definition is nested in a blockquote, list item or indented
+  block: the converter still registers it document-wide, but it cannot be
+  lifted out of its block to be appended to the others;
+- the note contains GROUP_SEPARATOR itself, which would split the footnote group
+  in the wrong places.
+"""
+import re
+from dataclasses import dataclass, field
+
+FENCE_RE = re.compile(r'^(`{3,}|~{3,})')
+LIST_RE = re.compile(r'^ {0,3}(?:[*+-]|\d+\.)[ \t]', re.MULTILINE)
+QUOTE_RE = re.compile(r'^ {0,3}>', re.MULTILINE)
+HTML_RE = re.compile(r'^ {0,3}<')
+REFERENCE_RE = re.compile(r'^ {0,3}\[[^\[\]^][^\[\]]*\]:[ \t]*\S')
+# A definition behind blockquote markers, list markers or indentation
+NESTED_REFERENCE_RE = re.compile(r'^(?:[ \t]*(?:>|(?:[*+-]|\d+\.)(?=[ \t])))*[ \t]*\[[^\[\]^][^\[\]]*\]:[ \t]*\S')
+REFERENCE_TITLE_RE = re.compile(r'^[ \t]+(?:"[^"]*"|\'[^\']*\'|\([^)]*\))[ \t]*$')
+FOOTNOTE_RE = re.compile(r'\[\^')
+FOOTNOTE_DEFINITION_RE = re.compile(r'^ {0,3}\[\^[^\]]+\]:')
+# Separates the blocks of the footnote group; an HTML comment passes through
+# the converter as its own raw HTML block
+GROUP_SEPARATOR = '<!--tapnote:block-->'
+
+
+def split_chunks(lines):
+    """
+    ((first, last) line index ranges of the chunks separated by blank lines outside
+    fenced code, reference definition lines), or (None, None) when a line outside
+    fenced code starts with raw HTML or holds a nested reference definition, or a
+    fence is never closed.
+    """
+    chunks, references = [], []
+    first = fence = None
+    for i, line in enumerate(lines):
+        if fence is not None:
+            if line.rstrip(' ') == fence:
+                fence = None
+            continue
+        if not line.strip():
+            if first is not None:
+                chunks.append((first, i - 1))
+                first = None
+            continue
+        if first is None:
+            first = i
+        match = FENCE_RE.match(line)
+        if match:
+            fence = match.group(1)
+        elif HTML_RE.match(line):
+            return None, None
+        elif REFERENCE_RE.match(line):
+            references.append(line)
+            if i + 1 < len(lines) and REFERENCE_TITLE_RE.match(lines[i + 1]):
+                references.append(lines[i + 1])
+        elif NESTED_REFERENCE_RE.match(line):
+            return None, None
+    if fence is not None:
+        return None, None  # unclosed: not a fence to the converter, so the chunks above are wrong
+    if first is not None:
+        chunks.append((first, len(lines) - 1))
+    return chunks, references
+
+
+def _continues(block, chunk):
+    """Whether chunk has to be rendered together with the block before it."""
+    # Over-merging is always safe; it only makes the block larger
+    if chunk[0] in ' \t':
+        return True
+    # Definitions leave the flow, and whatever follows them can attach to the block before
+    if REFERENCE_RE.match(chunk) or FOOTNOTE_DEFINITION_RE.match(chunk):
+        return True
+    if QUOTE_RE.match(chunk) and block.has_quote:
+        return True
+    return bool(LIST_RE.match(chunk) and block.has_list)
+
+
+@dataclass
+class _Block:
+    first: int
+    last: int
+    has_list: bool
+    has_quote: bool
+
+
+@dataclass
+class Plan:
+    """Markdown sources to convert, and how their HTML makes up the note."""
+    blocks: list  # top-level blocks, in order
+    references: str  # reference definitions appended to every source
+    footnote_blocks: list = field(default_factory=list)  # indexes of blocks in the footnote group
+
+    def sources(self):
+        """Markdown for each conversion: the plain blocks, then the footnote group if any."""
+        suffix = f'\n\n{self.references}' if self.references else ''
+        grouped = set(self.footnote_blocks)
+        sources = [block + suffix for i, block in enumerate(self.blocks) if i not in grouped]
+        if self.footnote_blocks:
+            group = f'\n\n{GROUP_SEPARATOR}\n\n'.join(self.blocks[i] for i in self.footnote_blocks)
+            sources.append(f'{group}\n\n{GROUP_SEPARATOR}{suffix}')
+        return sources
+
+    def iter_parts(self, html):
+        """
+        The non-empty HTML parts of the note in page order, joined by newlines in the
+        page. html(j) is the conversion of sources()[j]; it is called in page order,
+        each plain source as its block is reached and the footnote group at its first block.
+        """
+        plain_count = len(self.blocks) - len(self.footnote_blocks)
+        grouped = set(self.footnote_blocks)
+        group_html, footnotes = None, ''
+        plain = 0
+        for i in range(len(self.blocks)):
+            if i in grouped:
+                if group_html is None:
+                    parts = html(plain_count).split(GROUP_SEPARATOR)
+                    footnotes = parts.pop().strip('\n')
+                    group_html = dict(zip(self.footnote_blocks, (part.strip('\n') for part in parts)))
+                part = group_html[i]
+            else:
+                part = html(plain)
+                plain += 1
+            if part:
+                yield part
+        if footnotes:
+            yield footnotes
+
+    def assemble(self, rendered):
+        """The note HTML from the conversions of sources(), in the same order."""
+        return '\n'.join(self.iter_parts(list(rendered).__getitem__))
+
+
+def plan(content):
+    """A Plan for content, or None when it has to be rendered as a whole."""
+    if GROUP_SEPARATOR in content:
+        return None
+    lines = content.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    chunks, references = split_chunks(lines)
+    if chunks is None:
+        return None
+    merged = []
+    for first, last in chunks:
+        chunk = '\n'.join(lines[first:last + 1])
+        has_list, has_quote = bool(LIST_RE.search(chunk)), bool(QUOTE_RE.search(chunk))
+        if merged and _continues(merged[-1], chunk):
+            # Keep the blank lines in between: the converter's block splitting depends on them
+            block = merged[-1]
+            block.last = last
+            block.has_list |= has_list
+            block.has_quote |= has_quote
+        else:
+            merged.append(_Block(first, last, has_list, has_quote))
+    blocks = ['\n'.join(lines[block.first:block.last + 1]) for block in merged]
+    footnote_blocks = [i for i, block in enumerate(blocks) if FOOTNOTE_RE.search(block)]
+    return Plan(blocks, '\n'.join(references), footnote_blocks)
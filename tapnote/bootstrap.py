@@ -0,0 +1,54 @@
+import time
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from .instrumentation import record_cache
+
+CACHE_KEY_PREFIX = 'tapnote:bootstrap'
+
+
+class BootstrapFlag:
+    """
+    A one-time bootstrap condition ("an admin account exists") that, once true,
+    stays true until clear() is called.
+
+    Until it holds, every is_set() runs `check`. After that the answer comes from
+    process memory; the cache entry lets other workers skip `check` as well and is
+    re-read every `recheck` seconds, so a clear() in one worker reaches the others.
+    """
+
+    def __init__(self, name, check, recheck=60):
+        self.cache_key = f'{CACHE_KEY_PREFIX}:{name}'
+        self.check = check
+        self.recheck = recheck
+        self._confirmed_at = None
+
+    def is_set(self):
+        if self._confirmed_at is not None and time.monotonic() - self._confirmed_at < self.recheck:
+            return True
+        cached = cache.get(self.cache_key)
+        record_cache('bootstrap', cached is not None)
+        if cached:
+            self._confirmed_at = time.monotonic()
+            return True
+        if self.check():
+            self.set()
+            return True
+        self._confirmed_at = None
+        return False
+
+    def set(self):
+        self._confirmed_at = time.monotonic()
+        cache.set(self.cache_key, True, None)
+
+    def clear(self):
+        self._confirmed_at = None
+        cache.delete(self.cache_key)
+
+
+# home/setup_admin: has the first admin been created?
+setup_complete = BootstrapFlag('setup_complete', lambda: get_user_model().objects.exists())
+
+
+def clear_setup_if_no_users(sender, **kwargs):
+    if not get_user_model().objects.exists():
+        setup_complete.clear()
@@ -0,0 +1,45 @@
+"""
+Cached per-paragraph comment counts of a paranote chapter.
+
+view_note inlines the counts of the note's own chapter into the page, so
+paranote.js can draw its badges without waiting for /api/v1/comments. The
+aggregate is cached until a comment of the chapter is saved or deleted (signal
+handlers below) or moved by tapnote.paragraphs.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from .instrumentation import record_cache
+from .models import Comment
+
+# The page's paranote embed (view_note.html)
+NOTE_SITE_ID = 'tapnote'
+NOTE_CHAPTER_ID = 'main'
+
+COMMENT_COUNTS_PREFIX = 'tapnote:comment-counts'
+
+
+def comment_counts_key(site_id, work_id, chapter_id):
+    return f'{COMMENT_COUNTS_PREFIX}:{site_id}:{work_id}:{chapter_id}'
+
+
+def comment_counts(site_id, work_id, chapter_id):
+    """{str(para_index): number of comments} for the chapter, as paranote.js keys them."""
+    key = comment_counts_key(site_id, work_id, chapter_id)
+    counts = cache.get(key)
+    record_cache('comment_counts', counts is not None)
+    if counts is None:
+        rows = (Comment.objects.filter(site_id=site_id, work_id=work_id, chapter_id=chapter_id)
+                .values('para_index').annotate(count=Count('id')).order_by('para_index'))
+        counts = {str(row['para_index']): row['count'] for row in rows}
+        cache.set(key, counts, settings.COMMENT_COUNTS_TIMEOUT)
+    return counts
+
+
+def invalidate_comment_counts(site_id, work_id, chapter_id):
+    cache.delete(comment_counts_key(site_id, work_id, chapter_id))
+
+
+def clear_comment_counts(sender, instance, **kwargs):
+    """post_save/post_delete handler for Comment."""
+    invalidate_comment_counts(instance.site_id, instance.work_id, instance.chapter_id)
@@ -0,0 +1,40 @@
+import threading
+import markdown
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+# Used when settings are unavailable (standalone scripts) or lack MARKDOWN_CONVERTERS
+DEFAULT_MARKDOWN_CONVERTERS = {
+    'note': {'extensions': ['fenced_code', 'tables', 'footnotes', 'tapnote.markdown_extensions']},
+    'telegraph': {'extensions': []},
+}
+
+_local = threading.local()
+
+
+def converter_config(name):
+    try:
+        converters = getattr(settings, 'MARKDOWN_CONVERTERS', DEFAULT_MARKDOWN_CONVERTERS)
+    except ImproperlyConfigured:
+        converters = DEFAULT_MARKDOWN_CONVERTERS
+    return converters[name]
+
+
+def get_converter(name):
+    """
+    Return this thread's Markdown instance for `name`, reset and ready for one conversion.
+
+    Building a Markdown object loads and registers every extension, which costs more than
+    converting a short note, so each thread keeps one instance per configuration.
+    Instances are created from settings on first use; later settings changes need a restart.
+    """
+    converters = getattr(_local, 'converters', None)
+    if converters is None:
+        converters = _local.converters = {}
+
+    md = converters.get(name)
+    if md is None:
+        md = converters[name] = markdown.Markdown(**converter_config(name))
+    else:
+        md.reset()
+    return md
@@ -0,0 +1,29 @@
+import re
+from django.conf import settings
+from .fields import decompress
+
+# Pragma names and values are interpolated into SQL, so only allow plain tokens
+PRAGMA_TOKEN_RE = re.compile(r'^-?[A-Za-z0-9_]+$')
+
+
+def apply_pragmas(cursor, pragmas):
+    """Run `PRAGMA name = value` for each entry, in order; empty values are skipped."""
+    for name, value in pragmas.items():
+        if value is None or value == '':
+            continue
+        if not PRAGMA_TOKEN_RE.match(str(name)) or not PRAGMA_TOKEN_RE.match(str(value)):
+            raise ValueError(f'Invalid SQLite pragma {name}={value!r}')
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    connection_created handler: tune each new SQLite connection for concurrent workers
+    and register tapnote_text(), which reads compressed note content in SQL (migrations
+    0011 and 0013; nothing stored in the schema depends on it).
+    """
+    if connection.vendor != 'sqlite':
+        return
+    connection.connection.create_function('tapnote_text', 1, decompress, deterministic=True)
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, settings.SQLITE_PRAGMAS)
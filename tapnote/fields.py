@@ -0,0 +1,95 @@
+"""
+CompressedTextField: a TextField stored compressed on SQLite.
+
+A stored value is either plain TEXT (short values, rows written before
+compression, or text that does not shrink) or a BLOB whose first byte names the
+codec (b'z' zlib, b's' zstd) followed by the compressed UTF-8. Loaded BLOBs stay
+compressed until the attribute is first read. Other databases store plain text:
+PostgreSQL already compresses large values (TOAST).
+
+Lookups and raw SQL on the column (content__icontains, content=..., the sqlite3
+shell) do not see compressed text, which is why compression is opt-in
+(NOTE_COMPRESSION); search goes through tapnote.search, whose SQLite note index
+is fed decompressed text from Python.
+"""
+import zlib
+from django.conf import settings
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+try:
+    import zstandard
+except ImportError:  # optional; NOTE_COMPRESSION = 'zstd' needs it
+    zstandard = None
+
+ZLIB = b'z'
+ZSTD = b's'
+
+
+class CompressedText(bytes):
+    """A loaded value that has not been decompressed yet."""
+
+    def decompress(self):
+        return decompress(self)
+
+
+def compress(text, codec):
+    data = text.encode('utf-8')
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ImportError("NOTE_COMPRESSION = 'zstd' requires the zstandard package")
+        return ZSTD + zstandard.ZstdCompressor().compress(data)
+    return ZLIB + zlib.compress(data, 6)
+
+
+def decompress(value):
+    """Text for a stored value (str passes through)."""
+    if value is None or isinstance(value, str):
+        return value
+    value = bytes(value)
+    marker, payload = value[:1], value[1:]
+    if marker == ZLIB:
+        return zlib.decompress(payload).decode('utf-8')
+    if marker == ZSTD:
+        if zstandard is None:
+            raise ImportError('Reading zstd-compressed content requires the zstandard package')
+        return zstandard.ZstdDecompressor().decompress(payload).decode('utf-8')
+    raise ValueError(f'Unknown compressed content format {marker!r}')
+
+
+class CompressedTextDescriptor(DeferredAttribute):
+    """Decompresses on first read. A data descriptor, so reads of a loaded value come here too."""
+
+    def __get__(self, instance, cls=None):
+        value = super().__get__(instance, cls)
+        if isinstance(value, CompressedText):
+            value = instance.__dict__[self.field.attname] = value.decompress()
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = value
+
+
+class CompressedTextField(models.TextField):
+    descriptor_class = CompressedTextDescriptor
+
+    def from_db_value(self, value, expression, connection):
+        if isinstance(value, (bytes, memoryview)):
+            return CompressedText(value)
+        return value
+
+    def to_python(self, value):
+        if isinstance(value, (bytes, memoryview)):
+            return decompress(value)
+        return super().to_python(value)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if isinstance(value, CompressedText):
+            return bytes(value)  # loaded and saved again without being read
+        value = super().get_db_prep_value(value, connection, prepared)
+        codec = settings.NOTE_COMPRESSION
+        if (connection.vendor != 'sqlite' or not codec or not isinstance(value, str)
+                or len(value) < settings.NOTE_COMPRESSION_MIN_LENGTH):
+            return value
+        compressed = compress(value, codec)
+        return compressed if len(compressed) < len(value.encode('utf-8')) else value
@@ -0,0 +1,200 @@
+"""
+Opt-in per-request instrumentation: database queries, markdown and template
+render time and cache hits, reported as a Server-Timing header and a structured
+log record.
+
+A sampled request gets a RequestMetrics object in a context variable; the query
+recorder, timed() blocks and record_cache() calls add to it and do nothing for
+unsampled requests. Context variables follow sync_to_async and the render
+threads, so the async views are covered too.
+
+Streamed responses (long note pages) send their headers before the body is
+rendered: their Server-Timing header covers the work up to the headers only,
+and the log record is written when the stream is closed, with the body's
+timings included.
+"""
+import logging
+import random
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from .metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('tapnote_request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.durations = defaultdict(float)  # seconds
+        self.counts = defaultdict(int)
+
+    def server_timing(self, total):
+        parts = []
+        for name, seconds in self.durations.items():
+            part = f'{name};dur={seconds * 1000:.1f}'
+            if name == 'db':
+                part += f';desc="{self.counts["db_queries"]} queries"'
+            parts.append(part)
+        if self.counts['cache_hits'] or self.counts['cache_misses']:
+            parts.append(f'cache;desc="hit={self.counts["cache_hits"]} miss={self.counts["cache_misses"]}"')
+        parts.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(parts)
+
+    def log_fields(self, total):
+        fields = {f'{name}_ms': round(seconds * 1000, 2) for name, seconds in self.durations.items()}
+        fields.update(self.counts)
+        fields['total_ms'] = round(total * 1000, 2)
+        return fields
+
+
+@contextmanager
+def timed(name):
+    """Add the block's wall time to metric `name` of the current sampled request."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.durations[name] += time.perf_counter() - start
+
+
+def record_cache(cache_name, hit, count=1):
+    """Count `count` lookups in `cache_name` for the request and in tapnote_cache_requests_total."""
+    if not count:
+        return
+    CACHE_REQUESTS.inc(count, cache=cache_name, result='hit' if hit else 'miss')
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.counts['cache_hits' if hit else 'cache_misses'] += count
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.durations['db'] += time.perf_counter() - start
+        metrics.counts['db_queries'] += 1
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """
+    connection_created handler, connected when INSTRUMENTATION_SAMPLE_RATE > 0.
+    Installed on every connection rather than with connection.execute_wrapper()
+    in the middleware, because connections are per thread and async views run
+    their queries in other threads.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class InstrumentationMiddleware:
+    """
+    Measures a sample of requests (INSTRUMENTATION_SAMPLE_RATE, 0 to 1). With a rate
+    of 0 the middleware removes itself from the stack at startup.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION_SAMPLE_RATE:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if random.random() >= settings.INSTRUMENTATION_SAMPLE_RATE:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, start)
+
+    async def __acall__(self, request):
+        if random.random() >= settings.INSTRUMENTATION_SAMPLE_RATE:
+            return await self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, start)
+
+    def finish(self, request, response, metrics, start):
+        if not response.streaming:
+            self.report(request, response, metrics, time.perf_counter() - start)
+            return response
+        self.set_header(response, metrics, time.perf_counter() - start)
+        measure = self.ameasure_stream if getattr(response, 'is_async', False) else self.measure_stream
+        response.streaming_content = measure(response.streaming_content, request, response, metrics, start)
+        return response
+
+    def measure_stream(self, content, request, response, metrics, start):
+        """Produce content with the request's metrics current, and log them once it is closed."""
+        iterator = iter(content)
+        try:
+            while True:
+                token = _current.set(metrics)
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    _current.reset(token)
+                yield chunk
+        finally:
+            self.log(request, response, metrics, time.perf_counter() - start)
+
+    async def ameasure_stream(self, content, request, response, metrics, start):
+        iterator = aiter(content)
+        try:
+            while True:
+                token = _current.set(metrics)
+                try:
+                    chunk = await anext(iterator)
+                except StopAsyncIteration:
+                    return
+                finally:
+                    _current.reset(token)
+                yield chunk
+        finally:
+            self.log(request, response, metrics, time.perf_counter() - start)
+
+    def report(self, request, response, metrics, total):
+        self.set_header(response, metrics, total)
+        self.log(request, response, metrics, total)
+
+    def set_header(self, response, metrics, total):
+        if settings.INSTRUMENTATION_SERVER_TIMING:
+            response['Server-Timing'] = metrics.server_timing(total)
+
+    def log(self, request, response, metrics, total):
+        fields = metrics.log_fields(total)
+        logger.info(
+            '%s %s %s %.1fms', request.method, request.path, response.status_code, fields['total_ms'],
+            extra={'method': request.method, 'path': request.path, 'status': response.status_code, **fields},
+        )
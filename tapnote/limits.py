@@ -0,0 +1,22 @@
+# Limits shared by the web editor and the Telegraph-compatible API
+
+MAX_CONTENT_LENGTH = 200000  # Markdown characters stored per note
+# Request bytes a content character can take: a 4-byte UTF-8 character is 12 bytes
+# percent-encoded, and 16 as a JSON surrogate pair ("\ud83d\ude00") in a
+# percent-encoded createPage form field
+MAX_ENCODED_CHARACTER_SIZE = 16
+# Checked against Content-Length before the body is read; the margin covers the other
+# fields and the markup of Telegraph nodes
+MAX_REQUEST_BODY_SIZE = MAX_CONTENT_LENGTH * MAX_ENCODED_CHARACTER_SIZE + 2 * 1024 * 1024
+
+# Telegraph node trees (createPage / editPage)
+MAX_NODE_DEPTH = 32
+MAX_NODE_COUNT = 50000
+MAX_NODE_TEXT_LENGTH = MAX_CONTENT_LENGTH  # Total characters across text nodes and attribute values
+
+# Telegraph's own tag set plus the extra tags markdown_to_nodes emits, so getPage output round-trips
+ALLOWED_TAGS = frozenset([
+    'a', 'aside', 'b', 'blockquote', 'br', 'code', 'em', 'figcaption', 'figure',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i', 'iframe', 'img', 'li', 'ol',
+    'p', 'pre', 's', 'del', 'strong', 'sub', 'sup', 'u', 'ul', 'video',
+])
@@ -0,0 +1,42 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from tapnote.bench import SCALES, format_header, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = ("Time the core request paths against seeded data in a throwaway test database "
+            "and report query counts and peak memory.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES), default='full',
+                            help='Data set size (default: full; quick seeds in seconds)')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per case (default: 5)')
+        parser.add_argument('--only', help='Run only cases whose name contains this text')
+        parser.add_argument('--json', dest='json_path', help='Also write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stderr.write(f"Seeding '{options['scale']}' data set...")
+            self.stdout.write(format_header())
+            # The flood limiter would turn repeated POSTs into 429s
+            with override_settings(RATE_LIMIT_ENABLED=False):
+                results = run_benchmarks(SCALES[options['scale']], repeat=options['repeat'],
+                                         only=options['only'], stdout=self.stdout)
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump({'scale': options['scale'], 'repeat': options['repeat'], 'results': results}, f, indent=2)
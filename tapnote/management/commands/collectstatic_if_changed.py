@@ -0,0 +1,40 @@
+import hashlib
+from pathlib import Path
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+FINGERPRINT_FILE = '.collectstatic.sha256'
+
+
+def static_fingerprint():
+    """Hash of every source static file (path and contents) plus the storage backend."""
+    digest = hashlib.sha256(repr(settings.STORAGES['staticfiles']).encode())
+    files = []
+    for finder in finders.get_finders():
+        for path, storage in finder.list(['CVS', '.*', '*~']):
+            files.append((getattr(storage, 'prefix', None) or '', path, storage))
+    for prefix, path, storage in sorted(files, key=lambda f: (f[0], f[1])):
+        digest.update(f'{prefix}/{path}\0'.encode())
+        with storage.open(path) as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Command(BaseCommand):
+    help = "Run collectstatic only when the source static files changed since the last run."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Collect even if nothing changed')
+
+    def handle(self, *args, **options):
+        marker = Path(settings.STATIC_ROOT) / FINGERPRINT_FILE
+        fingerprint = static_fingerprint()
+        if not options['force'] and marker.exists() and marker.read_text() == fingerprint:
+            self.stdout.write('Static files unchanged; skipping collectstatic.')
+            return
+
+        call_command('collectstatic', interactive=False, verbosity=options['verbosity'])
+        marker.write_text(fingerprint)
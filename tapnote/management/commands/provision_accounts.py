@@ -0,0 +1,49 @@
+import csv
+import secrets
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from tapnote.models import TelegraphAccount
+
+
+class Command(BaseCommand):
+    help = "Bulk-create Telegraph accounts with pre-generated access tokens and print them as CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int, help='Number of accounts to create')
+        parser.add_argument('--short-name', default='tenant',
+                            help='Short name prefix; accounts are named <prefix>-<n> (default: tenant)')
+        parser.add_argument('--author-name', default='Anonymous', help='Author name for every account')
+        parser.add_argument('--author-url', default='', help='Author URL for every account')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per INSERT (default: 1000)')
+        parser.add_argument('--output', help='Write CSV to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        prefix = options['short_name']
+        if count < 1:
+            raise CommandError('count must be at least 1')
+        if len(f'{prefix}-{count}') > 32:
+            raise CommandError('short name prefix too long for the 32-character short_name field')
+
+        # bulk_create skips Model.save(), so tokens are generated here
+        accounts = [
+            TelegraphAccount(
+                short_name=f'{prefix}-{n}',
+                author_name=options['author_name'],
+                author_url=options['author_url'],
+                access_token=secrets.token_hex(32),
+            )
+            for n in range(1, count + 1)
+        ]
+        with transaction.atomic():
+            TelegraphAccount.objects.bulk_create(accounts, batch_size=options['batch_size'])
+
+        rows = [['short_name', 'author_name', 'access_token']]
+        rows += [[a.short_name, a.author_name, a.access_token] for a in accounts]
+        if options['output']:
+            with open(options['output'], 'w', newline='') as f:
+                csv.writer(f).writerows(rows)
+        else:
+            csv.writer(self.stdout, lineterminator='').writerows(rows)
+
+        self.stderr.write(self.style.SUCCESS(f'Created {count} accounts.'))
@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from tapnote.fields import ZLIB, ZSTD, CompressedTextField, decompress
+
+CODEC_MARKERS = {'zlib': ZLIB, 'zstd': ZSTD}
+
+
+class Command(BaseCommand):
+    help = ("Rewrite stored note content in the form NOTE_COMPRESSION gives new saves: compress "
+            "plain rows, recompress rows in another codec, or decompress every row when it is ''.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Rows read per query (default: 100)')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database alias (default: default)')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        if connection.vendor != 'sqlite':
+            self.stdout.write('Note content is only stored compressed on SQLite; nothing to do.')
+            return
+
+        field = CompressedTextField()
+        marker = CODEC_MARKERS.get(settings.NOTE_COMPRESSION)
+
+        def convert(content):
+            if marker is not None and isinstance(content, bytes) and content[:1] == marker:
+                return content  # already in this codec
+            new = field.get_db_prep_value(decompress(content), connection)
+            return content if new == content else new
+
+        # Raw SQL, like migration 0011: the text does not change, so no save signals
+        last_id = rewritten = 0
+        with connection.cursor() as cursor:
+            while True:
+                cursor.execute(
+                    "SELECT id, content FROM tapnote_note WHERE id > %s ORDER BY id LIMIT %s",
+                    [last_id, options['batch_size']],
+                )
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                updates = [(new, pk, content) for pk, content in rows if (new := convert(content)) is not content]
+                if updates:
+                    # Rows saved since they were read keep their new content
+                    with transaction.atomic(using=connection.alias):
+                        cursor.executemany(
+                            "UPDATE tapnote_note SET content = %s WHERE id = %s AND content = %s", updates,
+                        )
+                        rewritten += cursor.rowcount
+
+        codec = settings.NOTE_COMPRESSION or 'uncompressed'
+        self.stdout.write(self.style.SUCCESS(f'Rewrote {rewritten} note(s) as {codec}.'))
@@ -0,0 +1,94 @@
+"""
+Python-Markdown extension with TapNote's rendering rules for note pages:
+
+- ``~~text~~`` becomes ``<del>text</del>``
+- every link gets ``target`` (the note's link_target) and ``rel="noopener noreferrer"``
+- a paragraph holding only a youtu.be URL or link becomes a YouTube embed
+
+Links and embeds are rewritten in one walk over the element tree after inline
+processing, instead of regex passes over the rendered HTML.
+"""
+import re
+import xml.etree.ElementTree as etree
+from markdown.extensions import Extension
+from markdown.inlinepatterns import SimpleTagInlineProcessor
+from markdown.treeprocessors import Treeprocessor
+
+STRIKETHROUGH_RE = r'(~~)(.+?)~~'
+# Stash placeholders (STX/ETX) mean the paragraph also holds raw HTML
+YOUTUBE_RE = re.compile(r'https?://(?:www\.)?youtu\.be/([^"<\x02\x03]+)$')
+# Raw HTML passes through the stash untouched by the tree walk
+RAW_LINK_RE = re.compile(r'<a(\s[^>]*?)?\shref="([^"]*)"([^>]*)>')
+REL = 'noopener noreferrer'
+
+
+def youtube_embed(video_id):
+    return etree.Element('iframe', {
+        'width': '560',
+        'height': '315',
+        'src': f'https://www.youtube.com/embed/{video_id}',
+        'frameborder': '0',
+        'allowfullscreen': 'allowfullscreen',
+    })
+
+
+class NoteLinkTreeprocessor(Treeprocessor):
+    def _embed_id(self, p):
+        # <p>https://youtu.be/ID</p>
+        if not len(p):
+            match = YOUTUBE_RE.match(p.text or '')
+            return match and match.group(1)
+        # <p><a href="https://youtu.be/ID">...</a></p>
+        if len(p) == 1 and not p.text and not p[0].tail and p[0].tag == 'a':
+            match = YOUTUBE_RE.match(p[0].get('href', ''))
+            return match and match.group(1)
+        return None
+
+    def run(self, root):
+        target = self.md.link_target
+        stack = [root]
+        while stack:
+            parent = stack.pop()
+            for index, el in enumerate(parent):
+                if el.tag == 'a':
+                    el.set('target', target)
+                    el.set('rel', REL)
+                elif el.tag == 'p':
+                    video_id = self._embed_id(el)
+                    if video_id:
+                        embed = youtube_embed(video_id)
+                        embed.tail = el.tail
+                        parent[index] = embed
+                        continue
+                stack.append(el)
+
+        replacement = rf'<a\1 href="\2"\3 target="{target}" rel="{REL}">'
+        blocks = self.md.htmlStash.rawHtmlBlocks
+        for i, block in enumerate(blocks):
+            if isinstance(block, str) and '<a' in block:
+                blocks[i] = RAW_LINK_RE.sub(replacement, block)
+
+
+class NoteExtension(Extension):
+    def __init__(self, **kwargs):
+        self.config = {
+            'link_target': ['_self', 'Default target attribute for links'],
+        }
+        super().__init__(**kwargs)
+
+    def extendMarkdown(self, md):
+        md.registerExtension(self)
+        self.md = md
+        self.reset()
+        # Below backtick/escape, so `~~` inside code spans stays literal
+        md.inlinePatterns.register(SimpleTagInlineProcessor(STRIKETHROUGH_RE, 'del'), 'strikethrough', 65)
+        # After inline (20) and footnotes (15), so generated links are in the tree
+        md.treeprocessors.register(NoteLinkTreeprocessor(md), 'note_links', 12)
+
+    def reset(self):
+        # Per-conversion setting; callers assign md.link_target after get_converter()
+        self.md.link_target = self.getConfig('link_target')
+
+
+def makeExtension(**kwargs):  # pragma: no cover
+    return NoteExtension(**kwargs)
@@ -0,0 +1,219 @@
+"""
+In-process metrics registry with Prometheus text exposition.
+
+Counters and histograms keep their samples in a dict in each process. With
+METRICS_DIR set (one directory per deployment, emptied at startup by
+gunicorn.conf.py), every process also writes its samples to <pid>-<start>.json
+there at most every METRICS_FLUSH_INTERVAL seconds, and a scrape sums the files of
+all workers. The start time in the name keeps a worker that reuses an exited
+worker's PID from overwriting its counts. Every sample is additive, so merging is
+a plain sum.
+"""
+import bisect
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _format_value(value):
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.values = defaultdict(float)  # (sample name, sorted label pairs) -> value
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        self._file_pid = self._file_name = None
+
+    def register(self, metric):
+        self.metrics.append(metric)
+
+    def add(self, sample, labels, amount):
+        with self._lock:
+            self.values[(sample, labels)] += amount
+        if settings.METRICS_DIR and time.monotonic() - self._last_flush >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def file_name(self):
+        """This process's file in METRICS_DIR; named after the fork, not at import."""
+        pid = os.getpid()
+        if self._file_pid != pid:
+            self._file_pid, self._file_name = pid, f'{pid}-{time.time_ns()}.json'
+        return self._file_name
+
+    def flush(self):
+        """Write this process's samples to METRICS_DIR (no-op in single-process mode)."""
+        directory = settings.METRICS_DIR
+        if not directory:
+            return
+        with self._lock:
+            self._last_flush = time.monotonic()
+            samples = [[name, list(labels), value] for (name, labels), value in self.values.items()]
+        path = os.path.join(directory, self.file_name())
+        try:
+            with open(f'{path}.tmp', 'w') as f:
+                json.dump(samples, f)
+            os.replace(f'{path}.tmp', path)
+        except OSError:
+            logger.warning('Could not write metrics to %s', path, exc_info=True)
+
+    def collect(self):
+        """Samples summed over every worker (or just this process without METRICS_DIR)."""
+        if not settings.METRICS_DIR:
+            with self._lock:
+                return dict(self.values)
+        self.flush()
+        totals = defaultdict(float)
+        for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json')):
+            try:
+                with open(path) as f:
+                    samples = json.load(f)
+            except (OSError, ValueError):
+                continue  # a worker is mid-write or the file was removed
+            for name, labels, value in samples:
+                totals[(name, tuple(tuple(pair) for pair in labels))] += value
+        return totals
+
+    def exposition(self):
+        """Prometheus text format (version 0.0.4)."""
+        samples = self.collect()
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            own = [item for item in samples.items() if item[0][0] in metric.sample_names]
+            for (name, labels), value in sorted(own, key=metric.sort_key):
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.registry = registry
+        self.sample_names = {name}
+        registry.register(self)
+
+    def _labels(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {tuple(labels)}')
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+    def sort_key(self, item):
+        (name, labels), _ = item
+        return labels, name
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if settings.METRICS_ENABLED:
+            self.registry.add(self.name, self._labels(labels), amount)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+        self.sample_names = {f'{name}_bucket', f'{name}_sum', f'{name}_count'}
+
+    def observe(self, value, **labels):
+        if not settings.METRICS_ENABLED:
+            return
+        labels = self._labels(labels)
+        # Buckets are stored cumulatively: every bucket at or above the value counts it.
+        # Lower buckets get 0 so each series exposes the full set.
+        first = bisect.bisect_left(self.buckets, value)
+        for i, bound in enumerate(self.buckets):
+            self.registry.add(f'{self.name}_bucket', labels + (('le', repr(bound)),), int(i >= first))
+        self.registry.add(f'{self.name}_bucket', labels + (('le', '+Inf'),), 1)
+        self.registry.add(f'{self.name}_sum', labels, value)
+        self.registry.add(f'{self.name}_count', labels, 1)
+
+    def sort_key(self, item):
+        (name, labels), _ = item
+        # Group each label set's buckets together, in bucket order, then _sum and _count
+        le = dict(labels).get('le')
+        series = tuple(pair for pair in labels if pair[0] != 'le')
+        bound = float('inf') if le in (None, '+Inf') else float(le)
+        order = (f'{self.name}_bucket', f'{self.name}_sum', f'{self.name}_count').index(name)
+        return series, order, bound
+
+
+# Application metrics
+
+REQUEST_DURATION = Histogram('tapnote_request_duration_seconds', 'Request latency by URL name.', ['view'])
+RENDERS = Counter('tapnote_renders_total', 'Markdown renders by output (note HTML or Telegraph nodes).', ['kind'])
+CACHE_REQUESTS = Counter('tapnote_cache_requests_total', 'Cache lookups by cache and result.', ['cache', 'result'])
+COMMENT_WRITES = Counter('tapnote_comment_writes_total', 'Comments created or deleted.', ['action'])
+LIKE_CONFLICTS = Counter('tapnote_like_conflicts_total', 'Likes rejected because the reader already liked the comment.')
+VIEW_COUNT_UPDATE = Histogram(
+    'tapnote_view_count_update_seconds', 'Time spent incrementing a note view counter.',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+
+
+class MetricsMiddleware:
+    """Observes every request's latency under its URL name (METRICS_ENABLED)."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def view_name(request):
+        match = getattr(request, 'resolver_match', None)
+        return match.view_name if match is not None else 'unmatched'
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        REQUEST_DURATION.observe(time.perf_counter() - start, view=self.view_name(request))
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        REQUEST_DURATION.observe(time.perf_counter() - start, view=self.view_name(request))
+        return response
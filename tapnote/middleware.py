@@ -0,0 +1,69 @@
+"""
+Session, authentication and message middleware that stay out of the way of
+token-authenticated API views.
+
+Views marked with @sessionless get no session store, no message storage and a
+request.user that only reads the session cookie if the view actually asks for it
+(staff checks in api_ban and comment DELETE). The classes subclass Django's own,
+so admin's middleware checks still pass.
+"""
+from importlib import import_module
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import middleware as auth_middleware
+from django.contrib.messages import middleware as messages_middleware
+from django.contrib.sessions import middleware as sessions_middleware
+from django.urls import Resolver404, get_resolver
+from django.utils.functional import SimpleLazyObject
+
+
+def sessionless(view_func):
+    """Mark a view as not needing sessions, messages or an eagerly loaded user."""
+    view_func.sessionless = True
+    return view_func
+
+
+def is_sessionless(request):
+    try:
+        return request._sessionless
+    except AttributeError:
+        pass
+    try:
+        match = get_resolver(getattr(request, 'urlconf', None)).resolve(request.path_info)
+    except Resolver404:
+        request._sessionless = False
+    else:
+        request._sessionless = getattr(match.func, 'sessionless', False)
+    return request._sessionless
+
+
+def _get_user(request):
+    engine = import_module(settings.SESSION_ENGINE)
+    request.session = engine.SessionStore(request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+    return auth.get_user(request)
+
+
+class SessionMiddleware(sessions_middleware.SessionMiddleware):
+    def process_request(self, request):
+        if not is_sessionless(request):
+            super().process_request(request)
+
+    def process_response(self, request, response):
+        # A lazily loaded session is read-only: never saved, no cookie set
+        if is_sessionless(request):
+            return response
+        return super().process_response(request, response)
+
+
+class AuthenticationMiddleware(auth_middleware.AuthenticationMiddleware):
+    def process_request(self, request):
+        if is_sessionless(request):
+            request.user = SimpleLazyObject(lambda: _get_user(request))
+        else:
+            super().process_request(request)
+
+
+class MessageMiddleware(messages_middleware.MessageMiddleware):
+    def process_request(self, request):
+        if not is_sessionless(request):
+            super().process_request(request)
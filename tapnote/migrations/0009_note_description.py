@@ -0,0 +1,34 @@
+# Generated by Django 4.2.2 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+def populate_description(apps, schema_editor):
+    Note = apps.get_model("tapnote", "Note")
+    batch = []
+    for note in Note.objects.only("id", "content").iterator(chunk_size=BATCH_SIZE):
+        note.description = note.content[:100]
+        batch.append(note)
+        if len(batch) >= BATCH_SIZE:
+            Note.objects.bulk_update(batch, ["description"])
+            batch = []
+    if batch:
+        Note.objects.bulk_update(batch, ["description"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tapnote", "0008_telegraphaccount_note_views_note_account"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="note",
+            name="description",
+            field=models.CharField(blank=True, default="", max_length=100),
+        ),
+        migrations.RunPython(populate_description, migrations.RunPython.noop),
+    ]
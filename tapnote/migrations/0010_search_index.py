@@ -0,0 +1,86 @@
+# Full-text indexes for tapnote.search, created per database backend
+
+from django.db import migrations, transaction
+from django.db.utils import OperationalError
+
+# Table -> indexed columns, in weight order
+INDEXED_COLUMNS = {
+    "tapnote_note": ("title", "content"),
+    "tapnote_comment": ("content", "user_name"),
+}
+
+
+def sqlite_statements(table, columns):
+    fts = f"{table}_fts"
+    cols = ", ".join(columns)
+    new = ", ".join(f"new.{c}" for c in columns)
+    old = ", ".join(f"old.{c}" for c in columns)
+    insert = f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new});"
+    delete = f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old});"
+    return [
+        # External content table: the index reads the text from {table}, nothing is stored twice
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({cols}, content='{table}', content_rowid='id')",
+        f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN {delete} END",
+        # Only text changes touch the index (not view counters or likes)
+        f"CREATE TRIGGER {fts}_update AFTER UPDATE OF {cols} ON {table} BEGIN {delete} {insert} END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def postgresql_statements(table, columns):
+    weights = "ABCD"
+    vector = " || ".join(
+        f"setweight(to_tsvector('simple', coalesce(NEW.{c}, '')), '{weights[i]}')"
+        for i, c in enumerate(columns)
+    )
+    return [
+        f"ALTER TABLE {table} ADD COLUMN search_vector tsvector",
+        f"CREATE FUNCTION {table}_search_vector() RETURNS trigger LANGUAGE plpgsql AS $$ "
+        f"BEGIN NEW.search_vector := {vector}; RETURN NEW; END $$",
+        f"CREATE TRIGGER {table}_search_vector BEFORE INSERT OR UPDATE OF {', '.join(columns)} "
+        f"ON {table} FOR EACH ROW EXECUTE FUNCTION {table}_search_vector()",
+        # Fires the trigger for existing rows
+        f"UPDATE {table} SET {columns[0]} = {columns[0]}",
+        f"CREATE INDEX {table}_search_vector_idx ON {table} USING GIN (search_vector)",
+    ]
+
+
+def create_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table, columns in INDEXED_COLUMNS.items():
+        if vendor == "sqlite":
+            try:
+                with transaction.atomic(using=schema_editor.connection.alias):
+                    for sql in sqlite_statements(table, columns):
+                        schema_editor.execute(sql)
+            except OperationalError:
+                # SQLite built without FTS5: tapnote.search falls back to LIKE
+                return
+        elif vendor == "postgresql":
+            for sql in postgresql_statements(table, columns):
+                schema_editor.execute(sql)
+
+
+def drop_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table in INDEXED_COLUMNS:
+        if vendor == "sqlite":
+            for suffix in ("insert", "delete", "update"):
+                schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{suffix}")
+            schema_editor.execute(f"DROP TABLE IF EXISTS {table}_fts")
+        elif vendor == "postgresql":
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_search_vector ON {table}")
+            schema_editor.execute(f"DROP FUNCTION IF EXISTS {table}_search_vector()")
+            schema_editor.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tapnote", "0009_note_description"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
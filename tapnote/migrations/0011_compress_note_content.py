@@ -0,0 +1,105 @@
+# Compressed note content on SQLite (tapnote.fields.CompressedTextField)
+
+from django.db import migrations
+import tapnote.fields
+
+BATCH_SIZE = 100
+FTS = "tapnote_note_fts"
+FTS_COLUMNS = "title, content"
+
+
+def fts_exists(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        return FTS in schema_editor.connection.introspection.table_names(cursor)
+
+
+def rebuild_fts(schema_editor, source, text):
+    """Recreate the note index (0010) reading content through `text`, e.g. tapnote_text(content)."""
+    new = f"new.title, {text.format('new.content')}"
+    old = f"old.title, {text.format('old.content')}"
+    insert = f"INSERT INTO {FTS}(rowid, {FTS_COLUMNS}) VALUES (new.id, {new});"
+    delete = f"INSERT INTO {FTS}({FTS}, rowid, {FTS_COLUMNS}) VALUES ('delete', old.id, {old});"
+    for suffix in ("insert", "delete", "update"):
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS}_{suffix}")
+    schema_editor.execute(f"DROP TABLE {FTS}")
+    schema_editor.execute(f"CREATE VIRTUAL TABLE {FTS} USING fts5({FTS_COLUMNS}, content='{source}', content_rowid='id')")
+    schema_editor.execute(f"CREATE TRIGGER {FTS}_insert AFTER INSERT ON tapnote_note BEGIN {insert} END")
+    schema_editor.execute(f"CREATE TRIGGER {FTS}_delete AFTER DELETE ON tapnote_note BEGIN {delete} END")
+    schema_editor.execute(
+        f"CREATE TRIGGER {FTS}_update AFTER UPDATE OF {FTS_COLUMNS} ON tapnote_note BEGIN {delete} {insert} END"
+    )
+    schema_editor.execute(f"INSERT INTO {FTS}({FTS}) VALUES ('rebuild')")
+
+
+def index_decompressed_content(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite" or not fts_exists(schema_editor):
+        return
+    # The index reads note text through a view, since the table now holds compressed bytes
+    schema_editor.execute(
+        "CREATE VIEW tapnote_note_text AS SELECT id, title, tapnote_text(content) AS content FROM tapnote_note"
+    )
+    rebuild_fts(schema_editor, "tapnote_note_text", "tapnote_text({})")
+
+
+def index_plain_content(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite" or not fts_exists(schema_editor):
+        return
+    rebuild_fts(schema_editor, "tapnote_note", "{}")
+    schema_editor.execute("DROP VIEW IF EXISTS tapnote_note_text")
+
+
+def convert_rows(schema_editor, select_where, convert):
+    """Rewrite content of the rows matching select_where, BATCH_SIZE rows per query."""
+    connection = schema_editor.connection
+    last_id = 0
+    with connection.cursor() as cursor:
+        while True:
+            cursor.execute(
+                f"SELECT id, content FROM tapnote_note WHERE id > %s AND {select_where} ORDER BY id LIMIT %s",
+                [last_id, BATCH_SIZE],
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            updates = [(new, pk) for pk, content in rows if (new := convert(content)) is not content]
+            if updates:
+                cursor.executemany("UPDATE tapnote_note SET content = %s WHERE id = %s", updates)
+
+
+def compress_content(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    field = tapnote.fields.CompressedTextField()
+    convert_rows(
+        schema_editor, "typeof(content) = 'text'",
+        lambda content: field.get_db_prep_value(content, schema_editor.connection),
+    )
+
+
+def decompress_content(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    convert_rows(schema_editor, "typeof(content) = 'blob'", tapnote.fields.decompress)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tapnote", "0010_search_index"),
+    ]
+
+    operations = [
+        # Same column type; only the Python side changes
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name="note",
+                    name="content",
+                    field=tapnote.fields.CompressedTextField(),
+                ),
+            ],
+        ),
+        migrations.RunPython(index_decompressed_content, index_plain_content),
+        migrations.RunPython(compress_content, decompress_content),
+    ]
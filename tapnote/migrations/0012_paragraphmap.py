@@ -0,0 +1,24 @@
+# Generated by Django 4.2.2 on 2026-10-19 16:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tapnote', '0011_compress_note_content'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParagraphMap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('revision', models.PositiveIntegerField(default=0)),
+                ('paragraphs', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('note', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='paragraph_map', to='tapnote.note')),
+            ],
+        ),
+    ]
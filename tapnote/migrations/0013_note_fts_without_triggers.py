@@ -0,0 +1,56 @@
+# Note full-text index maintained by tapnote.search signal handlers instead of triggers
+
+from importlib import import_module
+from django.db import migrations
+from tapnote.fields import decompress
+
+compressed_content = import_module("tapnote.migrations.0011_compress_note_content")
+
+BATCH_SIZE = 100
+FTS = "tapnote_note_fts"
+FTS_COLUMNS = "title, content"
+
+
+def index_from_python(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite" or not compressed_content.fts_exists(schema_editor):
+        return
+    # The 0011 triggers call tapnote_text(), which only connections opened by Django
+    # have: writes from the sqlite3 shell, dbshell or backup tools failed
+    for suffix in ("insert", "delete", "update"):
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS}_{suffix}")
+    schema_editor.execute(f"DROP TABLE {FTS}")
+    schema_editor.execute("DROP VIEW IF EXISTS tapnote_note_text")
+    # Contentless: only the index is stored, the text stays (compressed) in tapnote_note
+    schema_editor.execute(f"CREATE VIRTUAL TABLE {FTS} USING fts5({FTS_COLUMNS}, content='')")
+    last_id = 0
+    with schema_editor.connection.cursor() as cursor:
+        while True:
+            cursor.execute(
+                "SELECT id, title, content FROM tapnote_note WHERE id > %s ORDER BY id LIMIT %s",
+                [last_id, BATCH_SIZE],
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            cursor.executemany(
+                f"INSERT INTO {FTS}(rowid, {FTS_COLUMNS}) VALUES (%s, %s, %s)",
+                [(pk, title, decompress(content)) for pk, title, content in rows],
+            )
+
+
+def index_from_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite" or not compressed_content.fts_exists(schema_editor):
+        return
+    compressed_content.index_decompressed_content(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tapnote", "0012_paragraphmap"),
+    ]
+
+    operations = [
+        migrations.RunPython(index_from_python, index_from_triggers),
+    ]
@@ -0,0 +1,47 @@
+# Note full-text index that stores its own copy of the text (replaces the contentless one of 0013)
+
+from importlib import import_module
+from django.db import migrations
+from tapnote.fields import decompress
+
+compressed_content = import_module("tapnote.migrations.0011_compress_note_content")
+contentless_index = import_module("tapnote.migrations.0013_note_fts_without_triggers")
+
+BATCH_SIZE = 100
+FTS = "tapnote_note_fts"
+FTS_COLUMNS = "title, content"
+
+
+def index_with_text(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite" or not compressed_content.fts_exists(schema_editor):
+        return
+    # A contentless table can only drop a row given the exact text it indexed, which a
+    # save racing another save cannot know; with the text stored, rows go by rowid
+    schema_editor.execute(f"DROP TABLE {FTS}")
+    schema_editor.execute(f"CREATE VIRTUAL TABLE {FTS} USING fts5({FTS_COLUMNS})")
+    last_id = 0
+    with schema_editor.connection.cursor() as cursor:
+        while True:
+            cursor.execute(
+                "SELECT id, title, content FROM tapnote_note WHERE id > %s ORDER BY id LIMIT %s",
+                [last_id, BATCH_SIZE],
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            cursor.executemany(
+                f"INSERT INTO {FTS}(rowid, {FTS_COLUMNS}) VALUES (%s, %s, %s)",
+                [(pk, title, decompress(content)) for pk, title, content in rows],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tapnote", "0013_note_fts_without_triggers"),
+    ]
+
+    operations = [
+        migrations.RunPython(index_with_text, contentless_index.index_from_python),
+    ]
@@ -3,12 +3,16 @@ import string
 import secrets
 from django.db import models
 from django.utils import timezone
+from .fields import CompressedTextField
+
+DESCRIPTION_LENGTH = 100  # Telegraph-style description slice stored alongside content
 
 class Note(models.Model):
     hashcode = models.CharField(max_length=32, unique=True)
     title = models.CharField(max_length=200, blank=True, null=True)
     author = models.CharField(max_length=100, blank=True, null=True)
-    content = models.TextField()
+    content = CompressedTextField()
+    description = models.CharField(max_length=DESCRIPTION_LENGTH, blank=True, default='')
     link_target = models.CharField(max_length=10, default="_self", choices=[('_blank', 'New Tab'), ('_self', 'Same Tab')])
     edit_token = models.CharField(max_length=64)
     created_at = models.DateTimeField(default=timezone.now)
@@ -33,8 +37,29 @@ class Note(models.Model):
                 
         if not self.edit_token:
             self.edit_token = uuid.uuid4().hex
+
+        # Precompute the description so metadata endpoints can defer 'content'.
+        # Skip when content itself is deferred (e.g. a .defer('content') instance
+        # that only touched other fields), otherwise we'd trigger a refetch.
+        if 'content' in self.__dict__:
+            self.description = self.content[:DESCRIPTION_LENGTH]
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'content' in update_fields:
+                kwargs['update_fields'] = set(update_fields) | {'description'}
         super().save(*args, **kwargs)
 
+class ParagraphMap(models.Model):
+    """The <p> paragraphs of a note's rendered page, as of its latest saved revision."""
+    note = models.OneToOneField(Note, on_delete=models.CASCADE, related_name='paragraph_map')
+    revision = models.PositiveIntegerField(default=0)
+    # [text hash, fingerprint] per paragraph in page order; the fingerprint is the
+    # paragraph's first characters, like Comment.context_text
+    paragraphs = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Paragraphs of {self.note_id} (revision {self.revision})"
+
 class TelegraphAccount(models.Model):
     short_name = models.CharField(max_length=32)
     author_name = models.CharField(max_length=128, default='Anonymous')
@@ -0,0 +1,251 @@
+"""
+Server-side paragraph index of note pages, used to keep comments anchored across edits.
+
+paranote.js numbers the <p> elements of the rendered note (comment para_index)
+and stores the first characters of the paragraph as context_text. When a note is
+saved with different content, the paragraphs of the new revision are compared
+with the stored map of the previous one, and the note's comments are moved to
+where their paragraph went:
+one UPDATE per shifted range. Rows are first moved to negative indexes (-new - 1)
+and flipped back by a final UPDATE, so a range moved onto indexes another range has
+not yet vacated is never matched twice.
+
+Creating a note stores nothing: a new note has no comments. The first edit builds
+the map from the previous content instead, whose blocks the page views have left
+in the block render cache (tapnote.rendering), so the write path only converts
+the blocks the edit changed, which the next view would convert anyway.
+
+Renders happen outside any transaction. The map is then re-read with
+select_for_update() and replaced by a compare-and-swap on its revision (SQLite
+ignores row locks), together with the comment moves, so two concurrent edits
+cannot both remap from the same stored map; an edit whose content was already
+replaced by a later save leaves the map to that save.
+
+A save whose render fell back to plain text (render pool timeout) empties the
+stored map instead: the comments were not moved, so the next save stores its
+paragraphs without moving them either. Bulk imports run inside
+deferred_paragraph_maps().
+"""
+import difflib
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from html.parser import HTMLParser
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.utils import timezone
+from .comments import NOTE_SITE_ID, NOTE_CHAPTER_ID, invalidate_comment_counts
+from .fields import decompress
+from .models import Comment, Note, ParagraphMap
+from .rendering import render_note
+
+# Pks of the notes saved inside deferred_paragraph_maps(), None outside
+_deferred = ContextVar('tapnote_deferred_paragraph_maps', default=None)
+DEFERRED_DELETE_BATCH = 500
+
+# Tries at storing a map that concurrent edits keep replacing
+STORE_ATTEMPTS = 3
+
+FINGERPRINT_LENGTH = 32  # paranote.js contextText
+
+
+class ParagraphParser(HTMLParser):
+    """Text of each <p>, as the browser's textContent.trim() gives it."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.paragraphs = []
+        self._text = None  # chunks of the open <p>
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'p':
+            if self._text is not None:
+                self._close()  # a <p> cannot nest; the browser closes the open one
+            self._text = []
+
+    def handle_endtag(self, tag):
+        if tag == 'p' and self._text is not None:
+            self._close()
+
+    def handle_data(self, data):
+        if self._text is not None:
+            self._text.append(data)
+
+    def _close(self):
+        self.paragraphs.append(''.join(self._text).strip())
+        self._text = None
+
+    def close(self):
+        super().close()
+        if self._text is not None:
+            self._close()
+
+
+def paragraph_texts(html):
+    parser = ParagraphParser()
+    parser.feed(html)
+    parser.close()
+    return parser.paragraphs
+
+
+def paragraph_map(html):
+    """[text hash, fingerprint] for each paragraph of rendered note HTML."""
+    return [
+        [hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest(), text[:FINGERPRINT_LENGTH]]
+        for text in paragraph_texts(html)
+    ]
+
+
+def remap_ranges(old_hashes, new_hashes):
+    """
+    Moves taking comments from the old paragraphs to the new ones, as
+    (start, stop, kind, value) over old indexes: kind 'shift' adds value to the index,
+    'set' replaces it. Unchanged positions are left out.
+    """
+    moves = []
+    matcher = difflib.SequenceMatcher(None, old_hashes, new_hashes, autojunk=False)
+    opcodes = matcher.get_opcodes()
+    # Paragraphs moved elsewhere show up as removed here and inserted there
+    inserted = {}
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag in ('replace', 'insert'):
+            for j in range(j1, j2):
+                inserted.setdefault(new_hashes[j], []).append(j)
+
+    def add(i, kind, value):
+        previous = moves[-1] if moves else None
+        if previous and previous[1] == i and previous[2:] == (kind, value):
+            moves[-1] = (previous[0], i + 1, kind, value)
+        else:
+            moves.append((i, i + 1, kind, value))
+
+    def removed(i1, i2, fallback):
+        """Moves for removed old paragraphs i1:i2; fallback(i) is where the others go."""
+        for i in range(i1, i2):
+            targets = inserted.get(old_hashes[i])
+            if targets:
+                add(i, 'set', targets.pop(0))
+            else:
+                kind, value = fallback(i)
+                if (kind, value) != ('shift', 0):
+                    add(i, kind, value)
+
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == 'equal':
+            if j1 != i1:
+                moves.append((i1, i2, 'shift', j1 - i1))
+        elif tag == 'replace':
+            # Edited paragraphs: comments stay in order over the replacement, those on
+            # paragraphs beyond its length go on its last paragraph
+            removed(i1, i2, lambda i: ('shift', j1 - i1) if i - i1 < j2 - j1 else ('set', j2 - 1))
+        elif tag == 'delete' and new_hashes:
+            # Removed paragraphs: comments go to the paragraph that now follows
+            removed(i1, i2, lambda i: ('set', min(j1, len(new_hashes) - 1)))
+    return moves
+
+
+def remap_comments(hashcode, old_hashes, new_hashes):
+    """Move the note's comments from old_hashes positions to new_hashes ones."""
+    moves = remap_ranges(old_hashes, new_hashes)
+    if not moves:
+        return
+    comments = Comment.objects.filter(site_id=NOTE_SITE_ID, work_id=hashcode, chapter_id=NOTE_CHAPTER_ID)
+    with transaction.atomic():
+        for start, stop, kind, value in moves:
+            # New index i is parked at -i - 1
+            parked = Value(-1 - value) - F('para_index') if kind == 'shift' else Value(-1 - value)
+            comments.filter(para_index__gte=start, para_index__lt=stop).update(para_index=parked)
+        comments.filter(para_index__lt=0).update(para_index=Value(-1) - F('para_index'))
+    invalidate_comment_counts(NOTE_SITE_ID, hashcode, NOTE_CHAPTER_ID)
+
+
+@contextmanager
+def deferred_paragraph_maps():
+    """
+    Skip update_paragraph_map for the notes saved inside, e.g. a bulk import. Their
+    stored maps are dropped on exit, so the next edit of each note starts a new map
+    instead of remapping from paragraphs the note no longer has.
+    """
+    saved = set()
+    token = _deferred.set(saved)
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
+        pks = list(saved)
+        for i in range(0, len(pks), DEFERRED_DELETE_BATCH):
+            ParagraphMap.objects.filter(note_id__in=pks[i:i + DEFERRED_DELETE_BATCH]).delete()
+
+
+def paragraph_hashes(content, note):
+    """Paragraph map of content rendered as note's page, or None when the render fell back."""
+    html = render_note(content, note.link_target, note.hashcode, fallback=lambda content: None)
+    return None if html is None else paragraph_map(html)
+
+
+def remember_previous_content(sender, instance, update_fields=None, raw=False, **kwargs):
+    """pre_save handler for Note: the content an edit replaces, for update_paragraph_map."""
+    if raw or not settings.ENABLE_COMMENTS or instance._state.adding or _deferred.get() is not None:
+        return
+    if update_fields is not None and 'content' not in update_fields:
+        return
+    stored = Note.objects.filter(pk=instance.pk).values_list('content', flat=True).first()
+    instance._previous_content = decompress(stored)
+
+
+class _MapChanged(Exception):
+    """The stored map was replaced between reading and writing it."""
+
+
+def store_paragraph_map(note, old_paragraphs, paragraphs):
+    """
+    Move the comments from the stored map (or old_paragraphs when there is none) to
+    paragraphs and store them; call inside transaction.atomic().
+    """
+    current = Note.objects.filter(pk=note.pk).values_list('content', flat=True).first()
+    if current is None or decompress(current) != note.content:
+        return  # a later save owns the map
+    stored = ParagraphMap.objects.select_for_update().filter(note=note).first()
+    old_hashes = [h for h, _ in (stored.paragraphs if stored is not None else old_paragraphs or [])]
+    new_hashes = [h for h, _ in paragraphs]
+    if stored is None:
+        ParagraphMap.objects.create(note=note, paragraphs=paragraphs)  # IntegrityError if another edit did
+    elif old_hashes == new_hashes:
+        return
+    elif not ParagraphMap.objects.filter(pk=stored.pk, revision=stored.revision).update(
+            paragraphs=paragraphs, revision=F('revision') + 1, updated_at=timezone.now()):
+        raise _MapChanged()
+    remap_comments(note.hashcode, old_hashes, new_hashes)
+
+
+def update_paragraph_map(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    """post_save handler for Note: store the new revision's paragraphs and re-anchor comments."""
+    if raw or created or not settings.ENABLE_COMMENTS:
+        return
+    if update_fields is not None and 'content' not in update_fields:
+        return
+    note = instance
+    deferred = _deferred.get()
+    if deferred is not None:
+        deferred.add(note.pk)
+        return
+    previous = note.__dict__.pop('_previous_content', None)
+    if previous is None or previous == note.content:
+        return
+    stored = ParagraphMap.objects.filter(note=note).first()
+    if stored is None:
+        # Rendered first: the block cache then ends up holding the new content's blocks
+        old_paragraphs = paragraph_hashes(previous, note) or []
+    paragraphs = paragraph_hashes(note.content, note)
+    if paragraphs is None:
+        # Plain-text fallback: its paragraphs are not the page's. An empty map moves no comments
+        ParagraphMap.objects.update_or_create(note=note, defaults={'paragraphs': []})
+        return
+    for _ in range(STORE_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                store_paragraph_map(note, old_paragraphs if stored is None else None, paragraphs)
+            return
+        except (_MapChanged, IntegrityError):
+            continue  # rolled back; retry from the map the other edit stored
@@ -0,0 +1,152 @@
+"""
+On-demand cProfile runs for single requests, triggered by staff users.
+
+Send "X-Profile: <mode>" (or add ?_profile=<mode>) to any URL while logged in as
+staff. The response is replaced by a table of the hottest functions, sorted by
+<mode> when it is a pstats sort key (tottime by default), or with mode "store"
+the normal response is returned and the raw profile is written to PROFILING_DIR
+for snakeviz/pstats, its file name in the X-Profile-File header.
+
+One request per process is profiled at a time (a process has one active cProfile
+profiler on Python 3.12+, and async requests share the loop thread); others are
+served normally with "X-Profile: busy". While a request is profiled its markdown
+is rendered in-process (not in the render pool) so it shows up in the profile.
+Under ASGI only the event loop thread is profiled.
+"""
+import cProfile
+import io
+import os
+import pstats
+import secrets
+import threading
+import time
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+
+HEADER = 'HTTP_X_PROFILE'
+QUERY_PARAM = '_profile'
+SORT_KEYS = {'tottime', 'cumulative', 'calls', 'ncalls'}
+DEFAULT_SORT = 'tottime'
+
+_active = ContextVar('tapnote_profiling', default=False)
+_slot = threading.Lock()
+
+
+def is_profiling():
+    """True inside a profiled request (used to keep its work in this thread)."""
+    return _active.get()
+
+
+def requested_mode(request):
+    mode = request.META.get(HEADER)
+    if mode is None:
+        mode = request.GET.get(QUERY_PARAM)
+    if mode is None:
+        return None
+    mode = mode.strip().lower()
+    return mode if mode == 'store' or mode in SORT_KEYS else DEFAULT_SORT
+
+
+def store_profile(profiler, request):
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    match = getattr(request, 'resolver_match', None)
+    view_name = match.view_name if match is not None else 'unmatched'
+    filename = f'{time.strftime("%Y%m%d-%H%M%S")}-{view_name}-{secrets.token_hex(4)}.prof'
+    profiler.dump_stats(os.path.join(settings.PROFILING_DIR, filename))
+    return filename
+
+
+def summary_response(profiler, request, response, elapsed, sort):
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stream.write(
+        f'{request.method} {request.get_full_path()} -> {response.status_code} '
+        f'in {elapsed * 1000:.1f}ms, {stats.total_calls} calls, sorted by {sort}\n\n'
+    )
+    stats.sort_stats(sort).print_stats(settings.PROFILING_SUMMARY_LINES)
+    summary = HttpResponse(stream.getvalue(), content_type='text/plain; charset=utf-8')
+    summary['X-Profile-Status'] = response.status_code
+    return summary
+
+
+class ProfilingMiddleware:
+    """Profiles staff requests carrying the X-Profile header (PROFILING_ENABLED)."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        mode = requested_mode(request)
+        if mode is None or not request.user.is_staff:
+            return self.get_response(request)
+        if not _slot.acquire(blocking=False):
+            return self.busy(self.get_response(request))
+
+        profiler = cProfile.Profile()
+        token = _active.set(True)
+        start = time.perf_counter()
+        try:
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+                if response.streaming and not getattr(response, 'is_async', False):
+                    # Produce the body inside the profile; the client gets it in one piece
+                    response.streaming_content = [b''.join(response.streaming_content)]
+            finally:
+                profiler.disable()
+        finally:
+            _active.reset(token)
+            _slot.release()
+        return self.finish(profiler, request, response, time.perf_counter() - start, mode)
+
+    async def __acall__(self, request):
+        mode = requested_mode(request)
+        if mode is None or not await sync_to_async(lambda: request.user.is_staff)():
+            return await self.get_response(request)
+        if not _slot.acquire(blocking=False):
+            return self.busy(await self.get_response(request))
+
+        profiler = cProfile.Profile()
+        token = _active.set(True)
+        start = time.perf_counter()
+        try:
+            profiler.enable()
+            try:
+                response = await self.get_response(request)
+                if response.streaming:
+                    # Produce the body inside the profile; the client gets it in one piece
+                    if getattr(response, 'is_async', False):
+                        body = b''.join([chunk async for chunk in response.streaming_content])
+                    else:
+                        body = b''.join(response.streaming_content)
+                    response.streaming_content = [body]
+            finally:
+                profiler.disable()
+        finally:
+            _active.reset(token)
+            _slot.release()
+        return self.finish(profiler, request, response, time.perf_counter() - start, mode)
+
+    @staticmethod
+    def busy(response):
+        response['X-Profile'] = 'busy'
+        return response
+
+    @staticmethod
+    def finish(profiler, request, response, elapsed, mode):
+        if mode == 'store':
+            response['X-Profile-File'] = store_profile(profiler, request)
+            return response
+        return summary_response(profiler, request, response, elapsed, mode)
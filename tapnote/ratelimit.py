@@ -0,0 +1,56 @@
+import math
+import time
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from .instrumentation import record_cache
+from .responses import JsonResponse
+from .utils import get_client_ip
+
+CACHE_KEY_PREFIX = 'tapnote:ratelimit'
+
+
+def consume_token(request, scope):
+    """
+    Count one request against the client's limit for `scope`.
+
+    A client may make `capacity` requests per fixed window of `period` seconds
+    (settings.RATE_LIMITS). The counter is created with cache.add() and bumped with
+    cache.incr(), both atomic on the shared cache backends, so concurrent requests
+    cannot be admitted past the limit. Returns 0 when the request may proceed,
+    otherwise the number of seconds until the window ends.
+    """
+    if not settings.RATE_LIMIT_ENABLED or scope not in settings.RATE_LIMITS:
+        return 0
+
+    capacity, period = settings.RATE_LIMITS[scope]
+    now = time.time()
+    window = int(now // period)
+    key = f'{CACHE_KEY_PREFIX}:{scope}:{get_client_ip(request) or "unknown"}:{window}'
+
+    created = cache.add(key, 0, timeout=period)
+    record_cache('ratelimit', not created)
+    try:
+        count = cache.incr(key)
+    except ValueError:  # expired between add() and incr()
+        cache.add(key, 1, timeout=period)
+        count = 1
+    if count > capacity:
+        return max(1, math.ceil((window + 1) * period - now))
+    return 0
+
+
+def rate_limit(scope, methods=('POST',)):
+    """Reject requests with 429 once the client IP has used up its limit for `scope`."""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped(request, *args, **kwargs):
+            if request.method in methods:
+                retry_after = consume_token(request, scope)
+                if retry_after:
+                    response = JsonResponse({'ok': False, 'error': f'FLOOD_WAIT_{retry_after}'}, status=429)
+                    response['Retry-After'] = str(retry_after)
+                    return response
+            return view_func(request, *args, **kwargs)
+        return wrapped
+    return decorator
@@ -0,0 +1,350 @@
+import atexit
+import hashlib
+import html
+import logging
+import multiprocessing
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+from django.core.cache import cache
+from . import blocks
+from .converters import converter_config, get_converter
+from .instrumentation import record_cache, timed
+from .metrics import RENDERS
+from .profiling import is_profiling
+from .telegraph import markdown_to_nodes
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+try:
+    import signal
+    HAS_ALARM = hasattr(signal, 'setitimer')
+except ImportError:  # pragma: no cover
+    HAS_ALARM = False
+
+logger = logging.getLogger(__name__)
+
+# Extra time the parent waits past the in-worker alarm before recycling the pool
+KILL_GRACE_SECONDS = 1.0
+
+
+# Regex versions of the rules in tapnote.markdown_extensions, applied to text/HTML
+# outside the 'note' converter.
+
+STRIKETHROUGH_RE = re.compile(r'~~(.*?)~~', re.DOTALL)
+LINK_RE = re.compile(r'<a(.*?)href="(.*?)"(.*?)>')
+ANCHOR_YOUTUBE_RE = re.compile(r'<p><a href="https?://(?:www\.)?youtu\.be/([^"]+)".*?>.*?</a></p>')
+PLAIN_YOUTUBE_RE = re.compile(r'<p>https?://(?:www\.)?youtu\.be/([^<]+)</p>')
+YOUTUBE_EMBED = (
+    r'<iframe width="560" height="315" '
+    r'src="https://www.youtube.com/embed/\1" '
+    r'frameborder="0" allowfullscreen></iframe>'
+)
+
+
+def apply_strikethrough(md_text):
+    # Replace ~~something~~ with <del>something</del>
+    return STRIKETHROUGH_RE.sub(r'<del>\1</del>', md_text)
+
+def process_markdown_links(html_content, target="_self"):
+    html_content = LINK_RE.sub(f'<a\\1href="\\2"\\3 target="{target}" rel="noopener noreferrer">', html_content)
+    html_content = ANCHOR_YOUTUBE_RE.sub(YOUTUBE_EMBED, html_content)
+    return PLAIN_YOUTUBE_RE.sub(YOUTUBE_EMBED, html_content)
+
+def render_note_html(content, link_target):
+    """Render note markdown to the HTML shown on the note page (CPU-bound, no DB access)."""
+    md = get_converter('note')
+    md.link_target = link_target
+    return md.convert(content)
+
+def render_note_sources(sources, link_target):
+    """render_note_html for each of the block sources of a tapnote.blocks.Plan."""
+    return [render_note_html(source, link_target) for source in sources]
+
+
+# Fallbacks when a render is aborted: escaped text, one paragraph per blank-line block,
+# so paragraph-anchored comments still line up roughly.
+
+def _plain_blocks(content):
+    return [block for block in re.split(r'\n\s*\n', content.strip()) if block.strip()]
+
+def plain_text_html(content):
+    return '\n'.join(f'<p>{html.escape(block)}</p>' for block in _plain_blocks(content))
+
+def plain_text_nodes(content):
+    return [{'tag': 'p', 'children': [block]} for block in _plain_blocks(content)]
+
+
+# Worker side. These run inside pool processes and must not touch Django settings or the DB.
+
+class RenderTimeout(Exception):
+    pass
+
+
+def _raise_timeout(signum, frame):
+    raise RenderTimeout()
+
+
+def _init_worker(memory_limit_mb):
+    if resource is not None and memory_limit_mb:
+        limit = memory_limit_mb * 1024 * 1024
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ValueError, OSError):
+            pass
+
+
+def _run_job(timeout, func, *args):
+    if HAS_ALARM:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return func(*args)
+    finally:
+        if HAS_ALARM:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+# Parent side
+
+class RenderPool:
+    """
+    Process pool that runs markdown conversions off the request thread.
+
+    Each job gets `timeout` seconds (enforced in the worker with an alarm, and in the
+    parent by recycling the pool if the worker does not answer) and an address-space
+    cap of `memory_limit_mb`. Failures return the caller's fallback instead of raising.
+    """
+
+    def __init__(self, workers, timeout, memory_limit_mb):
+        self.workers = workers
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(method),
+                    initializer=_init_worker,
+                    initargs=(self.memory_limit_mb,),
+                )
+            return self._executor
+
+    def _recycle(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        # A worker stuck in C code ignores the alarm; kill it so the slot is freed.
+        # ProcessPoolExecutor has no public API for this.
+        for process in list(getattr(executor, '_processes', {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, func, args, fallback):
+        executor = self._get_executor()
+        try:
+            future = executor.submit(_run_job, self.timeout, func, *args)
+            return future.result(timeout=self.timeout + KILL_GRACE_SECONDS)
+        except FutureTimeoutError:
+            logger.warning('Render exceeded %ss; recycling render pool', self.timeout)
+            self._recycle(executor)
+        except BrokenProcessPool:
+            logger.warning('Render pool worker died; recycling render pool')
+            self._recycle(executor)
+        except (RenderTimeout, MemoryError) as e:
+            logger.warning('Render aborted: %s', type(e).__name__)
+        except Exception:
+            logger.exception('Render failed')
+        # Every job takes the markdown source as its first argument
+        return fallback(args[0])
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_render_pool():
+    """Shared pool for this process, or None when RENDER_POOL_WORKERS is 0."""
+    global _pool
+    if not settings.RENDER_POOL_WORKERS:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = RenderPool(
+                workers=settings.RENDER_POOL_WORKERS,
+                timeout=settings.RENDER_TIMEOUT,
+                memory_limit_mb=settings.RENDER_MEMORY_LIMIT_MB,
+            )
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+# Block render cache: one entry per note, {block digest: HTML} for its current blocks
+RENDER_CACHE_PREFIX = 'tapnote:render'
+# Markdown characters converted per step while streaming a note page
+STREAM_RENDER_BATCH = 16 * 1024
+_converter_fingerprint = None
+
+
+def render_cache_version(link_target):
+    """Changes whenever cached block HTML could differ for the same markdown."""
+    global _converter_fingerprint
+    if _converter_fingerprint is None:
+        _converter_fingerprint = hashlib.sha256(repr(converter_config('note')).encode()).hexdigest()[:16]
+    return f'{_converter_fingerprint}:{link_target}'
+
+
+def _block_digest(source):
+    return hashlib.blake2b(source.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _render_inline(content):
+    pool = get_render_pool()
+    return pool is None or len(content) < settings.RENDER_POOL_MIN_LENGTH or is_profiling()
+
+
+def render_note(content, link_target, hashcode=None, fallback=plain_text_html):
+    """
+    HTML for view_note; long notes are rendered in the pool with time/memory limits
+    (inline while the request is being profiled), and fallback(content) is returned
+    when the pool gives up on them.
+
+    With a hashcode (and RENDER_BLOCK_CACHE on), the note is rendered block by block
+    (tapnote.blocks) and only blocks missing from its cache entry are converted, so
+    after an edit only the changed blocks are rendered again.
+    """
+    RENDERS.inc(kind='note')
+    with timed('markdown'):
+        if hashcode is None or not settings.RENDER_BLOCK_CACHE:
+            if _render_inline(content):
+                return render_note_html(content, link_target)
+            return get_render_pool().run(render_note_html, (content, link_target), fallback)
+        return _render_note_blocks(content, link_target, hashcode, fallback)
+
+
+def _cached_blocks(hashcode, link_target):
+    """(cache key, version, {digest: HTML}) of the note's block cache entry."""
+    key = f'{RENDER_CACHE_PREFIX}:{hashcode}'
+    version = render_cache_version(link_target)
+    entry = cache.get(key)
+    rendered = entry['blocks'] if entry is not None and entry['version'] == version else {}
+    return key, version, rendered
+
+
+def _convert_sources(sources, link_target):
+    """render_note_sources, in the pool when long; None when the pool gave up on them."""
+    if _render_inline(''.join(sources)):
+        return render_note_sources(sources, link_target)
+    return get_render_pool().run(render_note_sources, (sources, link_target), lambda sources: None)
+
+
+def _plain_source_html(source):
+    # Keeps the footnote group's separators, so Plan.iter_parts can still split it
+    return blocks.GROUP_SEPARATOR.join(plain_text_html(part) for part in source.split(blocks.GROUP_SEPARATOR))
+
+
+def _render_note_blocks(content, link_target, hashcode, fallback):
+    plan = blocks.plan(content)
+    sources = plan.sources() if plan is not None else [content]
+    digests = [_block_digest(source) for source in sources]
+
+    key, version, rendered = _cached_blocks(hashcode, link_target)
+    missing = {digest: source for digest, source in zip(digests, sources) if digest not in rendered}
+    record_cache('render', True, count=len(digests) - len(missing))
+    record_cache('render', False, count=len(missing))
+
+    if missing:
+        html_parts = _convert_sources(list(missing.values()), link_target)
+        if html_parts is None:
+            return fallback(content)  # not cached
+        rendered.update(zip(missing, html_parts))
+        # Only the current blocks are kept, so the entry does not grow with every edit
+        cache.set(key, {'version': version, 'blocks': {digest: rendered[digest] for digest in digests}},
+                  settings.RENDER_BLOCK_CACHE_TIMEOUT)
+
+    html_parts = [rendered[digest] for digest in digests]
+    return plan.assemble(html_parts) if plan is not None else html_parts[0]
+
+
+def iter_render_note(content, link_target, hashcode, chunk_size):
+    """
+    render_note(content, link_target, hashcode) as HTML chunks of about chunk_size
+    characters, for streamed note pages. Blocks in the note's cache entry are sent
+    as they are; missing blocks are converted STREAM_RENDER_BATCH characters at a
+    time as the stream reaches them, and the entry is updated at the end.
+    """
+    plan = blocks.plan(content) if settings.RENDER_BLOCK_CACHE else None
+    if plan is None:
+        yield render_note(content, link_target, hashcode)
+        return
+
+    RENDERS.inc(kind='note')
+    sources = plan.sources()
+    digests = [_block_digest(source) for source in sources]
+    key, version, rendered = _cached_blocks(hashcode, link_target)
+    missing = {digest for digest in digests if digest not in rendered}
+    record_cache('render', True, count=len(digests) - len(missing))
+    record_cache('render', False, count=len(missing))
+    fallback = {}
+    converted = False
+
+    def html(j):
+        nonlocal converted
+        if digests[j] in missing:
+            batch, size = {}, 0
+            for k in range(j, len(sources)):
+                if digests[k] in missing and digests[k] not in batch:
+                    batch[digests[k]] = sources[k]
+                    size += len(sources[k])
+                    if size >= STREAM_RENDER_BATCH:
+                        break
+            with timed('markdown'):
+                html_parts = _convert_sources(list(batch.values()), link_target)
+            if html_parts is None:
+                fallback.update((digest, _plain_source_html(source)) for digest, source in batch.items())
+            else:
+                rendered.update(zip(batch, html_parts))
+                converted = True
+            missing.difference_update(batch)
+        return fallback[digests[j]] if digests[j] in fallback else rendered[digests[j]]
+
+    buffer, size, separator = [], 0, ''
+    for part in plan.iter_parts(html):
+        buffer.append(part)
+        size += len(part)
+        if size >= chunk_size:
+            yield separator + '\n'.join(buffer)
+            buffer, size, separator = [], 0, '\n'
+    if buffer:
+        yield separator + '\n'.join(buffer)
+
+    if converted:
+        # Blocks the pool gave up on are left out, and converted again next time
+        cache.set(key, {'version': version, 'blocks': {d: rendered[d] for d in digests if d in rendered}},
+                  settings.RENDER_BLOCK_CACHE_TIMEOUT)
+
+
+def render_nodes(md_text):
+    """Telegraph nodes for getPage; same pooling rules as render_note."""
+    RENDERS.inc(kind='nodes')
+    with timed('markdown'):
+        pool = get_render_pool()
+        if pool is None or not md_text or len(md_text) < settings.RENDER_POOL_MIN_LENGTH or is_profiling():
+            return markdown_to_nodes(md_text)
+        return pool.run(markdown_to_nodes, (md_text,), plain_text_nodes)
@@ -0,0 +1,80 @@
+import json
+from collections.abc import Iterator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, StreamingHttpResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+STREAM_CHUNK_SIZE = 64 * 1024  # Bytes buffered before a chunk is handed to the server
+
+_django_default = DjangoJSONEncoder().default
+
+
+def dumps(data):
+    """Serialize to UTF-8 JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data, default=_django_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, cls=DjangoJSONEncoder).encode('utf-8')
+
+
+def _iter_json_pieces(data):
+    # Dicts are walked key by key; arrays (including lazy iterators) item by item,
+    # so each page or node is encoded on its own instead of as one big string.
+    if isinstance(data, dict):
+        yield b'{'
+        first = True
+        for key, value in data.items():
+            yield (b'' if first else b',') + dumps(str(key)) + b':'
+            first = False
+            yield from _iter_json_pieces(value)
+        yield b'}'
+    elif isinstance(data, (list, tuple, Iterator)):
+        yield b'['
+        first = True
+        for item in data:
+            if not first:
+                yield b','
+            first = False
+            yield dumps(item)
+        yield b']'
+    else:
+        yield dumps(data)
+
+
+def iter_json(data, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield `data` as JSON in chunks of roughly `chunk_size` bytes."""
+    buffer = []
+    size = 0
+    for piece in _iter_json_pieces(data):
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+class JsonResponse(HttpResponse):
+    """Drop-in replacement for django.http.JsonResponse backed by `dumps`."""
+
+    def __init__(self, data, safe=True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError(
+                'In order to allow non-dict objects to be serialized set the '
+                'safe parameter to False.'
+            )
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
+
+
+class StreamingJsonResponse(StreamingHttpResponse):
+    """JSON response written incrementally; iterator values are consumed lazily."""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(streaming_content=iter_json(data), **kwargs)
@@ -0,0 +1,131 @@
+"""
+Full-text search over notes and comments, for the admin and the staff search API.
+
+The indexes are FTS5 tables <table>_fts on SQLite, ranked with bm25(), and a
+search_vector tsvector column with a GIN index on PostgreSQL, ranked with
+ts_rank(), kept current by database triggers (migration 0010). Note content can
+be stored compressed on SQLite (tapnote.fields), so the note index there keeps
+its own copy of the text and is maintained by the signal handlers below instead
+(migrations 0013, 0014): writes from outside Django do not update it. Other backends, and SQLite
+builds without FTS5, fall back to unranked LIKE matching on the same fields.
+"""
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from .models import Note, Comment
+
+# Model -> (indexed fields, in weight order; fields matched exactly)
+SEARCH_FIELDS = {
+    Note: (('title', 'content'), ('hashcode',)),
+    Comment: (('content', 'user_name'), ('work_id',)),
+}
+# bm25() column weights on SQLite, matching the A/B weights of the tsvector
+SQLITE_WEIGHTS = (10.0, 1.0)
+
+_available = {}
+
+
+def index_backend(model):
+    """'sqlite', 'postgresql' or None when no full-text index exists for model."""
+    alias = router.db_for_read(model)
+    connection = connections[alias]
+    key = (alias, model._meta.db_table)
+    if key not in _available:
+        table = model._meta.db_table
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                tables = connection.introspection.table_names(cursor)
+                _available[key] = 'sqlite' if f'{table}_fts' in tables else None
+            elif connection.vendor == 'postgresql':
+                columns = connection.introspection.get_table_description(cursor, table)
+                _available[key] = 'postgresql' if any(c.name == 'search_vector' for c in columns) else None
+            else:
+                _available[key] = None
+    return _available[key]
+
+
+def fts5_query(text):
+    """User input as an FTS5 query: every word is a quoted phrase, all must match."""
+    return ' '.join('"{}"'.format(word.replace('"', '""')) for word in text.split())
+
+
+def match_sql(model, text):
+    """
+    SQL for an indexed model: (select matching ids, params), (select them best match
+    first, params).
+    """
+    table = model._meta.db_table
+    if index_backend(model) == 'sqlite':
+        fts = f'{table}_fts'
+        weights = ', '.join(str(w) for w in SQLITE_WEIGHTS)
+        ids_sql = f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s'
+        params = [fts5_query(text)]
+        return (ids_sql, params), (f'{ids_sql} ORDER BY bm25({fts}, {weights}), rowid', params)
+    query = "websearch_to_tsquery('simple', %s)"
+    ids_sql = f'SELECT id FROM {table} WHERE search_vector @@ {query}'
+    return (
+        (ids_sql, [text]),
+        (f'{ids_sql} ORDER BY ts_rank(search_vector, {query}) DESC, id', [text, text]),
+    )
+
+
+def filter_queryset(queryset, text):
+    """queryset narrowed to rows matching text (full-text or exact on the id-like fields)."""
+    text = text.strip()
+    indexed, exact = SEARCH_FIELDS[queryset.model]
+    condition = Q()
+    for field in exact:
+        condition |= Q(**{field: text})
+    if index_backend(queryset.model) is None:
+        for field in indexed:
+            condition |= Q(**{f'{field}__icontains': text})
+        return queryset.filter(condition)
+    if not text.split():
+        return queryset.none()
+    (ids_sql, params), _ = match_sql(queryset.model, text)
+    return queryset.filter(condition | Q(pk__in=RawSQL(ids_sql, params)))
+
+
+def search(queryset, text, limit, offset=0):
+    """
+    (total matches, one page of matching objects, best match first). Matching runs on
+    the whole table; queryset only shapes the loaded objects (e.g. .defer('content')).
+    """
+    if not text.split():
+        return 0, []
+    model = queryset.model
+    if index_backend(model) is None:
+        matches = filter_queryset(queryset, text).order_by('-pk')
+        return matches.count(), list(matches[offset:offset + limit])
+
+    (ids_sql, ids_params), (ranked_sql, ranked_params) = match_sql(model, text)
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) FROM ({ids_sql}) matches', ids_params)
+        total = cursor.fetchone()[0]
+        cursor.execute(f'{ranked_sql} LIMIT %s OFFSET %s', ranked_params + [limit, offset])
+        ids = [row[0] for row in cursor.fetchall()]
+    objects = queryset.in_bulk(ids)
+    return total, [objects[pk] for pk in ids if pk in objects]
+
+
+def index_note(sender, instance, using, update_fields=None, **kwargs):
+    """post_save handler for Note: replace its row in the SQLite index."""
+    if index_backend(Note) != 'sqlite':
+        return
+    if update_fields is not None and not set(update_fields) & set(SEARCH_FIELDS[Note][0]):
+        return
+    fts = f'{Note._meta.db_table}_fts'
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {fts} WHERE rowid = %s', [instance.pk])
+        cursor.execute(
+            f'INSERT INTO {fts}(rowid, title, content) VALUES (%s, %s, %s)',
+            [instance.pk, instance.title, instance.content],
+        )
+
+
+def unindex_note(sender, instance, using, **kwargs):
+    """post_delete handler for Note (runs in the deletion's transaction)."""
+    if index_backend(Note) != 'sqlite':
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {Note._meta.db_table}_fts WHERE rowid = %s', [instance.pk])
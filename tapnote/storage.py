@@ -0,0 +1,16 @@
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+class StaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """
+    Hashed file names plus gzip (and brotli, when installed) copies written by
+    collectstatic, so WhiteNoise can serve them compressed with immutable cache headers.
+
+    Before collectstatic has produced a manifest (development, tests) URLs fall back
+    to the plain file names instead of raising.
+    """
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
@@ -1,5 +1,16 @@
+import re
+import json
+import html
 import markdown
+from markdown import util as md_util
 from html.parser import HTMLParser
+from .converters import get_converter
+from .limits import ALLOWED_TAGS, MAX_NODE_COUNT, MAX_NODE_DEPTH, MAX_NODE_TEXT_LENGTH
+
+# Same pattern Python-Markdown's serializer uses to decide which '&' to escape
+RE_AMP = re.compile(r'&(?!(?:\#[0-9]+|\#x[0-9a-f]+|[0-9a-z]+);)', re.I)
+# Raw HTML elements outside ALLOWED_TAGS are unwrapped, except these, whose text is not content
+DROPPED_TAGS = frozenset(['script', 'style', 'template'])
 
 class DOMBuilder(HTMLParser):
     def __init__(self):
@@ -43,14 +54,211 @@ class DOMBuilder(HTMLParser):
                 current['children'] = []
             current['children'].append(data)
 
-def markdown_to_nodes(md_text):
-    if not md_text:
-        return []
-    html = markdown.markdown(md_text)
+class _NeedsSerialization(Exception):
+    """Raised when the element tree still holds stash placeholders (raw HTML, entities)."""
+
+
+def _tree_text(value):
+    # Reproduce serialize -> HTMLParser(convert_charrefs=True) for a text run
+    if md_util.STX in value:
+        raise _NeedsSerialization()
+    if '&' in value:
+        value = html.unescape(RE_AMP.sub('&amp;', value))
+    return str(value)
+
+
+def _element_to_node(elem):
+    if not isinstance(elem.tag, str):
+        raise _NeedsSerialization()
+    node = {'tag': elem.tag}
+    if len(elem.attrib):
+        # The serializer writes attributes in lexical order; boolean ones as bare names
+        node['attrs'] = {k: (None if k == v else _tree_text(v)) for k, v in sorted(elem.items())}
+    children = []
+    if elem.text:
+        children.append(_tree_text(elem.text))
+    for child in elem:
+        children.append(_element_to_node(child))
+        if child.tail:
+            children.append(_tree_text(child.tail))
+    node['children'] = children
+    return node
+
+
+def _root_to_nodes(root):
+    # Markdown strips the whole serialized document, so only the outer text runs are trimmed
+    pieces = [root.text or '']
+    for child in root:
+        pieces.append(child)
+        pieces.append(child.tail or '')
+    pieces[0] = pieces[0].lstrip()
+    pieces[-1] = pieces[-1].rstrip()
+
+    nodes = []
+    for piece in pieces:
+        if isinstance(piece, str):
+            if piece:
+                nodes.append(_tree_text(piece))
+        else:
+            nodes.append(_element_to_node(piece))
+    return nodes
+
+
+def _serialize_tree(md, root):
+    # Tail end of markdown.Markdown.convert(): serialize, strip the doc tag, post-process
+    output = md.serializer(root)
+    start = output.find('<%s>' % md.doc_tag)
+    end = output.rfind('</%s>' % md.doc_tag)
+    if start == -1 or end == -1:
+        output = ''
+    else:
+        output = output[start + len(md.doc_tag) + 2:end].strip()
+    for pp in md.postprocessors:
+        output = pp.run(output)
+    return output.strip()
+
+
+def html_to_nodes(html_text):
     builder = DOMBuilder()
-    builder.feed(html)
+    builder.feed(html_text)
     return builder.root
 
+
+def normalize_nodes(nodes):
+    """
+    Make nodes built from raw HTML acceptable to validate_nodes, so getPage output
+    can be sent back to editPage: elements outside ALLOWED_TAGS are replaced by
+    their children (DROPPED_TAGS by nothing) and bare attributes get '' values.
+    Works in place, iteratively, since raw HTML can nest deeper than the recursion limit.
+    """
+    stack = [nodes]
+    while stack:
+        children = stack.pop()
+        i = 0
+        while i < len(children):
+            node = children[i]
+            if isinstance(node, dict):
+                if node['tag'] not in ALLOWED_TAGS:
+                    # The spliced-in children are checked in turn
+                    children[i:i + 1] = [] if node['tag'] in DROPPED_TAGS else node.get('children', [])
+                    continue
+                attrs = node.get('attrs')
+                if attrs:
+                    node['attrs'] = {k: '' if v is None else v for k, v in attrs.items()}
+                if node.get('children'):
+                    stack.append(node['children'])
+            i += 1
+    return nodes
+
+
+def markdown_to_nodes_html(md_text):
+    """Reference engine: render HTML, then re-parse it with DOMBuilder."""
+    if not md_text:
+        return []
+    return normalize_nodes(html_to_nodes(markdown.markdown(md_text)))
+
+
+def markdown_to_nodes(md_text):
+    """
+    Convert markdown to Telegraph nodes by walking Python-Markdown's element tree,
+    skipping HTML serialization and re-parsing. Documents containing raw HTML fall
+    back to serializing the same tree and parsing it with DOMBuilder, and their
+    nodes are normalized (normalize_nodes).
+    """
+    if not md_text or not md_text.strip():
+        return []
+
+    md = get_converter('telegraph')
+    lines = md_text.split("\n")
+    for prep in md.preprocessors:
+        lines = prep.run(lines)
+    root = md.parser.parseDocument(lines).getroot()
+    for treeprocessor in md.treeprocessors:
+        new_root = treeprocessor.run(root)
+        if new_root is not None:
+            root = new_root
+
+    if md.htmlStash.html_counter == 0:
+        try:
+            return _root_to_nodes(root)
+        except _NeedsSerialization:
+            pass
+    return normalize_nodes(html_to_nodes(_serialize_tree(md, root)))
+
+class NodeValidationError(ValueError):
+    """Raised when a Telegraph node payload is malformed or exceeds the configured limits."""
+
+    def __init__(self, error, status=400):
+        super().__init__(error)
+        self.error = error
+        self.status = status
+
+
+def validate_nodes(nodes, max_depth=MAX_NODE_DEPTH, max_count=MAX_NODE_COUNT,
+                   max_text_length=MAX_NODE_TEXT_LENGTH, allowed_tags=ALLOWED_TAGS):
+    """
+    Check a node tree in a single iterative pass, bailing out at the first violation.
+    Must run before nodes_to_markdown, which recurses and trusts the structure.
+    """
+    if not isinstance(nodes, list):
+        raise NodeValidationError('Invalid content format')
+
+    count = 0
+    text_length = 0
+    stack = [(nodes, 1)]
+    while stack:
+        children, depth = stack.pop()
+        if depth > max_depth:
+            raise NodeValidationError('CONTENT_TOO_DEEP')
+        for node in children:
+            count += 1
+            if count > max_count:
+                raise NodeValidationError('CONTENT_TOO_BIG', status=413)
+            if isinstance(node, str):
+                text_length += len(node)
+                if text_length > max_text_length:
+                    raise NodeValidationError('CONTENT_TOO_BIG', status=413)
+                continue
+            if not isinstance(node, dict):
+                raise NodeValidationError('Invalid content format')
+
+            tag = node.get('tag')
+            if tag not in allowed_tags:
+                raise NodeValidationError('TAG_NOT_ALLOWED')
+
+            attrs = node.get('attrs')
+            if attrs is not None:
+                if not isinstance(attrs, dict):
+                    raise NodeValidationError('Invalid content format')
+                for value in attrs.values():
+                    if not isinstance(value, str):
+                        raise NodeValidationError('Invalid content format')
+                    text_length += len(value)
+                if text_length > max_text_length:
+                    raise NodeValidationError('CONTENT_TOO_BIG', status=413)
+
+            node_children = node.get('children')
+            if node_children is not None:
+                if not isinstance(node_children, list):
+                    raise NodeValidationError('Invalid content format')
+                stack.append((node_children, depth + 1))
+
+
+def parse_nodes(content_raw):
+    """Decode the `content` argument of createPage/editPage and validate the tree."""
+    if isinstance(content_raw, str):
+        try:
+            nodes = json.loads(content_raw)
+        except json.JSONDecodeError:
+            raise NodeValidationError('Content must be a valid JSON string of nodes')
+    elif isinstance(content_raw, list):
+        nodes = content_raw
+    else:
+        raise NodeValidationError('Invalid content format')
+    validate_nodes(nodes)
+    return nodes
+
+
 def nodes_to_markdown(nodes):
     if not nodes:
         return ""
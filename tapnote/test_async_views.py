@@ -0,0 +1,64 @@
+import json
+from django.http import Http404
+from django.test import TestCase, AsyncRequestFactory, override_settings
+from .models import Note, Comment, LikeRecord
+from . import async_views
+from .views import comment_reader_id
+
+
+class AsyncViewsTests(TestCase):
+    """Test cases for the native async read views"""
+
+    def setUp(self):
+        self.factory = AsyncRequestFactory()
+        self.note = Note.objects.create(title="Async", content="# Heading\n\n~~gone~~ text")
+
+    async def test_view_note_renders_and_counts_view(self):
+        request = self.factory.get(f'/{self.note.hashcode}/')
+        response = await async_views.view_note(request, self.note.hashcode)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'<del>gone</del>', response.content)
+        self.assertEqual(await Note.objects.values_list('views', flat=True).aget(pk=self.note.pk), 1)
+
+    @override_settings(STREAM_NOTE_MIN_LENGTH=10)
+    async def test_view_note_streams_long_notes(self):
+        request = self.factory.get(f'/{self.note.hashcode}/')
+        response = await async_views.view_note(request, self.note.hashcode)
+        self.assertTrue(response.is_async)
+        page = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertIn(b'<del>gone</del>', page)
+
+    async def test_view_note_missing(self):
+        request = self.factory.get('/missing1/')
+        with self.assertRaises(Http404):
+            await async_views.view_note(request, 'missing1')
+
+    async def test_get_page_with_content(self):
+        request = self.factory.get(f'/getPage/{self.note.hashcode}', {'return_content': 'true'})
+        response = await async_views.api_get_page(request, path=self.note.hashcode)
+        result = json.loads(response.content)['result']
+        self.assertEqual(result['title'], 'Async')
+        self.assertEqual(result['content'][0]['tag'], 'h1')
+
+    async def test_get_views(self):
+        request = self.factory.post('/getViews', {'path': self.note.hashcode}, content_type='application/json')
+        response = await async_views.api_get_views(request)
+        self.assertEqual(json.loads(response.content)['result']['views'], 0)
+
+    async def test_comments_get_marks_liked(self):
+        comment = await Comment.objects.acreate(
+            site_id='tapnote', work_id=self.note.hashcode, chapter_id='main', para_index=2, content='hi'
+        )
+        request = self.factory.get('/api/v1/comments', {
+            'siteId': 'tapnote', 'workId': self.note.hashcode, 'chapterId': 'main'
+        })
+        await LikeRecord.objects.acreate(comment=comment, user_id=comment_reader_id(request, 'tapnote'))
+
+        response = await async_views.api_comments(request)
+        by_para = json.loads(response.content)['commentsByPara']
+        self.assertEqual(by_para['2'][0]['content'], 'hi')
+        self.assertTrue(by_para['2'][0]['isLiked'])
+
+    def test_async_views_are_csrf_exempt(self):
+        for view in (async_views.api_comments, async_views.api_get_page, async_views.api_get_views):
+            self.assertTrue(getattr(view, 'csrf_exempt', False))
@@ -0,0 +1,22 @@
+from django.test import TestCase, override_settings
+from .bench import run_benchmarks
+
+TINY_SCALE = {'note_sizes': (500,), 'comment_counts': (5,), 'account_pages': 3}
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class BenchmarkSuiteTests(TestCase):
+    """Smoke test: every benchmark case runs and reports its measurements"""
+
+    def test_all_cases_run(self):
+        results = run_benchmarks(TINY_SCALE, repeat=1)
+        self.assertIn('view_note[500]', results)
+        self.assertIn('api_comments GET[5]', results)
+        self.assertIn('export_data', results)
+        for name, result in results.items():
+            self.assertEqual(set(result), {'min_ms', 'median_ms', 'queries', 'peak_kib'}, name)
+        self.assertEqual(results['markdown_to_nodes[500]']['queries'], 0)
+
+    def test_only_filter(self):
+        results = run_benchmarks(TINY_SCALE, repeat=1, only='nodes_to_markdown')
+        self.assertEqual(list(results), ['nodes_to_markdown[500]'])
@@ -0,0 +1,68 @@
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from .comments import comment_counts, comment_counts_key
+from .models import Note, Comment
+
+
+class InlineCommentsTests(TestCase):
+    """Test cases for the comment data inlined into note pages"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.note = Note.objects.create(content="First.\n\nSecond.\n\nThird.")
+        self.url = reverse('view_note', args=[self.note.hashcode])
+
+    def comment(self, para_index, **kwargs):
+        fields = {'site_id': 'tapnote', 'work_id': self.note.hashcode, 'chapter_id': 'main'}
+        fields.update(kwargs)
+        return Comment.objects.create(para_index=para_index, content=f"on {para_index}", **fields)
+
+    def inlined(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.context['initial_comments']
+
+    def test_counts_and_comments_inlined(self):
+        self.comment(0)
+        self.comment(2)
+        self.comment(2)
+        self.comment(1, site_id='elsewhere')
+        response = self.client.get(self.url)
+        self.assertContains(response, 'data-initial-data="paranote-data"')
+        self.assertContains(response, '<script id="paranote-data" type="application/json">')
+        data = response.context['initial_comments']
+        self.assertEqual(data['counts'], {'0': 1, '2': 2})
+        self.assertEqual([c['content'] for c in data['commentsByPara']['2']], ['on 2', 'on 2'])
+        self.assertFalse(data['commentsByPara']['0'][0]['isLiked'])
+
+    def test_no_comments_needs_no_comment_query(self):
+        self.assertEqual(self.inlined(), {'counts': {}, 'commentsByPara': {}})
+        with self.assertNumQueries(0):
+            self.assertEqual(comment_counts('tapnote', self.note.hashcode, 'main'), {})
+
+    @override_settings(INLINE_COMMENTS_LIMIT=1)
+    def test_counts_only_above_limit(self):
+        self.comment(0)
+        self.comment(1)
+        self.assertEqual(self.inlined(), {'counts': {'0': 1, '1': 1}})
+
+    def test_cache_follows_writes(self):
+        first = self.comment(0)
+        self.assertEqual(self.inlined()['counts'], {'0': 1})
+        self.comment(1)
+        self.assertEqual(self.inlined()['counts'], {'0': 1, '1': 1})
+        first.delete()
+        self.assertEqual(self.inlined()['counts'], {'1': 1})
+        # Comments moved by a note edit (tapnote.paragraphs)
+        self.note.content = "Zeroth.\n\nFirst.\n\nSecond.\n\nThird."
+        self.note.save()
+        self.assertIsNone(cache.get(comment_counts_key('tapnote', self.note.hashcode, 'main')))
+        self.assertEqual(self.inlined()['counts'], {'2': 1})
+
+    @override_settings(INLINE_COMMENT_COUNTS=False)
+    def test_disabled(self):
+        response = self.client.get(self.url)
+        self.assertIsNone(response.context['initial_comments'])
+        self.assertNotContains(response, 'paranote-data')
@@ -35,3 +35,119 @@ class CommentConfigTests(TestCase):
         # Like API should also be disabled
         response = self.client.post(reverse('api_like_comment'))
         self.assertEqual(response.status_code, 403)
+
+
+class SQLitePragmaTests(TestCase):
+    """Test cases for per-connection SQLite tuning"""
+
+    def test_pragmas_applied_on_connect(self):
+        from django.db import connection
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA temp_store')
+            self.assertEqual(cursor.fetchone()[0], 2)  # MEMORY
+
+    def test_invalid_pragma_rejected(self):
+        from .db import apply_pragmas
+        with self.assertRaises(ValueError):
+            apply_pragmas(None, {'journal_mode': 'WAL; DROP TABLE tapnote_note'})
+
+
+class StartupTests(TestCase):
+    """Test cases for the gunicorn startup helpers"""
+
+    def test_collectstatic_skipped_when_unchanged(self):
+        import io
+        import tempfile
+        from django.core.management import call_command
+        with tempfile.TemporaryDirectory() as static_root, override_settings(STATIC_ROOT=static_root):
+            call_command('collectstatic_if_changed', verbosity=0, stdout=io.StringIO())
+            out = io.StringIO()
+            call_command('collectstatic_if_changed', stdout=out)
+            self.assertIn('skipping', out.getvalue())
+
+    def test_warm_up_loads_converters(self):
+        from .converters import _local
+        from .warmup import warm_up
+        warm_up()
+        self.assertIn('note', _local.converters)
+
+    def test_default_workers_capped(self):
+        import os
+        import runpy
+        from unittest import mock
+        from django.conf import settings
+        path = os.path.join(settings.BASE_DIR, 'gunicorn.conf.py')
+        with mock.patch.dict(os.environ, {'GUNICORN_WORKER_CLASS': 'sync'}), \
+                mock.patch('os.sched_getaffinity', return_value=set(range(32)), create=True):
+            os.environ.pop('WEB_CONCURRENCY', None)
+            config = runpy.run_path(path)
+            self.assertEqual(config['workers'], config['MAX_DEFAULT_WORKERS'])
+            os.environ['WEB_CONCURRENCY'] = '12'
+            self.assertEqual(runpy.run_path(path)['workers'], 12)
+
+
+class StaticFilesTests(TestCase):
+    """Test cases for hashed, precompressed static files"""
+
+    def test_unhashed_url_without_manifest(self):
+        import tempfile
+        from django.templatetags.static import static
+        with tempfile.TemporaryDirectory() as static_root, override_settings(STATIC_ROOT=static_root):
+            self.assertEqual(static('js/paranote.js'), '/static/js/paranote.js')
+
+    def test_hashed_files_served_compressed_and_immutable(self):
+        import io
+        import tempfile
+        from django.core.management import call_command
+        from django.http import HttpResponse
+        from django.templatetags.static import static
+        from django.test import RequestFactory
+        from whitenoise.middleware import WhiteNoiseMiddleware
+        with tempfile.TemporaryDirectory() as static_root, override_settings(STATIC_ROOT=static_root, DEBUG=False):
+            call_command('collectstatic_if_changed', verbosity=0, stdout=io.StringIO())
+            url = static('js/paranote.js')
+            self.assertRegex(url, r'^/static/js/paranote\.[0-9a-f]{12}\.js$')
+
+            middleware = WhiteNoiseMiddleware(lambda request: HttpResponse(status=404))
+            response = middleware(RequestFactory().get(url, HTTP_ACCEPT_ENCODING='gzip'))
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('immutable', response['Cache-Control'])
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            response.close()
+
+
+class BootstrapFlagTests(TestCase):
+    """Test cases for the cached setup-complete flag"""
+
+    def setUp(self):
+        from .bootstrap import setup_complete
+        setup_complete.clear()
+
+    def test_flag_cached_after_first_check(self):
+        from django.contrib.auth.models import User
+        from .bootstrap import setup_complete
+        with self.assertNumQueries(1):
+            self.assertFalse(setup_complete.is_set())
+        User.objects.create_user(username='admin', password='password')
+        with self.assertNumQueries(1):
+            self.assertTrue(setup_complete.is_set())
+        with self.assertNumQueries(0):
+            self.assertTrue(setup_complete.is_set())
+
+    def test_flag_cleared_when_last_user_deleted(self):
+        from django.contrib.auth.models import User
+        from .bootstrap import setup_complete
+        first = User.objects.create_user(username='a', password='password')
+        User.objects.create_user(username='b', password='password')
+        self.assertTrue(setup_complete.is_set())
+        first.delete()
+        with self.assertNumQueries(0):
+            self.assertTrue(setup_complete.is_set())
+        User.objects.all().delete()
+        self.assertFalse(setup_complete.is_set())
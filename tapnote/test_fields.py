@@ -0,0 +1,83 @@
+import io
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from .fields import CompressedText, CompressedTextField, decompress
+from .models import Note
+from .search import search
+
+LONG_TEXT = "A paragraph of prose that repeats itself. " * 100
+
+
+def stored_type(note):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT typeof(content) FROM tapnote_note WHERE id = %s", [note.pk])
+        return cursor.fetchone()[0]
+
+
+@override_settings(NOTE_COMPRESSION='zlib')
+class CompressedTextFieldTests(TestCase):
+    """Test cases for compressed note content"""
+
+    def test_long_content_stored_compressed(self):
+        note = Note.objects.create(content=LONG_TEXT)
+        self.assertEqual(stored_type(note), 'blob')
+        self.assertEqual(Note.objects.get(pk=note.pk).content, LONG_TEXT)
+
+    def test_short_content_stays_text(self):
+        note = Note.objects.create(content="Short note")
+        self.assertEqual(stored_type(note), 'text')
+        self.assertEqual(Note.objects.get(pk=note.pk).content, "Short note")
+
+    @override_settings(NOTE_COMPRESSION='')
+    def test_compression_disabled(self):
+        note = Note.objects.create(content=LONG_TEXT)
+        self.assertEqual(stored_type(note), 'text')
+
+    def test_decompressed_on_first_access(self):
+        note = Note.objects.get(pk=Note.objects.create(content=LONG_TEXT).pk)
+        self.assertIsInstance(note.__dict__['content'], CompressedText)
+        self.assertEqual(note.description, LONG_TEXT[:100])
+        self.assertEqual(note.content, LONG_TEXT)
+        self.assertIsInstance(note.__dict__['content'], str)
+
+    def test_unread_value_written_back_as_is(self):
+        stored = CompressedText(b'z' + b'payload')
+        self.assertEqual(CompressedTextField().get_db_prep_value(stored, connection), b'zpayload')
+
+    def test_search_reads_compressed_content(self):
+        note = Note.objects.create(content=LONG_TEXT + " unmistakable")
+        self.assertEqual(search(Note.objects.all(), 'unmistakable', limit=10), (1, [note]))
+        note.content = LONG_TEXT
+        note.save()
+        self.assertEqual(search(Note.objects.all(), 'unmistakable', limit=10), (0, []))
+
+    def test_schema_does_not_call_tapnote_text(self):
+        # Writes from connections without the function (sqlite3 shell, backups) must work
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE sql LIKE '%tapnote_text%'")
+            self.assertEqual(cursor.fetchall(), [])
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            decompress(b'?data')
+
+    def test_recompress_notes(self):
+        with self.settings(NOTE_COMPRESSION=''):
+            old = Note.objects.create(content=LONG_TEXT)
+        short = Note.objects.create(content="Short note")
+        out = io.StringIO()
+        call_command('recompress_notes', stdout=out)
+        self.assertIn('Rewrote 1 note(s) as zlib', out.getvalue())
+        self.assertEqual((stored_type(old), stored_type(short)), ('blob', 'text'))
+        self.assertEqual(Note.objects.get(pk=old.pk).content, LONG_TEXT)
+        # Rows already in the configured form are left alone
+        call_command('recompress_notes', stdout=out)
+        self.assertIn('Rewrote 0 note(s)', out.getvalue())
+
+    def test_recompress_notes_decompresses_when_disabled(self):
+        note = Note.objects.create(content=LONG_TEXT)
+        with self.settings(NOTE_COMPRESSION=''):
+            call_command('recompress_notes', stdout=io.StringIO())
+        self.assertEqual(stored_type(note), 'text')
+        self.assertEqual(Note.objects.get(pk=note.pk).content, LONG_TEXT)
@@ -0,0 +1,88 @@
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import TestCase, Client, AsyncRequestFactory, override_settings
+from django.urls import reverse
+from .instrumentation import RequestMetrics, _current, install_query_recorder, record_query
+from .models import Note
+from . import async_views
+
+
+class InstrumentationMiddlewareTests(TestCase):
+    """Test cases for the sampled Server-Timing instrumentation"""
+
+    def setUp(self):
+        self.note = Note.objects.create(content="# Title\n\nSome **text**.")
+        # The test connection was opened with the default rate of 0, without the recorder
+        install_query_recorder(None, connection)
+        self.addCleanup(connection.execute_wrappers.remove, record_query)
+
+    def test_query_recorder_not_connected_by_default(self):
+        self.assertFalse(connection_created.disconnect(dispatch_uid='tapnote.install_query_recorder'))
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=1.0)
+    def test_server_timing_header(self):
+        with self.assertLogs('tapnote.instrumentation', 'INFO') as logs:
+            response = Client().get(reverse('view_note', args=[self.note.hashcode]))
+        header = response['Server-Timing']
+        self.assertRegex(header, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn('markdown;dur=', header)
+        self.assertIn('template;dur=', header)
+        self.assertIn('total;dur=', header)
+        record = logs.records[0]
+        self.assertEqual(record.status, 200)
+        self.assertGreater(record.db_queries, 0)
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=1.0, INSTRUMENTATION_SERVER_TIMING=False)
+    def test_header_can_be_disabled(self):
+        with self.assertLogs('tapnote.instrumentation', 'INFO'):
+            response = Client().get(reverse('view_note', args=[self.note.hashcode]))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=1.0, STREAM_NOTE_MIN_LENGTH=10)
+    def test_streamed_page_logged_when_closed(self):
+        with self.assertLogs('tapnote.instrumentation', 'INFO') as logs:
+            response = Client().get(reverse('view_note', args=[self.note.hashcode]))
+            self.assertTrue(response.streaming)
+            self.assertIn('total;dur=', response['Server-Timing'])
+            self.assertNotIn('markdown;dur=', response['Server-Timing'])
+            b''.join(response.streaming_content)
+            response.close()
+        self.assertEqual(len(logs.records), 1)
+        self.assertGreater(logs.records[0].markdown_ms, 0)
+
+    def test_disabled_by_default(self):
+        response = Client().get(reverse('view_note', args=[self.note.hashcode]))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=1e-9)
+    def test_unsampled_request_untouched(self):
+        response = Client().get(reverse('view_note', args=[self.note.hashcode]))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(RATE_LIMIT_ENABLED=True, RATE_LIMITS={'comment': (5, 60)})
+    def test_cache_hits_counted(self):
+        from django.core.cache import cache
+        from django.test import RequestFactory
+        from .ratelimit import consume_token
+        cache.clear()
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            request = RequestFactory().post('/api/v1/comments')
+            consume_token(request, 'comment')
+            consume_token(request, 'comment')
+        finally:
+            _current.reset(token)
+        self.assertEqual((metrics.counts['cache_hits'], metrics.counts['cache_misses']), (1, 1))
+        self.assertIn('cache;desc="hit=1 miss=1"', metrics.server_timing(0.01))
+
+    async def test_async_view_metrics(self):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            request = AsyncRequestFactory().get(f'/{self.note.hashcode}/')
+            await async_views.view_note(request, self.note.hashcode)
+        finally:
+            _current.reset(token)
+        self.assertGreater(metrics.counts['db_queries'], 0)
+        self.assertIn('markdown', metrics.durations)
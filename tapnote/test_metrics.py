@@ -0,0 +1,78 @@
+import json
+import os
+import tempfile
+from django.contrib.auth.models import User
+from django.test import TestCase, SimpleTestCase, Client, override_settings
+from django.urls import reverse
+from .metrics import Registry, Counter, Histogram
+from .models import Note
+
+
+@override_settings(METRICS_ENABLED=True)
+class RegistryTests(SimpleTestCase):
+    """Test cases for the metrics registry and text exposition"""
+
+    def setUp(self):
+        self.registry = Registry()
+        self.counter = Counter('test_events_total', 'Events.', ['kind'], registry=self.registry)
+        self.histogram = Histogram('test_seconds', 'Latency.', buckets=(0.1, 1.0), registry=self.registry)
+
+    def test_exposition_format(self):
+        self.counter.inc(kind='a')
+        self.counter.inc(2, kind='a')
+        self.histogram.observe(0.5)
+        self.histogram.observe(3)
+        text = self.registry.exposition()
+        self.assertIn('# TYPE test_events_total counter\ntest_events_total{kind="a"} 3\n', text)
+        self.assertIn(
+            'test_seconds_bucket{le="0.1"} 0\ntest_seconds_bucket{le="1.0"} 1\ntest_seconds_bucket{le="+Inf"} 2\n',
+            text,
+        )
+        self.assertIn('test_seconds_sum 3.5\ntest_seconds_count 2\n', text)
+
+    def test_wrong_labels_rejected(self):
+        with self.assertRaises(ValueError):
+            self.counter.inc(other='x')
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        self.counter.inc(kind='a')
+        self.assertEqual(self.registry.collect(), {})
+
+    def test_multiprocess_files_are_summed(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            # An exited worker whose PID the current process now has
+            with open(os.path.join(directory, f'{os.getpid()}-1.json'), 'w') as f:
+                json.dump([['test_events_total', [['kind', 'a']], 5]], f)
+            self.counter.inc(kind='a')
+            self.assertEqual(len(os.listdir(directory)), 2)
+            self.assertIn(self.registry.file_name(), os.listdir(directory))
+            self.assertIn('test_events_total{kind="a"} 6\n', self.registry.exposition())
+
+
+@override_settings(METRICS_ENABLED=True, METRICS_TOKEN='scrape-secret')
+class MetricsEndpointTests(TestCase):
+    """Test cases for the staff-only /metrics endpoint"""
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_anonymous_forbidden(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 403)
+
+    def test_bearer_token(self):
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 403)
+
+    def test_staff_sees_request_latency_by_view(self):
+        note = Note.objects.create(content="Hello")
+        self.client.get(reverse('view_note', args=[note.hashcode]))
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        text = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('tapnote_request_duration_seconds_count{view="view_note"}', text)
+        self.assertIn('tapnote_renders_total{kind="note"}', text)
+        self.assertIn('tapnote_view_count_update_seconds_count', text)
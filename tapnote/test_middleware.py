@@ -0,0 +1,36 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, Client
+from django.urls import reverse
+from .models import Note, TelegraphAccount
+
+
+class SessionlessMiddlewareTests(TestCase):
+    """Test cases for skipping session/auth/messages on token API views"""
+
+    def setUp(self):
+        self.client = Client()
+        self.account = TelegraphAccount.objects.create(short_name='api')
+        self.note = Note.objects.create(content="Hello", account=self.account)
+
+    def test_api_view_has_no_session_or_messages(self):
+        response = self.client.post(reverse('api_get_page'), {'path': self.note.hashcode})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(hasattr(response.wsgi_request, 'session'))
+        self.assertFalse(hasattr(response.wsgi_request, '_messages'))
+        self.assertNotIn('Cookie', response.get('Vary', ''))
+
+    def test_page_view_keeps_session(self):
+        response = self.client.get(reverse('view_note', args=[self.note.hashcode]))
+        self.assertTrue(hasattr(response.wsgi_request, 'session'))
+
+    def test_user_loaded_lazily_for_staff_checks(self):
+        admin = User.objects.create_superuser(username='admin', password='password', email='admin@example.com')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('api_ban'), {'siteId': 'site'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.wsgi_request.user, admin)
+
+    def test_anonymous_user_without_session_cookie(self):
+        response = self.client.get(reverse('api_ban'), {'siteId': 'site'})
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
@@ -0,0 +1,156 @@
+from unittest import mock
+from django.core.cache import cache
+from django.db.models import F
+from django.test import TestCase, override_settings
+from . import paragraphs, rendering
+from .models import Note, Comment, ParagraphMap
+from .paragraphs import deferred_paragraph_maps, paragraph_texts, remap_ranges
+
+
+class ParagraphMapTests(TestCase):
+    """Test cases for re-anchoring comments when a note is edited"""
+
+    def setUp(self):
+        self.note = Note.objects.create(content="First.\n\nSecond.\n\nThird.\n\nFourth.")
+
+    def comment(self, para_index):
+        return Comment.objects.create(
+            site_id='tapnote', work_id=self.note.hashcode, chapter_id='main',
+            para_index=para_index, content=f"on {para_index}",
+        )
+
+    def edit(self, content):
+        self.note.content = content
+        self.note.save()
+
+    def indexes(self, comments):
+        return [Comment.objects.get(pk=c.pk).para_index for c in comments]
+
+    def test_paragraph_texts(self):
+        html = '<h1>Title</h1><p>One &amp; <em>two</em></p><blockquote><p> Three </p></blockquote>'
+        self.assertEqual(paragraph_texts(html), ['One & two', 'Three'])
+
+    def test_map_created_on_first_edit(self):
+        self.assertFalse(ParagraphMap.objects.filter(note=self.note).exists())
+        self.edit("First.\n\nSecond.\n\nThird.\n\nFourth!")
+        stored = ParagraphMap.objects.get(note=self.note)
+        self.assertEqual(stored.revision, 0)
+        self.assertEqual([text for _, text in stored.paragraphs], ['First.', 'Second.', 'Third.', 'Fourth!'])
+
+    def test_edit_converts_changed_blocks_only(self):
+        cache.clear()
+        rendering.render_note(self.note.content, self.note.link_target, self.note.hashcode)  # a page view
+        with mock.patch.object(rendering, 'render_note_sources', wraps=rendering.render_note_sources) as convert:
+            self.edit("First.\n\nSecond.\n\nThird.\n\nFourth!")
+        converted = [source for call in convert.call_args_list for source in call.args[0]]
+        self.assertEqual(converted, ['Fourth!'])
+
+    def test_inserted_paragraph_shifts_later_comments(self):
+        comments = [self.comment(i) for i in range(4)]
+        self.edit("First.\n\nNew one.\n\nSecond.\n\nThird.\n\nFourth.")
+        self.assertEqual(self.indexes(comments), [0, 2, 3, 4])
+        self.edit("Zeroth.\n\nFirst.\n\nNew one.\n\nSecond.\n\nThird.\n\nFourth.")
+        self.assertEqual(self.indexes(comments), [1, 3, 4, 5])
+        self.assertEqual(ParagraphMap.objects.get(note=self.note).revision, 1)
+
+    def test_removed_paragraph_moves_comments_to_next(self):
+        comments = [self.comment(i) for i in range(4)]
+        self.edit("Second.\n\nThird.\n\nFourth.")
+        self.assertEqual(self.indexes(comments), [0, 0, 1, 2])
+
+    def test_reordered_paragraphs(self):
+        comments = [self.comment(i) for i in range(4)]
+        self.edit("Third.\n\nFourth.\n\nFirst.\n\nSecond.")
+        self.assertEqual(self.indexes(comments), [2, 3, 0, 1])
+
+    def test_other_chapters_and_unchanged_saves_untouched(self):
+        other = Comment.objects.create(
+            site_id='elsewhere', work_id=self.note.hashcode, chapter_id='main', para_index=1, content="x",
+        )
+        self.note.title = "Renamed"
+        self.note.save()
+        self.assertFalse(ParagraphMap.objects.filter(note=self.note).exists())
+        self.edit("Zeroth.\n\nFirst.\n\nSecond.\n\nThird.\n\nFourth.")
+        self.assertEqual(self.indexes([other]), [1])
+        self.note.title = "Renamed again"
+        self.note.save()
+        self.assertEqual(ParagraphMap.objects.get(note=self.note).revision, 0)
+
+    @override_settings(ENABLE_COMMENTS=False)
+    def test_disabled_without_comments(self):
+        note = Note.objects.create(content="Text.")
+        self.assertFalse(ParagraphMap.objects.filter(note=note).exists())
+
+    def test_render_fallback_invalidates_map(self):
+        self.edit("First.\n\nSecond.\n\nThird.\n\nFourth.\n\n")
+        comments = [self.comment(i) for i in range(4)]
+        cache.clear()
+        with mock.patch.object(rendering, '_convert_sources', return_value=None):
+            self.edit("First.\n\nNew one.\n\nSecond.\n\nThird.\n\nFourth.")
+        self.assertEqual(self.indexes(comments), [0, 1, 2, 3])
+        self.assertEqual(ParagraphMap.objects.get(note=self.note).paragraphs, [])
+        # Not remapped against the revision before the fallback either
+        self.edit("Zeroth.\n\nFirst.\n\nNew one.\n\nSecond.\n\nThird.\n\nFourth.")
+        self.assertEqual(self.indexes(comments), [0, 1, 2, 3])
+        self.assertEqual(len(ParagraphMap.objects.get(note=self.note).paragraphs), 6)
+
+    def test_concurrent_later_edit_owns_the_map(self):
+        comments = [self.comment(i) for i in range(4)]
+        later = "Zeroth.\n\nFirst.\n\nSecond.\n\nThird.\n\nFourth."
+        render = paragraphs.paragraph_hashes
+
+        def render_then_race(content, note):
+            if content == "First.\n\nSecond.\n\nThird.\n\nFourth.\n\nFifth.":
+                # Another request saves and remaps while this edit is rendering
+                other = Note.objects.get(pk=note.pk)
+                other.content = later
+                other.save()
+            return render(content, note)
+
+        with mock.patch.object(paragraphs, 'paragraph_hashes', side_effect=render_then_race):
+            self.edit("First.\n\nSecond.\n\nThird.\n\nFourth.\n\nFifth.")
+        # Moved once, for the content that was saved last
+        self.assertEqual(self.indexes(comments), [1, 2, 3, 4])
+        stored = ParagraphMap.objects.get(note=self.note)
+        self.assertEqual([text for _, text in stored.paragraphs][0], 'Zeroth.')
+
+    def test_stale_map_is_retried(self):
+        self.edit("First.\n\nSecond.\n\nThird.\n\nFourth.\n\n")
+        comments = [self.comment(i) for i in range(4)]
+        reads = []
+        select_for_update = ParagraphMap.objects.select_for_update
+
+        def read_then_replaced():
+            if reads:
+                return select_for_update()
+            # Another edit stores a new revision right after this one read the map
+            reads.append(ParagraphMap.objects.get(note=self.note))
+            ParagraphMap.objects.filter(note=self.note).update(revision=F('revision') + 1)
+            stale = mock.Mock()
+            stale.filter.return_value.first.return_value = reads[0]
+            return stale
+
+        with mock.patch.object(ParagraphMap.objects, 'select_for_update', side_effect=read_then_replaced) as select:
+            self.edit("Zeroth.\n\nFirst.\n\nSecond.\n\nThird.\n\nFourth.")
+        self.assertEqual(select.call_count, 2)
+        self.assertEqual(self.indexes(comments), [1, 2, 3, 4])
+        # The failed attempt rolled back together with the other edit's revision
+        self.assertEqual(ParagraphMap.objects.get(note=self.note).revision, 1)
+
+    def test_deferred_during_import(self):
+        comments = [self.comment(i) for i in range(4)]
+        with deferred_paragraph_maps(), mock.patch.object(paragraphs, 'render_note') as render:
+            self.edit("First.\n\nNew one.\n\nSecond.\n\nThird.\n\nFourth.")
+        render.assert_not_called()
+        self.assertEqual(self.indexes(comments), [0, 1, 2, 3])
+        self.assertFalse(ParagraphMap.objects.filter(note=self.note).exists())
+        # The next edit starts a new map
+        self.edit("First.\n\nNew one.\n\nSecond.\n\nThird.\n\nFourth.\n\nFifth.")
+        self.assertEqual(ParagraphMap.objects.get(note=self.note).revision, 0)
+
+    def test_remap_ranges(self):
+        self.assertEqual(remap_ranges(['a', 'b'], ['a', 'b']), [])
+        self.assertEqual(remap_ranges(['a', 'b', 'c'], ['x', 'a', 'b', 'c']), [(0, 3, 'shift', 1)])
+        # Edited paragraph keeps its comments; the one dropped with it goes to the last replacement
+        self.assertEqual(remap_ranges(['a', 'b', 'c', 'd'], ['a', 'x', 'd']), [(2, 3, 'set', 1), (3, 4, 'shift', -1)])
+        self.assertEqual(remap_ranges(['a', 'b'], []), [])
@@ -0,0 +1,70 @@
+import os
+import pstats
+import tempfile
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import TestCase, Client, RequestFactory, override_settings
+from django.urls import reverse
+from .models import Note
+from . import profiling
+from .profiling import ProfilingMiddleware
+
+
+@override_settings(PROFILING_ENABLED=True)
+class ProfilingMiddlewareTests(TestCase):
+    """Test cases for staff-triggered request profiling"""
+
+    def setUp(self):
+        self.client = Client()
+        self.note = Note.objects.create(content="# Title\n\n" + "Some **text**.\n\n" * 20)
+        cache.clear()  # saving renders the note for its paragraph map
+        self.url = reverse('view_note', args=[self.note.hashcode])
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def test_ignored_for_anonymous(self):
+        response = self.client.get(self.url, HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+        self.assertFalse(response.has_header('X-Profile-Status'))
+
+    @override_settings(RENDER_POOL_WORKERS=1, RENDER_POOL_MIN_LENGTH=10)
+    def test_summary_for_staff(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(self.url, HTTP_X_PROFILE='cumulative')
+        self.assertEqual(response['X-Profile-Status'], '200')
+        text = response.content.decode()
+        self.assertIn(f'GET {self.url} -> 200', text)
+        self.assertIn('sorted by cumulative', text)
+        # Rendered in-process despite the pool threshold, so markdown shows up
+        self.assertIn('render_note_html', text)
+
+    def test_query_flag_and_default_sort(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(self.url, {'_profile': ''})
+        self.assertIn('sorted by tottime', response.content.decode())
+
+    def test_store_writes_profile(self):
+        self.client.force_login(self.admin)
+        with tempfile.TemporaryDirectory() as directory, override_settings(PROFILING_DIR=directory):
+            response = self.client.get(self.url, HTTP_X_PROFILE='store')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b'Some <strong>text</strong>', response.content)
+            path = os.path.join(directory, response['X-Profile-File'])
+            self.assertIn('view_note', response['X-Profile-File'])
+            self.assertGreater(pstats.Stats(path).total_calls, 0)
+
+    def test_busy_when_slot_taken(self):
+        middleware = ProfilingMiddleware(lambda request: HttpResponse('ok'))
+        request = RequestFactory().get(self.url, HTTP_X_PROFILE='1')
+        request.user = self.admin
+        with profiling._slot:
+            response = middleware(request)
+        self.assertEqual(response['X-Profile'], 'busy')
+        self.assertEqual(response.content, b'ok')
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_disabled_by_setting(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(self.url, HTTP_X_PROFILE='1')
+        self.assertFalse(response.has_header('X-Profile-Status'))
@@ -0,0 +1,93 @@
+import csv
+import io
+import json
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from .models import TelegraphAccount
+
+
+@override_settings(RATE_LIMIT_ENABLED=True, RATE_LIMITS={'create_account': (2, 3600), 'comment': (1, 60)})
+class RateLimitTests(TestCase):
+    """Test cases for the per-IP request limiter"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_create_account_flood_is_rejected(self):
+        """Test createAccount returns 429 once the bucket is empty"""
+        for _ in range(2):
+            response = self.client.post(reverse('api_create_account'), {'short_name': 'x'})
+            self.assertEqual(response.status_code, 200)
+
+        response = self.client.post(reverse('api_create_account'), {'short_name': 'x'})
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(response.json()['error'].startswith('FLOOD_WAIT_'))
+        self.assertIn('Retry-After', response)
+        self.assertEqual(TelegraphAccount.objects.count(), 2)
+
+    def test_buckets_are_per_ip(self):
+        """Test one client draining its bucket does not affect another"""
+        for _ in range(3):
+            self.client.post(reverse('api_create_account'), {'short_name': 'x'}, REMOTE_ADDR='10.0.0.1')
+        response = self.client.post(reverse('api_create_account'), {'short_name': 'y'}, REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.status_code, 200)
+
+    def test_comment_get_not_limited(self):
+        """Test only comment POSTs consume tokens"""
+        params = {'siteId': 's', 'workId': 'w', 'chapterId': 'c'}
+        for _ in range(3):
+            self.assertEqual(self.client.get(reverse('api_comments'), params).status_code, 200)
+
+        body = dict(params, paraIndex=0, content='hi')
+        first = self.client.post(reverse('api_comments'), json.dumps(body), content_type='application/json')
+        second = self.client.post(reverse('api_comments'), json.dumps(body), content_type='application/json')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 429)
+
+    def test_forwarded_for_ignored_without_trusted_proxy(self):
+        """Test a client cannot pick a fresh bucket by sending X-Forwarded-For"""
+        for ip in ('1.1.1.1', '2.2.2.2'):
+            self.client.post(reverse('api_create_account'), {'short_name': 'x'}, HTTP_X_FORWARDED_FOR=ip)
+        response = self.client.post(reverse('api_create_account'), {'short_name': 'x'},
+                                    HTTP_X_FORWARDED_FOR='3.3.3.3')
+        self.assertEqual(response.status_code, 429)
+
+    @override_settings(TRUSTED_PROXY_COUNT=1)
+    def test_forwarded_for_behind_trusted_proxy(self):
+        """Test the address appended by the proxy is used, not the client-supplied ones"""
+        for _ in range(2):
+            self.client.post(reverse('api_create_account'), {'short_name': 'x'},
+                             HTTP_X_FORWARDED_FOR='9.9.9.9, 10.0.0.1')
+        spoofed = self.client.post(reverse('api_create_account'), {'short_name': 'x'},
+                                   HTTP_X_FORWARDED_FOR='8.8.8.8, 10.0.0.1')
+        self.assertEqual(spoofed.status_code, 429)
+        other = self.client.post(reverse('api_create_account'), {'short_name': 'x'},
+                                 HTTP_X_FORWARDED_FOR='10.0.0.2')
+        self.assertEqual(other.status_code, 200)
+
+    @override_settings(RATE_LIMIT_ENABLED=False)
+    def test_disabled(self):
+        """Test the limiter can be switched off"""
+        for _ in range(4):
+            response = self.client.post(reverse('api_create_account'), {'short_name': 'x'})
+            self.assertEqual(response.status_code, 200)
+
+
+class ProvisionAccountsCommandTests(TestCase):
+    """Test cases for the provision_accounts management command"""
+
+    def test_provision_accounts(self):
+        out = io.StringIO()
+        call_command('provision_accounts', 5, '--short-name', 'acme', stdout=out, stderr=io.StringIO())
+
+        rows = list(csv.reader(out.getvalue().splitlines()))
+        self.assertEqual(rows[0], ['short_name', 'author_name', 'access_token'])
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(TelegraphAccount.objects.filter(short_name__startswith='acme-').count(), 5)
+
+        tokens = {row[2] for row in rows[1:]}
+        self.assertEqual(len(tokens), 5)
+        self.assertEqual(set(TelegraphAccount.objects.values_list('access_token', flat=True)), tokens)
@@ -0,0 +1,221 @@
+import time
+from unittest import mock
+from django.test import SimpleTestCase, override_settings
+from . import rendering
+from .blocks import GROUP_SEPARATOR
+from .rendering import RenderPool, render_note, render_note_html, plain_text_html, plain_text_nodes, iter_render_note
+
+
+def _fallback(content):
+    return 'fallback'
+
+
+class RenderPoolTests(SimpleTestCase):
+    """Test cases for the out-of-process markdown render pool"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.pool = RenderPool(workers=1, timeout=0.5, memory_limit_mb=512)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.shutdown()
+        super().tearDownClass()
+
+    def test_render_in_pool(self):
+        self.assertEqual(self.pool.run(render_note_html, ('# Hi', '_self'), _fallback), '<h1>Hi</h1>')
+
+    def test_timeout_falls_back(self):
+        start = time.monotonic()
+        self.assertEqual(self.pool.run(time.sleep, (10,), _fallback), 'fallback')
+        self.assertLess(time.monotonic() - start, 3)
+        # The pool keeps working afterwards
+        self.assertEqual(self.pool.run(render_note_html, ('ok', '_self'), _fallback), '<p>ok</p>')
+
+    def test_memory_limit_falls_back(self):
+        self.assertEqual(self.pool.run(bytearray, (2 * 1024 ** 3,), _fallback), 'fallback')
+
+
+class RenderServiceTests(SimpleTestCase):
+    """Test cases for render_note and the plain-text fallbacks"""
+
+    def test_plain_text_fallbacks_escape(self):
+        content = "<script>x</script>\n\nsecond & last"
+        self.assertEqual(plain_text_html(content), "<p>&lt;script&gt;x&lt;/script&gt;</p>\n<p>second &amp; last</p>")
+        self.assertEqual(plain_text_nodes(content)[1], {'tag': 'p', 'children': ['second & last']})
+
+    @override_settings(RENDER_POOL_WORKERS=0)
+    def test_pool_disabled_renders_inline(self):
+        self.assertEqual(render_note('~~x~~', '_self'), '<p><del>x</del></p>')
+
+    @override_settings(RENDER_POOL_WORKERS=1, RENDER_POOL_MIN_LENGTH=10)
+    def test_long_note_uses_pool(self):
+        content = "# Title\n\n" + "word " * 50
+        try:
+            self.assertEqual(render_note(content, '_blank'), render_note_html(content, '_blank'))
+        finally:
+            if rendering._pool is not None:
+                rendering._pool.shutdown()
+
+
+class ConverterTests(SimpleTestCase):
+    """Test cases for the per-thread Markdown converter instances"""
+
+    def test_converter_reused_within_thread(self):
+        from .converters import get_converter
+        self.assertIs(get_converter('note'), get_converter('note'))
+        self.assertIsNot(get_converter('note'), get_converter('telegraph'))
+
+    def test_converter_per_thread(self):
+        import threading
+        from .converters import get_converter
+        other = []
+        thread = threading.Thread(target=lambda: other.append(get_converter('note')))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], get_converter('note'))
+
+    def test_state_reset_between_renders(self):
+        first = render_note_html("Ref[^1]\n\n[^1]: Footnote one.", '_self')
+        second = render_note_html("Plain text.", '_self')
+        self.assertIn('Footnote one', first)
+        self.assertNotIn('footnote', second)
+        self.assertEqual(render_note_html("Ref[^1]\n\n[^1]: Footnote one.", '_self'), first)
+
+
+class NoteExtensionTests(SimpleTestCase):
+    """Test cases for tapnote.markdown_extensions on the 'note' converter"""
+
+    def test_strikethrough_not_applied_in_code(self):
+        html = render_note_html("~~gone~~ and `~~kept~~`", '_self')
+        self.assertIn('<del>gone</del>', html)
+        self.assertIn('<code>~~kept~~</code>', html)
+
+    def test_link_target_per_render(self):
+        self.assertIn('target="_blank"', render_note_html("[a](http://a.com)", '_blank'))
+        html = render_note_html("[a](http://a.com)", '_self')
+        self.assertIn('target="_self"', html)
+        self.assertIn('rel="noopener noreferrer"', html)
+
+    def test_raw_html_link_gets_target(self):
+        html = render_note_html('See <a href="http://raw.com">raw</a>', '_blank')
+        self.assertIn('<a href="http://raw.com" target="_blank" rel="noopener noreferrer">raw</a>', html)
+
+    def test_youtube_embed_only_for_lone_link(self):
+        html = render_note_html("<https://youtu.be/abc>\n\n[v](https://youtu.be/x) [w](https://youtu.be/y)", '_self')
+        self.assertIn('src="https://www.youtube.com/embed/abc"', html)
+        self.assertNotIn('embed/x', html)
+        self.assertIn('href="https://youtu.be/y"', html)
+
+
+BLOCK_NOTE = """# Chapter
+
+First paragraph with a footnote[^1] and a [reference link][ref].
+
+- item one
+- item two
+
+- loose item
+
+```python
+code
+
+with blank lines
+```
+
+> quote
+>
+> more
+
+Last paragraph[^2].
+
+[ref]: http://example.com "Example"
+[^1]: First footnote.
+[^2]: Second footnote.
+
+    Indented continuation."""
+
+
+@override_settings(RENDER_POOL_WORKERS=0)
+class BlockRenderTests(SimpleTestCase):
+    """Test cases for block-level rendering and the block render cache"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def render_counted(self, content, link_target='_self', hashcode='blocknote'):
+        from .instrumentation import RequestMetrics, _current
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            html = render_note(content, link_target, hashcode)
+        finally:
+            _current.reset(token)
+        return html, metrics.counts['cache_hits'], metrics.counts['cache_misses']
+
+    def test_blocks_match_full_render(self):
+        from .blocks import plan
+        note_plan = plan(BLOCK_NOTE)
+        self.assertEqual(len(note_plan.footnote_blocks), 2)
+        html = note_plan.assemble(render_note_html(source, '_self') for source in note_plan.sources())
+        self.assertEqual(html, render_note_html(BLOCK_NOTE, '_self'))
+
+    def test_raw_html_not_split(self):
+        from .blocks import plan
+        self.assertIsNone(plan("Text\n\n<div>\n\nraw\n\n</div>"))
+        self.assertIsNone(plan("```\nunclosed fence"))
+
+    def test_unsplittable_notes_match_full_render(self):
+        from .blocks import plan
+        for content in (
+            f"a[^1] {GROUP_SEPARATOR} b\n\npara two\n\n[^1]: x",
+            "> [r]: http://a.com\n\nSee [x][r].",
+            "- item\n\n    [r]: http://a.com\n\nSee [x][r].",
+            "- [r]: http://a.com\n\nSee [x][r].",
+        ):
+            with self.subTest(content=content):
+                self.assertIsNone(plan(content))
+                html = render_note(content, '_self', 'blocknote')
+                self.assertEqual(html, render_note_html(content, '_self'))
+
+    def test_edit_renders_changed_block_only(self):
+        html, hits, misses = self.render_counted(BLOCK_NOTE)
+        self.assertEqual(html, render_note_html(BLOCK_NOTE, '_self'))
+        self.assertEqual(hits, 0)
+        self.assertEqual(self.render_counted(BLOCK_NOTE)[1:], (misses, 0))
+
+        edited = BLOCK_NOTE.replace('- item two', '- item 2')
+        html, hits, edited_misses = self.render_counted(edited)
+        self.assertEqual(html, render_note_html(edited, '_self'))
+        self.assertEqual((hits, edited_misses), (misses - 1, 1))
+
+    def test_link_target_change_invalidates(self):
+        self.render_counted(BLOCK_NOTE)
+        html, hits, _ = self.render_counted(BLOCK_NOTE, '_blank')
+        self.assertEqual(hits, 0)
+        self.assertIn('target="_blank"', html)
+
+    @override_settings(RENDER_BLOCK_CACHE=False)
+    def test_cache_disabled(self):
+        self.assertEqual(self.render_counted(BLOCK_NOTE)[1:], (0, 0))
+
+    @override_settings(RENDER_POOL_WORKERS=0)
+    def test_streamed_chunks_match_render(self):
+        expected = render_note_html(BLOCK_NOTE, '_self')
+        chunks = list(iter_render_note(BLOCK_NOTE, '_self', 'blocknote', chunk_size=40))
+        self.assertGreater(len(chunks), 2)
+        self.assertEqual(''.join(chunks), expected)
+        # The stream filled the cache for the next request, streamed or not
+        self.assertEqual(self.render_counted(BLOCK_NOTE)[0], expected)
+        self.assertEqual(self.render_counted(BLOCK_NOTE)[2], 0)
+        edited = BLOCK_NOTE.replace('- item two', '- item 2')
+        self.assertEqual(''.join(iter_render_note(edited, '_self', 'blocknote', 40)), render_note_html(edited, '_self'))
+
+    def test_streamed_pool_failure_falls_back_per_batch(self):
+        with mock.patch.object(rendering, '_convert_sources', return_value=None):
+            html = ''.join(iter_render_note(BLOCK_NOTE, '_self', 'blocknote', 1024))
+        self.assertIn('<p>- item one\n- item two</p>', html)
+        self.assertNotIn(GROUP_SEPARATOR, html)
+        self.assertEqual(self.render_counted(BLOCK_NOTE)[1], 0)  # nothing was cached
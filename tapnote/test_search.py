@@ -0,0 +1,71 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, Client
+from django.urls import reverse
+from .models import Note, Comment
+from .search import index_backend, filter_queryset, search, fts5_query
+
+
+class SearchTests(TestCase):
+    """Test cases for the full-text search index"""
+
+    def setUp(self):
+        self.cats = Note.objects.create(title="Cats", content="All about the domestic cat.")
+        self.dogs = Note.objects.create(title="Dogs", content="Dogs chase cats around the garden.")
+        self.other = Note.objects.create(content="Nothing to see here.")
+
+    def test_index_exists(self):
+        self.assertEqual(index_backend(Note), 'sqlite')
+        self.assertEqual(index_backend(Comment), 'sqlite')
+
+    def test_ranked_by_title_weight(self):
+        total, notes = search(Note.objects.all(), 'cats', limit=10)
+        self.assertEqual(total, 2)
+        self.assertEqual(notes, [self.cats, self.dogs])
+
+    def test_index_follows_edits_and_deletes(self):
+        self.other.content = "A note about cats after all."
+        self.other.save()
+        self.dogs.delete()
+        total, notes = search(Note.objects.all(), 'cats', limit=10)
+        self.assertEqual(total, 2)
+        self.assertEqual(set(notes), {self.cats, self.other})
+        self.assertEqual(search(Note.objects.all(), 'garden', limit=10), (0, []))
+
+    def test_pagination(self):
+        total, notes = search(Note.objects.all(), 'cats', limit=1, offset=1)
+        self.assertEqual((total, notes), (2, [self.dogs]))
+
+    def test_exact_hashcode_and_query_syntax_escaped(self):
+        matches = filter_queryset(Note.objects.all(), self.other.hashcode)
+        self.assertEqual(list(matches), [self.other])
+        self.assertEqual(fts5_query('say "hi" OR'), '"say" """hi""" "OR"')
+        self.assertEqual(search(Note.objects.all(), 'NEAR( "* -', limit=10), (0, []))
+
+
+class SearchApiTests(TestCase):
+    """Test cases for the staff search API"""
+
+    def setUp(self):
+        self.client = Client()
+        Note.objects.create(title="Cats", content="All about the domestic cat.")
+        Comment.objects.create(site_id='site', work_id='work', chapter_id='1', para_index=0,
+                               content="Great chapter about cats", user_name="reader")
+
+    def test_staff_only(self):
+        response = self.client.get(reverse('api_search'), {'q': 'cats'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_notes_and_comments(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        data = self.client.get(reverse('api_search'), {'q': 'cats'}).json()
+        self.assertEqual(data['total'], 1)
+        self.assertEqual(data['results'][0]['title'], 'Cats')
+        data = self.client.get(reverse('api_search'), {'q': 'chapter', 'type': 'comments'}).json()
+        self.assertEqual(data['results'][0]['userName'], 'reader')
+        response = self.client.get(reverse('api_search'), {'q': 'cats', 'page': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_admin_search(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        response = self.client.get(reverse('admin:tapnote_note_changelist'), {'q': 'domestic'})
+        self.assertEqual(response.context['cl'].result_count, 1)
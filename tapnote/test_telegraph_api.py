@@ -1,8 +1,10 @@
 from django.test import TestCase, Client
 from django.urls import reverse
-from .models import Note
-from .telegraph import nodes_to_markdown, markdown_to_nodes
+from .models import Note, TelegraphAccount
+from .telegraph import nodes_to_markdown, markdown_to_nodes, markdown_to_nodes_html, validate_nodes, NodeValidationError
+from .limits import MAX_CONTENT_LENGTH, MAX_NODE_DEPTH, MAX_REQUEST_BODY_SIZE
 import json
+from urllib.parse import urlencode
 
 class TelegraphHelperTests(TestCase):
     """Test cases for Telegraph Node <-> Markdown conversion helpers"""
@@ -26,6 +28,37 @@ class TelegraphHelperTests(TestCase):
         self.assertIn('h1', tags)
         self.assertIn('p', tags)
         
+    def test_markdown_to_nodes_matches_html_engine(self):
+        """Test the element-tree engine produces the same nodes as the HTML re-parse"""
+        samples = [
+            "# Title\n\nParagraph with **bold**, *em* and `a < b & c`.",
+            "- one\n- two\n\n1. first\n2. second",
+            "> quoted\n\n---\n\n    indented &amp; code",
+            "[link](https://example.com/?a=1&b=2 \"t\") and ![img](https://example.com/x.png)",
+            "line one  \nline two",
+            "   \n  ",
+        ]
+        for md in samples:
+            self.assertEqual(markdown_to_nodes(md), markdown_to_nodes_html(md))
+
+    def test_markdown_to_nodes_raw_html_fallback(self):
+        """Test documents with raw HTML and entities still convert correctly"""
+        md = "<u>underlined</u> &copy; text\n\n<div>block</div>"
+        nodes = markdown_to_nodes(md)
+        self.assertEqual(nodes, markdown_to_nodes_html(md))
+        self.assertEqual(nodes[0]['children'][0], {'tag': 'u', 'children': ['underlined']})
+        self.assertEqual(nodes[-1], 'block')
+
+    def test_raw_html_nodes_normalized(self):
+        """Test raw HTML tags outside the allowlist are unwrapped, scripts dropped"""
+        md = ('<div class="x"><span>a</span> <table><tr><td>b</td></tr></table></div>\n\n'
+              '<script>alert(1)</script>\n\n<video controls src="v.mp4"></video>')
+        nodes = markdown_to_nodes(md)
+        self.assertEqual(nodes, markdown_to_nodes_html(md))
+        validate_nodes(nodes)
+        self.assertNotIn('alert', json.dumps(nodes))
+        self.assertEqual(nodes[-1], {'tag': 'video', 'attrs': {'controls': '', 'src': 'v.mp4'}, 'children': []})
+
     def test_nodes_to_markdown_simple(self):
         nodes = [{'tag': 'p', 'children': ['Hello world']}]
         md = nodes_to_markdown(nodes)
@@ -51,6 +84,27 @@ class TelegraphHelperTests(TestCase):
         md = nodes_to_markdown(nodes)
         self.assertEqual(md, "[Link](https://example.com)")
 
+    def test_validate_nodes_accepts_round_trip_output(self):
+        nodes = markdown_to_nodes("# Title\n\nSome **bold** [link](https://example.com)\n\n- a\n- b")
+        validate_nodes(nodes)
+
+    def test_validate_nodes_limits(self):
+        deep = ['text']
+        for _ in range(MAX_NODE_DEPTH + 1):
+            deep = [{'tag': 'b', 'children': deep}]
+        cases = [
+            (deep, 'CONTENT_TOO_DEEP'),
+            ([{'tag': 'script', 'children': ['x']}], 'TAG_NOT_ALLOWED'),
+            (['x' * (MAX_CONTENT_LENGTH + 1)], 'CONTENT_TOO_BIG'),
+            ([{'tag': 'a', 'attrs': ['href']}], 'Invalid content format'),
+            ([{'tag': 'p', 'children': 'text'}], 'Invalid content format'),
+            ({'tag': 'p'}, 'Invalid content format'),
+        ]
+        for nodes, error in cases:
+            with self.assertRaises(NodeValidationError) as ctx:
+                validate_nodes(nodes)
+            self.assertEqual(ctx.exception.error, error)
+
 
 class TelegraphAPITests(TestCase):
     """Test cases for Telegraph compatible API"""
@@ -156,6 +210,25 @@ class TelegraphAPITests(TestCase):
         self.assertEqual(result['result']['title'], "Post Note")
         self.assertIn('content', result['result'])
 
+    def test_description_stored_on_save(self):
+        """Test description is precomputed from content when the note is saved"""
+        note = Note.objects.create(title="Long", content="x" * 150)
+        self.assertEqual(note.description, "x" * 100)
+        note.content = "Short"
+        note.save()
+        note.refresh_from_db()
+        self.assertEqual(note.description, "Short")
+
+    def test_get_page_metadata_uses_stored_description(self):
+        """Test getPage without content returns the stored description"""
+        note = Note.objects.create(title="Meta", content="Body text")
+        # Stale content must not leak into the metadata response
+        Note.objects.filter(pk=note.pk).update(description="Stored")
+        response = self.client.get(
+            reverse('api_get_page_with_path', kwargs={'path': note.hashcode})
+        )
+        self.assertEqual(response.json()['result']['description'], "Stored")
+
 class TelegraphAccountTests(TestCase):
     """Test cases for Telegraph Account and related features"""
 
@@ -291,6 +364,27 @@ class TelegraphAccountTests(TestCase):
         self.assertEqual(note.title, 'Updated Title')
         self.assertIn('Updated', note.content)
 
+    def test_get_page_content_accepted_by_edit_page(self):
+        """Test getPage nodes of a note with raw HTML can be sent back to editPage"""
+        acc = self.client.post(reverse('api_create_account'), {'short_name': 'rt'}).json()
+        token = acc['result']['access_token']
+        account = TelegraphAccount.objects.get(access_token=token)
+        note = Note.objects.create(
+            title='Raw', account=account,
+            content='Intro <span>inline</span>\n\n<div><p>Block</p></div>\n\n<table><tr><td>cell</td></tr></table>',
+        )
+        url = reverse('api_get_page_with_path', kwargs={'path': note.hashcode}) + '?return_content=true'
+        nodes = self.client.get(url).json()['result']['content']
+        response = self.client.post(
+            reverse('api_edit_page_with_path', kwargs={'path': note.hashcode}),
+            {'access_token': token, 'title': 'Raw', 'content': json.dumps(nodes)},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['ok'])
+        note.refresh_from_db()
+        for text in ('inline', 'Block', 'cell'):
+            self.assertIn(text, note.content)
+
     def test_edit_page_permission_denied(self):
         """Test editing a page with wrong access token"""
         # Account 1
@@ -375,3 +469,80 @@ class TelegraphAccountTests(TestCase):
         )
         self.assertEqual(response.json()['result']['views'], 1)
 
+    def test_get_views_missing_page(self):
+        """Test getViews on an unknown path returns 404"""
+        response = self.client.post(
+            reverse('api_get_views_with_path', kwargs={'path': 'missing1'})
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['error'], 'PAGE_NOT_FOUND')
+
+    def test_get_page_list_streams_large_listing(self):
+        """Test large page listings are streamed and still decode to the same payload"""
+        from .models import TelegraphAccount
+        account = TelegraphAccount.objects.create(short_name='bulk')
+        for i in range(60):
+            Note.objects.create(title=f'P{i}', content=f'Body {i}', account=account)
+
+        response = self.client.post(
+            reverse('api_get_page_list'),
+            {'access_token': account.access_token, 'limit': 100}
+        )
+        self.assertTrue(response.streaming)
+        result = json.loads(b''.join(response.streaming_content))
+        self.assertTrue(result['ok'])
+        self.assertEqual(result['result']['total_count'], 60)
+        self.assertEqual(len(result['result']['pages']), 60)
+        self.assertEqual(result['result']['pages'][0]['title'], 'P59')
+
+    def test_get_page_large_content_buffered(self):
+        """Test getPage sends the content nodes of long notes as one complete body"""
+        content = "\n\n".join(f"Paragraph {i} " + "word " * 20 for i in range(400))
+        note = Note.objects.create(title="Long", content=content)
+        url = reverse('api_get_page_with_path', kwargs={'path': note.hashcode}) + "?return_content=true"
+        response = self.client.get(url)
+        self.assertFalse(response.streaming)
+        result = response.json()
+        self.assertEqual(result['result']['content'], markdown_to_nodes(content))
+
+    def test_create_page_rejects_invalid_nodes(self):
+        """Test createPage refuses disallowed tags before converting"""
+        response = self.client.post(
+            reverse('api_create_page'),
+            {'title': 'Bad', 'content': json.dumps([{'tag': 'script', 'children': ['x']}])},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'TAG_NOT_ALLOWED')
+        self.assertFalse(Note.objects.filter(title='Bad').exists())
+
+    def test_create_page_rejects_oversize_body(self):
+        """Test createPage refuses bodies over the Content-Length limit"""
+        response = self.client.post(
+            reverse('api_create_page'),
+            {'title': 'Big', 'content': 'x' * MAX_REQUEST_BODY_SIZE},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(response.json()['error'], 'CONTENT_TOO_BIG')
+
+    def test_create_page_accepts_longest_note_of_four_byte_characters(self):
+        """Test the body limit leaves room for a full note of percent-encoded emoji"""
+        nodes = [{'tag': 'p', 'children': ['\U0001F600' * (MAX_CONTENT_LENGTH - 2)]}]
+        body = urlencode({'title': 'Emoji', 'content': json.dumps(nodes)})
+        self.assertGreater(len(body), 3 * 1024 * 1024)
+        response = self.client.post(reverse('api_create_page'), body,
+                                    content_type='application/x-www-form-urlencoded')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['ok'])
+
+    def test_create_page_rejects_markdown_over_limit(self):
+        """Test the converted markdown is checked against MAX_CONTENT_LENGTH"""
+        half = 'x' * (MAX_CONTENT_LENGTH // 2)
+        content = [{'tag': 'p', 'children': [half]}, {'tag': 'p', 'children': [half]}]
+        response = self.client.post(
+            reverse('api_create_page'),
+            {'title': 'Big', 'content': json.dumps(content)},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 413)
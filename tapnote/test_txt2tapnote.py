@@ -0,0 +1,31 @@
+from django.test import SimpleTestCase
+from scripts.txt2tapnote import MAX_CHARS, split_text, telegraph_size, text_to_nodes
+from .limits import MAX_CONTENT_LENGTH
+from .telegraph import nodes_to_markdown, validate_nodes
+
+
+class TelegraphPartSizeTests(SimpleTestCase):
+    """Test parts uploaded with --api telegraph fit the server's limits once converted"""
+
+    def assertPartsFit(self, text):
+        parts = split_text(text, MAX_CHARS, telegraph_size)
+        self.assertGreater(len(parts), 1)
+        for part in parts:
+            nodes = text_to_nodes(part)
+            validate_nodes(nodes)
+            self.assertLessEqual(len(nodes_to_markdown(nodes)), MAX_CONTENT_LENGTH)
+        self.assertEqual('\n'.join(parts).split('\n'), text.split('\n'))
+
+    def test_size_is_the_stored_markdown_length(self):
+        text = "First line\nsecond line\n\nNext paragraph"
+        self.assertEqual(telegraph_size(text), len(nodes_to_markdown(text_to_nodes(text))))
+
+    def test_dense_multiline_part_near_the_limit(self):
+        # 198000 characters, one part by raw length, about 234000 once every line break is "  \n"
+        text = '\n'.join(['一二三四五六七八九十'] * 18000)
+        self.assertEqual(len(split_text(text)), 1)
+        self.assertPartsFit(text)
+
+    def test_short_lines_within_the_node_count(self):
+        text = '\n'.join(['诗句'] * 60000)
+        self.assertPartsFit(text)
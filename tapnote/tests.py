@@ -1,4 +1,4 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.http import Http404
 from .models import Note
@@ -230,6 +230,26 @@ class ViewsTests(TestCase):
         response = self.client.get(reverse('view_note', args=[note.hashcode]))
         self.assertIn('<del>Deleted text</del>', response.context['content'])
 
+    @override_settings(STREAM_NOTE_MIN_LENGTH=1000)
+    def test_view_note_streams_long_notes(self):
+        """Test long notes are streamed, head first, with the same page"""
+        content = "# Long\n\n" + "\n\n".join(f"Paragraph **{i}**." for i in range(100))
+        note = Note.objects.create(content=content, title="Long note")
+        url = reverse('view_note', args=[note.hashcode]) + f'?token={note.edit_token}'
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        self.assertIn('rel=preload', response['Link'])
+        self.assertIn(f'edit_token_{note.hashcode}', response.cookies)
+        chunks = [chunk.decode() for chunk in response.streaming_content]
+        self.assertIn('og:title" content="Long note"', chunks[0])
+        self.assertNotIn('<p>Paragraph', chunks[0])
+        page = ''.join(chunks)
+        self.assertIn('<p>Paragraph <strong>99</strong>.</p>', page)
+        self.assertIn('data-work-id="%s"' % note.hashcode, page)
+        self.assertTrue(page.rstrip().endswith('</html>'))
+        # Short notes are rendered in one piece
+        self.assertFalse(self.client.get(reverse('view_note', args=[self.note.hashcode])).streaming)
+
     def test_view_note_footnotes(self):
         """Test footnote rendering in view"""
         content = "Here is a footnote reference[^1]\n\n[^1]: Here is the footnote."
@@ -0,0 +1,16 @@
+from django.conf import settings
+
+
+def get_client_ip(request):
+    """
+    The client address. X-Forwarded-For is only read behind TRUSTED_PROXY_COUNT
+    proxies: each appends the address it received the request from, so the client
+    is that many entries from the end; anything before it was sent by the client.
+    """
+    proxies = settings.TRUSTED_PROXY_COUNT
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if proxies and x_forwarded_for:
+        hops = [hop.strip() for hop in x_forwarded_for.split(',') if hop.strip()]
+        if hops:
+            return hops[-min(proxies, len(hops))]
+    return request.META.get('REMOTE_ADDR')
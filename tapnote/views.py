@@ -1,8 +1,9 @@
-import markdown
 import json
 import hashlib
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import Http404, HttpResponse, JsonResponse
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.templatetags.static import static
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.admin.views.decorators import staff_member_required
 from django.utils.dateparse import parse_datetime
@@ -11,15 +12,44 @@ from django.contrib.auth import login
 from django.db import models
 from django.conf import settings
 from .models import Note, Comment, LikeRecord, BannedUser, TelegraphAccount
-from .telegraph import nodes_to_markdown, markdown_to_nodes
+from .telegraph import nodes_to_markdown, parse_nodes, NodeValidationError
+from .rendering import apply_strikethrough, process_markdown_links, render_note, render_nodes, iter_render_note
+from .limits import MAX_CONTENT_LENGTH, MAX_REQUEST_BODY_SIZE
+from .responses import JsonResponse, StreamingJsonResponse
+from .ratelimit import rate_limit
+from .middleware import sessionless
+from .bootstrap import setup_complete
+from .search import search
+from .comments import NOTE_SITE_ID, NOTE_CHAPTER_ID, comment_counts
+from .paragraphs import deferred_paragraph_maps
+from .instrumentation import timed
+from .metrics import REGISTRY, COMMENT_WRITES, LIKE_CONFLICTS, VIEW_COUNT_UPDATE
+from .utils import get_client_ip
 import re
 import secrets
+import time
 
-MAX_CONTENT_LENGTH = 200000
 MAX_COMMENT_LENGTH = 10000  # 评论内容最大长度
 MAX_CONTEXT_TEXT_LENGTH = 100  # 上下文指纹最大长度
 MAX_ID_LENGTH = 100  # ID字段最大长度
 MAX_PARA_INDEX = 100000  # 段落索引最大值（防止DoS）
+HASHCODE_RE = re.compile(r'^[a-zA-Z0-9]{8,32}$')
+
+# Columns needed by metadata-only Telegraph endpoints (everything except content)
+NOTE_METADATA_FIELDS = ('id', 'hashcode', 'title', 'author', 'description', 'views', 'account_id')
+
+# Above this size getPageList pages are streamed from the queryset instead of built in
+# memory. getPage is always buffered: its nodes are built in full (often in the render
+# pool) before the first byte, and an error while streaming would end a 200 mid-body.
+STREAM_MIN_PAGES = 50  # getPageList entries
+
+# Streamed note pages (STREAM_NOTE_MIN_LENGTH): the rendered note is sent in chunks of
+# about this many characters, in place of this marker in the rendered template
+PAGE_STREAM_CHUNK_SIZE = 16 * 1024
+PAGE_CONTENT_MARKER = '<!--tapnote:content-->'
+
+SEARCH_PAGE_SIZE = 20  # api_search results per page by default
+MAX_SEARCH_PAGE_SIZE = 100
 
 def constant_time_compare(val1, val2):
     """Constant-time string comparison to prevent timing attacks."""
@@ -41,15 +71,75 @@ def validate_id_field(value, field_name, max_length=MAX_ID_LENGTH):
         return False
     return True
 
-def get_client_ip(request):
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
-    else:
-        ip = request.META.get('REMOTE_ADDR')
-    return ip
+def request_too_large(request, limit=MAX_REQUEST_BODY_SIZE):
+    """Check the declared body size so oversize uploads are refused before being read."""
+    try:
+        return int(request.META.get('CONTENT_LENGTH') or 0) > limit
+    except ValueError:
+        return False
+
+def comment_reader_id(request, site_id):
+    """Anonymous per-site identity derived from the client IP (same as on comment creation)."""
+    ip = get_client_ip(request)
+    if not ip:
+        return None
+    ip_hash = hashlib.md5((ip + site_id).encode()).hexdigest()
+    return f"ip_{ip_hash}"
 
+def group_comments_by_para(comments, liked_comment_ids):
+    # Group by para_index
+    comments_by_para = {}
+    for c in comments:
+        idx = str(c.para_index)
+        if idx not in comments_by_para:
+            comments_by_para[idx] = []
+        
+        comments_by_para[idx].append({
+            'id': c.id,
+            'paraIndex': c.para_index,
+            'content': c.content,
+            'userName': c.user_name,
+            'userId': c.user_id,
+            'userAvatar': c.user_avatar,
+            'createdAt': c.created_at.isoformat(),
+            'likes': c.likes,
+            'contextText': c.context_text,
+            'isLiked': c.id in liked_comment_ids
+        })
+    return comments_by_para
+
+def liked_comment_ids(request, site_id, comments):
+    """Ids of the comments in the comments queryset liked by the requesting reader."""
+    current_user_id = comment_reader_id(request, site_id)
+    if not current_user_id:
+        return set()
+    return set(
+        LikeRecord.objects.filter(user_id=current_user_id, comment__in=comments)
+        .values_list('comment_id', flat=True)
+    )
+
+def initial_comments(request, note):
+    """
+    Comment data inlined into the note page for paranote.js, or None: the cached
+    per-paragraph counts, plus the comments themselves (api_comments' commentsByPara)
+    when there are at most INLINE_COMMENTS_LIMIT of them.
+    """
+    if not (settings.ENABLE_COMMENTS and settings.INLINE_COMMENT_COUNTS):
+        return None
+    counts = comment_counts(NOTE_SITE_ID, note.hashcode, NOTE_CHAPTER_ID)
+    data = {'counts': counts}
+    if not counts:
+        data['commentsByPara'] = {}
+    elif sum(counts.values()) <= settings.INLINE_COMMENTS_LIMIT:
+        comments = Comment.objects.filter(
+            site_id=NOTE_SITE_ID, work_id=note.hashcode, chapter_id=NOTE_CHAPTER_ID,
+        ).order_by('created_at')
+        data['commentsByPara'] = group_comments_by_para(comments, liked_comment_ids(request, NOTE_SITE_ID, comments))
+    return data
+
+@sessionless
 @csrf_exempt
+@rate_limit('comment')
 def api_comments(request):
     if not settings.ENABLE_COMMENTS:
         return JsonResponse({'error': 'Comments are disabled'}, status=403)
@@ -70,43 +160,9 @@ def api_comments(request):
             
         comments = Comment.objects.filter(site_id=site_id, work_id=work_id, chapter_id=chapter_id).order_by('created_at')
         
-        # Determine current user identity for "liked" status
-        current_user_id = None
-        ip = get_client_ip(request)
-        if ip:
-             # Same logic as creation
-             ip_hash = hashlib.md5((ip + site_id).encode()).hexdigest()
-             current_user_id = f"ip_{ip_hash}"
-
-        # Get set of comment IDs liked by this user
-        liked_comment_ids = set()
-        if current_user_id:
-            liked_comment_ids = set(
-                LikeRecord.objects.filter(user_id=current_user_id, comment__in=comments)
-                .values_list('comment_id', flat=True)
-            )
-        
-        # Group by para_index
-        comments_by_para = {}
-        for c in comments:
-            idx = str(c.para_index)
-            if idx not in comments_by_para:
-                comments_by_para[idx] = []
-            
-            comments_by_para[idx].append({
-                'id': c.id,
-                'paraIndex': c.para_index,
-                'content': c.content,
-                'userName': c.user_name,
-                'userId': c.user_id,
-                'userAvatar': c.user_avatar,
-                'createdAt': c.created_at.isoformat(),
-                'likes': c.likes,
-                'contextText': c.context_text,
-                'isLiked': c.id in liked_comment_ids
-            })
-            
-        return JsonResponse({'commentsByPara': comments_by_para})
+        # Comment IDs liked by the current reader, for "liked" status
+        liked = liked_comment_ids(request, site_id, comments)
+        return JsonResponse({'commentsByPara': group_comments_by_para(comments, liked)})
 
     elif request.method == 'POST':
         try:
@@ -175,6 +231,7 @@ def api_comments(request):
                 context_text=context_text,
                 ip=ip
             )
+            COMMENT_WRITES.inc(action='create')
             
             return JsonResponse({
                 'id': comment.id,
@@ -239,6 +296,7 @@ def api_comments(request):
                 return JsonResponse({'error': 'permission_denied'}, status=403)
             
             Comment.objects.filter(id=comment_id).delete()
+            COMMENT_WRITES.inc(action='delete')
             return JsonResponse({'success': True})
         except json.JSONDecodeError:
             return JsonResponse({'error': 'invalid_json'}, status=400)
@@ -248,6 +306,7 @@ def api_comments(request):
     
     return JsonResponse({'error': 'method not allowed'}, status=405)
 
+@sessionless
 @csrf_exempt
 def api_like_comment(request):
     if not settings.ENABLE_COMMENTS:
@@ -291,6 +350,7 @@ def api_like_comment(request):
 
             # Check if already liked
             if LikeRecord.objects.filter(comment=comment, user_id=user_id).exists():
+                LIKE_CONFLICTS.inc()
                 return JsonResponse({'error': 'already_liked', 'likes': comment.likes}, status=400)
             
             # Create record and increment
@@ -300,6 +360,7 @@ def api_like_comment(request):
                 comment.save()
             except Exception as e:
                 # Handle race condition or unique constraint violation
+                LIKE_CONFLICTS.inc()
                 return JsonResponse({'error': 'already_liked', 'likes': comment.likes}, status=400)
             
             return JsonResponse({'likes': comment.likes})
@@ -310,6 +371,7 @@ def api_like_comment(request):
             return JsonResponse({'error': 'internal_error'}, status=500)
     return JsonResponse({'error': 'method_not_allowed'}, status=405)
 
+@sessionless
 @csrf_exempt
 def api_ban(request):
     if not settings.ENABLE_COMMENTS:
@@ -380,47 +442,64 @@ def api_ban(request):
 
     return JsonResponse({'error': 'method_not_allowed'}, status=405)
 
-def apply_strikethrough(md_text):
-    # Replace ~~something~~ with <del>something</del>
-    pattern = re.compile(r'~~(.*?)~~', re.DOTALL)
-    return pattern.sub(r'<del>\1</del>', md_text)
-
-def process_markdown_links(html_content, target="_self"):
-    # Keep existing link processing
-    pattern = r'<a(.*?)href="(.*?)"(.*?)>'
-    replacement = f'<a\\1href="\\2"\\3 target="{target}" rel="noopener noreferrer">'
-    html_content = re.sub(pattern, replacement, html_content)
-
-    # Existing anchor-based YouTube embed:
-    anchor_yt_pattern = r'<p><a href="https?://(?:www\.)?youtu\.be/([^"]+)".*?>.*?</a></p>'
-    anchor_yt_replacement = (
-        r'<iframe width="560" height="315" '
-        r'src="https://www.youtube.com/embed/\1" '
-        r'frameborder="0" allowfullscreen></iframe>'
-    )
-    html_content = re.sub(anchor_yt_pattern, anchor_yt_replacement, html_content)
-
-    # **Added** plain-text YouTube embed (no anchor tag):
-    plain_yt_pattern = r'<p>https?://(?:www\.)?youtu\.be/([^<]+)</p>'
-    plain_yt_replacement = (
-        r'<iframe width="560" height="315" '
-        r'src="https://www.youtube.com/embed/\1" '
-        r'frameborder="0" allowfullscreen></iframe>'
-    )
-    html_content = re.sub(plain_yt_pattern, plain_yt_replacement, html_content)
+@sessionless
+def api_search(request):
+    """Ranked full-text search over notes or comments, for staff."""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'permission_denied', 'message': 'Admins only'}, status=403)
+    if request.method != 'GET':
+        return JsonResponse({'error': 'method_not_allowed'}, status=405)
 
-    return html_content
+    query = request.GET.get('q', '').strip()
+    kind = request.GET.get('type', 'notes')
+    if not query:
+        return JsonResponse({'error': 'missing_params'}, status=400)
+    if kind not in ('notes', 'comments'):
+        return JsonResponse({'error': 'invalid_type'}, status=400)
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+        limit = min(max(int(request.GET.get('limit', SEARCH_PAGE_SIZE)), 1), MAX_SEARCH_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({'error': 'invalid_params'}, status=400)
+
+    offset = (page - 1) * limit
+    if kind == 'notes':
+        total, notes = search(Note.objects.defer('content'), query, limit, offset)
+        results = [{
+            'hashcode': note.hashcode,
+            'title': note.title,
+            'author': note.author,
+            'description': note.description,
+            'views': note.views,
+            'createdAt': note.created_at.isoformat(),
+            'updatedAt': note.updated_at.isoformat(),
+        } for note in notes]
+    else:
+        total, comments = search(Comment.objects.all(), query, limit, offset)
+        results = [{
+            'id': c.id,
+            'siteId': c.site_id,
+            'workId': c.work_id,
+            'chapterId': c.chapter_id,
+            'paraIndex': c.para_index,
+            'content': c.content,
+            'userName': c.user_name,
+            'userId': c.user_id,
+            'createdAt': c.created_at.isoformat(),
+            'likes': c.likes,
+        } for c in comments]
+    return JsonResponse({'total': total, 'page': page, 'limit': limit, 'results': results})
 
 def home(request):
     # If no users exist, redirect to setup page
-    if not User.objects.exists():
+    if not setup_complete.is_set():
         return redirect('setup_admin')
     return render(request, 'tapnote/editor.html')
 
 @csrf_exempt
 def setup_admin(request):
     # Security check: only allow if no users exist
-    if User.objects.exists():
+    if setup_complete.is_set():
         return redirect('home')
         
     if request.method == 'POST':
@@ -430,6 +509,7 @@ def setup_admin(request):
         
         if username and password:
             user = User.objects.create_superuser(username=username, email=email, password=password)
+            setup_complete.set()
             login(request, user)
             return redirect('home')
             
@@ -438,6 +518,11 @@ def setup_admin(request):
 @csrf_exempt
 def publish(request):
     if request.method == 'POST':
+        if request_too_large(request):
+            return render(request, 'tapnote/editor.html', {
+                'error': f'Content exceeds the limit of {MAX_CONTENT_LENGTH} characters.'
+            }, status=413)
+
         content = request.POST.get('content', '').strip()
         title = request.POST.get('title', '').strip()
         author = request.POST.get('author', '').strip()
@@ -456,34 +541,8 @@ def publish(request):
             return response
     return redirect('home')
 
-def view_note(request, hashcode):
-    # Validate hashcode format (allow 8-32 chars, alphanumeric)
-    if not re.match(r'^[a-zA-Z0-9]{8,32}$', hashcode):
-        raise Http404()
-    
-    note = get_object_or_404(Note, hashcode=hashcode)
-    
-    # FIRST apply strikethrough by regex
-    raw_with_del = apply_strikethrough(note.content)
-
-    # THEN convert with standard Markdown (no strikethrough extension)
-    md = markdown.Markdown(extensions=['fenced_code', 'tables', 'footnotes'])
-    html_content = md.convert(raw_with_del)
-    html_content = process_markdown_links(html_content, target=note.link_target)
-    
-    # Use constant-time comparison for edit token
-    cookie_token = request.COOKIES.get(f'edit_token_{note.hashcode}')
-    url_token = request.GET.get('token')
-    
-    token_is_valid = False
-    if url_token and constant_time_compare(str(url_token), str(note.edit_token)):
-        token_is_valid = True
-    elif cookie_token and constant_time_compare(str(cookie_token), str(note.edit_token)):
-        token_is_valid = True
-        
-    can_edit = token_is_valid
-    
-    # Extract title and description for meta tags
+def note_meta(note):
+    """Extract title, description and preview image for the note's meta tags."""
     lines = note.content.strip().split('\n')
     full_text = note.content.strip()
     meta_title = "TeleNote"
@@ -520,35 +579,110 @@ def view_note(request, hashcode):
         # img_match.group(1) is markdown url, group(2) is html src
         meta_image = img_match.group(1) or img_match.group(2)
 
+    return {
+        'meta_title': meta_title,
+        'meta_description': meta_description,
+        'meta_image': meta_image,
+    }
+
+def note_page_context(request, note, comments=None):
+    """
+    (view_note.html context without 'content', whether a valid edit token came in the
+    URL); comments is the initial_comments() data to inline.
+    """
+    # Use constant-time comparison for edit token
+    cookie_token = request.COOKIES.get(f'edit_token_{note.hashcode}')
+    url_token = request.GET.get('token')
+    
+    token_is_valid = False
+    if url_token and constant_time_compare(str(url_token), str(note.edit_token)):
+        token_is_valid = True
+    elif cookie_token and constant_time_compare(str(cookie_token), str(note.edit_token)):
+        token_is_valid = True
+        
+    context = {
+        'note': note,
+        'can_edit': token_is_valid,
+        'enable_comments': settings.ENABLE_COMMENTS,
+        'initial_comments': comments,
+        **note_meta(note),
+    }
+    return context, bool(url_token and token_is_valid)
+
+def finish_note_page(response, note, url_token_valid):
+    # Let the browser start on the stylesheet and script before it parses the body
+    links = [f'<{static("css/styles.css")}>; rel=preload; as=style']
+    if settings.ENABLE_COMMENTS:
+        links.append(f'<{static("js/paranote.js")}>; rel=preload; as=script')
+    response['Link'] = ', '.join(links)
     # Auto-refresh/set cookie if valid URL token is provided
     # This ensures robustness: if user visits with token link, browser remembers permission
-    if url_token and token_is_valid:
-        response = render(request, 'tapnote/view_note.html', {
-            'note': note,
-            'content': html_content,
-            'can_edit': can_edit,
-            'meta_title': meta_title,
-            'meta_description': meta_description,
-            'meta_image': meta_image,
-            'enable_comments': settings.ENABLE_COMMENTS,
-        })
+    if url_token_valid:
         response.set_cookie(f'edit_token_{note.hashcode}', note.edit_token, max_age=31536000, samesite='Lax')
+    return response
+
+def note_page_response(request, note, html_content, comments=None):
+    """Render view_note.html for an already-rendered note (shared by the sync and async views)."""
+    context, url_token_valid = note_page_context(request, note, comments)
+    with timed('template'):
+        response = render(request, 'tapnote/view_note.html', {**context, 'content': html_content})
+    return finish_note_page(response, note, url_token_valid)
+
+def stream_note_page(note):
+    """Whether view_note streams the page of note."""
+    threshold = settings.STREAM_NOTE_MIN_LENGTH
+    return bool(threshold and settings.RENDER_BLOCK_CACHE and len(note.content) >= threshold)
+
+def note_page_shell(request, note, comments=None):
+    """(page before the note body, page after it, whether a valid edit token came in the URL)"""
+    context, url_token_valid = note_page_context(request, note, comments)
+    with timed('template'):
+        page = render_to_string('tapnote/view_note.html', {**context, 'content': PAGE_CONTENT_MARKER}, request)
+    head, tail = page.split(PAGE_CONTENT_MARKER, 1)
+    return head, tail, url_token_valid
+
+def streaming_note_page_response(request, note, body, comments=None):
+    """
+    view_note.html with the note body streamed from body (an iterator, sync or async,
+    of HTML chunks): the head of the page is sent before the note is rendered.
+    """
+    head, tail, url_token_valid = note_page_shell(request, note, comments)
+    if hasattr(body, '__aiter__'):
+        async def content():
+            yield head
+            async for chunk in body:
+                yield chunk
+            yield tail
     else:
-        response = render(request, 'tapnote/view_note.html', {
-            'note': note,
-            'content': html_content,
-            'can_edit': can_edit,
-            'meta_title': meta_title,
-            'meta_description': meta_description,
-            'meta_image': meta_image,
-            'enable_comments': settings.ENABLE_COMMENTS,
-        })
+        def content():
+            yield head
+            yield from body
+            yield tail
+    response = StreamingHttpResponse(content(), content_type='text/html; charset=utf-8')
+    response['X-Accel-Buffering'] = 'no'  # nginx would otherwise hold the head back
+    return finish_note_page(response, note, url_token_valid)
+
+def view_note(request, hashcode):
+    # Validate hashcode format (allow 8-32 chars, alphanumeric)
+    if not HASHCODE_RE.match(hashcode):
+        raise Http404()
+    
+    note = get_object_or_404(Note, hashcode=hashcode)
+    comments = initial_comments(request, note)
+    if stream_note_page(note):
+        body = iter_render_note(note.content, note.link_target, note.hashcode, PAGE_STREAM_CHUNK_SIZE)
+        response = streaming_note_page_response(request, note, body, comments)
+    else:
+        html_content = render_note(note.content, note.link_target, note.hashcode)
+        response = note_page_response(request, note, html_content, comments)
         
     # Increment views
+    start = time.perf_counter()
     try:
         Note.objects.filter(pk=note.pk).update(views=models.F('views') + 1)
     except:
         pass
+    VIEW_COUNT_UPDATE.observe(time.perf_counter() - start)
         
     return response
 
@@ -568,6 +702,12 @@ def edit_note(request, hashcode):
         raise Http404()
     
     if request.method == 'POST':
+        if request_too_large(request):
+            return render(request, 'tapnote/editor.html', {
+                'note': note,
+                'error': f'Content exceeds the limit of {MAX_CONTENT_LENGTH} characters.'
+            }, status=413)
+
         content = request.POST.get('content', '').strip()
         title = request.POST.get('title', '').strip()
         author = request.POST.get('author', '').strip()
@@ -592,6 +732,15 @@ def edit_note(request, hashcode):
     
     return render(request, 'tapnote/editor.html', {'note': note})
 
+@sessionless
+def metrics(request):
+    """Prometheus text exposition for staff, or for scrapers sending METRICS_TOKEN as a bearer token."""
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if not (token and constant_time_compare(authorization, f'Bearer {token}')) and not request.user.is_staff:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(REGISTRY.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 def handler404(request, exception):
     return render(request, 'tapnote/404.html', status=404)
 
@@ -631,27 +780,28 @@ def import_data(request):
             data = json.load(json_file)
             
             count = 0
-            for item in data:
-                defaults = {
-                    'content': item['content'],
-                    'edit_token': item['edit_token'],
-                }
-                if 'link_target' in item:
-                    defaults['link_target'] = item['link_target']
-                if 'created_at' in item:
-                    defaults['created_at'] = parse_datetime(item['created_at'])
+            with deferred_paragraph_maps():
+                for item in data:
+                    defaults = {
+                        'content': item['content'],
+                        'edit_token': item['edit_token'],
+                    }
+                    if 'link_target' in item:
+                        defaults['link_target'] = item['link_target']
+                    if 'created_at' in item:
+                        defaults['created_at'] = parse_datetime(item['created_at'])
                 
-                note, created = Note.objects.update_or_create(
-                    hashcode=item['hashcode'],
-                    defaults=defaults
-                )
+                    note, created = Note.objects.update_or_create(
+                        hashcode=item['hashcode'],
+                        defaults=defaults
+                    )
                 
-                # Force update updated_at if present
-                if 'updated_at' in item:
-                    updated_at = parse_datetime(item['updated_at'])
-                    Note.objects.filter(pk=note.pk).update(updated_at=updated_at)
+                    # Force update updated_at if present
+                    if 'updated_at' in item:
+                        updated_at = parse_datetime(item['updated_at'])
+                        Note.objects.filter(pk=note.pk).update(updated_at=updated_at)
                 
-                count += 1
+                    count += 1
                 
             return render(request, 'tapnote/migration.html', {'success': f'Successfully imported {count} notes.'})
         except Exception as e:
@@ -659,7 +809,9 @@ def import_data(request):
             
     return redirect('migration')
 
+@sessionless
 @csrf_exempt
+@rate_limit('create_account')
 def api_create_account(request):
     if request.method != 'POST':
         return JsonResponse({'ok': False, 'error': 'POST required'}, status=405)
@@ -696,6 +848,7 @@ def api_create_account(request):
     except Exception as e:
         return JsonResponse({'ok': False, 'error': str(e)}, status=500)
 
+@sessionless
 @csrf_exempt
 def api_revoke_access_token(request):
     if request.method != 'POST':
@@ -729,10 +882,13 @@ def api_revoke_access_token(request):
     except Exception as e:
          return JsonResponse({'ok': False, 'error': str(e)}, status=500)
 
+@sessionless
 @csrf_exempt
 def api_edit_page(request, path=None):
     if request.method != 'POST':
         return JsonResponse({'ok': False, 'error': 'POST required'}, status=405)
+    if request_too_large(request):
+        return JsonResponse({'ok': False, 'error': 'CONTENT_TOO_BIG'}, status=413)
     
     try:
         if request.content_type == 'application/json':
@@ -766,29 +922,25 @@ def api_edit_page(request, path=None):
         except TelegraphAccount.DoesNotExist:
              return JsonResponse({'ok': False, 'error': 'INVALID_ACCESS_TOKEN'}, status=401)
              
-        # Get Note
+        # Get Note (content is replaced wholesale, so never load the old one)
         try:
-            note = Note.objects.get(hashcode=path)
+            note = Note.objects.defer('content').get(hashcode=path)
         except Note.DoesNotExist:
              return JsonResponse({'ok': False, 'error': 'PAGE_NOT_FOUND'}, status=404)
         
         # Check permission: Must belong to this account
-        if note.account != account:
+        if note.account_id != account.id:
              return JsonResponse({'ok': False, 'error': 'PERMISSION_DENIED'}, status=403)
              
         # Parse content
-        nodes = []
-        if isinstance(content_raw, str):
-            try:
-                nodes = json.loads(content_raw)
-            except json.JSONDecodeError:
-                 return JsonResponse({'ok': False, 'error': 'Content must be a valid JSON string of nodes'}, status=400)
-        elif isinstance(content_raw, list):
-            nodes = content_raw
-        else:
-            return JsonResponse({'ok': False, 'error': 'Invalid content format'}, status=400)
+        try:
+            nodes = parse_nodes(content_raw)
+        except NodeValidationError as e:
+            return JsonResponse({'ok': False, 'error': e.error}, status=e.status)
 
         markdown_content = nodes_to_markdown(nodes)
+        if len(markdown_content) > MAX_CONTENT_LENGTH:
+            return JsonResponse({'ok': False, 'error': 'CONTENT_TOO_BIG'}, status=413)
         
         # Update
         note.title = title
@@ -815,6 +967,7 @@ def api_edit_page(request, path=None):
     except Exception as e:
         return JsonResponse({'ok': False, 'error': str(e)}, status=500)
 
+@sessionless
 @csrf_exempt
 def api_get_account_info(request):
     if request.method != 'POST':
@@ -858,6 +1011,7 @@ def api_get_account_info(request):
     except Exception as e:
         return JsonResponse({'ok': False, 'error': str(e)}, status=500)
 
+@sessionless
 @csrf_exempt
 def api_get_page_list(request):
     if request.method != 'POST':
@@ -883,33 +1037,39 @@ def api_get_page_list(request):
         except TelegraphAccount.DoesNotExist:
             return JsonResponse({'ok': False, 'error': 'INVALID_ACCESS_TOKEN'}, status=401)
             
-        notes = account.pages.all().order_by('-created_at')[offset:offset+limit]
+        notes = account.pages.only(*NOTE_METADATA_FIELDS).order_by('-created_at')[offset:offset+limit]
         total_count = account.pages.count()
         
-        pages = []
-        for note in notes:
-            page = {
-                'path': note.hashcode,
-                'url': request.build_absolute_uri(f'/{note.hashcode}/'),
-                'title': note.title,
-                'description': note.content[:100],
-                'views': note.views,
-                'can_edit': True
-            }
-            if note.author:
-                page['author_name'] = note.author
-            pages.append(page)
+        def iter_pages():
+            for note in notes.iterator():
+                page = {
+                    'path': note.hashcode,
+                    'url': request.build_absolute_uri(f'/{note.hashcode}/'),
+                    'title': note.title,
+                    'description': note.description,
+                    'views': note.views,
+                    'can_edit': True
+                }
+                if note.author:
+                    page['author_name'] = note.author
+                yield page
             
-        return JsonResponse({
+        # Large listings are encoded page by page straight from the cursor
+        stream = min(limit, total_count - offset) > STREAM_MIN_PAGES
+        data = {
             'ok': True,
             'result': {
                 'total_count': total_count,
-                'pages': pages
+                'pages': iter_pages() if stream else list(iter_pages())
             }
-        })
+        }
+        if stream:
+            return StreamingJsonResponse(data)
+        return JsonResponse(data)
     except Exception as e:
         return JsonResponse({'ok': False, 'error': str(e)}, status=500)
 
+@sessionless
 @csrf_exempt
 def api_get_views(request, path=None):
     if request.method != 'POST':
@@ -925,24 +1085,27 @@ def api_get_views(request, path=None):
         if not path:
              return JsonResponse({'ok': False, 'error': 'PATH_REQUIRED'}, status=400)
              
-        try:
-            note = Note.objects.get(hashcode=path)
-        except Note.DoesNotExist:
+        views = Note.objects.filter(hashcode=path).values_list('views', flat=True).first()
+        if views is None:
              return JsonResponse({'ok': False, 'error': 'PAGE_NOT_FOUND'}, status=404)
              
         return JsonResponse({
             'ok': True,
             'result': {
-                'views': note.views
+                'views': views
             }
         })
     except Exception as e:
         return JsonResponse({'ok': False, 'error': str(e)}, status=500)
 
+@sessionless
 @csrf_exempt
+@rate_limit('create_page')
 def api_create_page(request):
     if request.method != 'POST':
         return JsonResponse({'ok': False, 'error': 'POST required'}, status=405)
+    if request_too_large(request):
+        return JsonResponse({'ok': False, 'error': 'CONTENT_TOO_BIG'}, status=413)
     
     try:
         # Support both JSON body and Form data
@@ -967,18 +1130,14 @@ def api_create_page(request):
              return JsonResponse({'ok': False, 'error': 'Content is required'}, status=400)
 
         # Content parsing
-        nodes = []
-        if isinstance(content_raw, str):
-            try:
-                nodes = json.loads(content_raw)
-            except json.JSONDecodeError:
-                 return JsonResponse({'ok': False, 'error': 'Content must be a valid JSON string of nodes'}, status=400)
-        elif isinstance(content_raw, list):
-            nodes = content_raw
-        else:
-            return JsonResponse({'ok': False, 'error': 'Invalid content format'}, status=400)
+        try:
+            nodes = parse_nodes(content_raw)
+        except NodeValidationError as e:
+            return JsonResponse({'ok': False, 'error': e.error}, status=e.status)
 
         markdown_content = nodes_to_markdown(nodes)
+        if len(markdown_content) > MAX_CONTENT_LENGTH:
+            return JsonResponse({'ok': False, 'error': 'CONTENT_TOO_BIG'}, status=413)
         
         # Check Access Token
         account = None
@@ -1020,8 +1179,8 @@ def api_create_page(request):
     except Exception as e:
         return JsonResponse({'ok': False, 'error': str(e)}, status=500)
 
-@csrf_exempt
-def api_get_page(request, path=None):
+def get_page_params(request, path=None):
+    """Read (path, return_content) for getPage from POST (JSON or form) or GET."""
     if request.method == 'POST':
         if request.content_type == 'application/json':
             try:
@@ -1040,27 +1199,42 @@ def api_get_page(request, path=None):
 
     if isinstance(return_content, str):
         return_content = return_content.lower() == 'true'
+    return path, return_content
 
-    if not path:
-        return JsonResponse({'ok': False, 'error': 'Path is required'}, status=400)
-
-    try:
-        note = Note.objects.get(hashcode=path)
-    except Note.DoesNotExist:
-        return JsonResponse({'ok': False, 'error': 'Page not found'}, status=404)
+def get_page_queryset(return_content):
+    notes = Note.objects.all()
+    if not return_content:
+        notes = notes.only(*NOTE_METADATA_FIELDS)
+    return notes
 
+def get_page_response(request, note, content_nodes=None):
     result = {
         'path': note.hashcode,
         'url': request.build_absolute_uri(f'/{note.hashcode}/'),
         'title': note.title or '',
-        'description': note.content[:100],
+        'description': note.description,
         'views': 0,
     }
     
     if note.author:
         result['author_name'] = note.author
 
-    if return_content:
-        result['content'] = markdown_to_nodes(note.content)
+    if content_nodes is not None:
+        result['content'] = content_nodes
 
     return JsonResponse({'ok': True, 'result': result})
+
+@sessionless
+@csrf_exempt
+def api_get_page(request, path=None):
+    path, return_content = get_page_params(request, path)
+    if not path:
+        return JsonResponse({'ok': False, 'error': 'Path is required'}, status=400)
+
+    try:
+        note = get_page_queryset(return_content).get(hashcode=path)
+    except Note.DoesNotExist:
+        return JsonResponse({'ok': False, 'error': 'Page not found'}, status=404)
+
+    content_nodes = render_nodes(note.content) if return_content else None
+    return get_page_response(request, note, content_nodes)
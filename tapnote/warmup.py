@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.urls import get_resolver
+from .converters import get_converter
+
+
+def warm_up():
+    """
+    Do the one-off work a first request would otherwise pay for: import the views,
+    build the URL resolver and import every Markdown converter's extensions.
+
+    Called in the gunicorn master when the app is preloaded, so forked workers share
+    the result copy-on-write. Must not open database connections.
+
+    Converter instances are per thread (tapnote.converters), so only the calling
+    thread's are built here: sync workers serve requests on that thread, while
+    gthread and ASGI request threads build their own on first use, without the
+    import cost.
+    """
+    resolver = get_resolver()
+    resolver.resolve('/')  # populates the reverse/resolve caches and imports the views
+
+    for name in settings.MARKDOWN_CONVERTERS:
+        get_converter(name).convert('*warm-up*')